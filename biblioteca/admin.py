@@ -1,24 +1,32 @@
-import io
-import os
-import zipfile
-import tempfile
+import logging
 from datetime import datetime
 from django.contrib import admin, messages
 from django.contrib.admin import AdminSite
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
 from django.core.management import call_command
-from django.http import HttpResponse, HttpResponseForbidden, HttpResponseRedirect
+from django.http import (
+    HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse, StreamingHttpResponse,
+)
 from django.urls import path, reverse
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.admin import UserAdmin, GroupAdmin
 from .models import *
 from django.conf import settings
-import subprocess    
 from import_export.admin import ImportExportModelAdmin  
+from .busqueda import BusquedaCatalogo
+from .filtros import FiltroAutocompletar, media_autocompletar
+from .paginacion import PaginadorEstimado
+from .resources import (
+    AlumnoResource, AutorResource, CarreraResource, CategoriaResource, EditorialResource,
+    HistorialResource, LibroResource, PrestamoResource, UsuarioResource,
+)
 from django.template.response import TemplateResponse
 from django.shortcuts import redirect
 
 # Register your models here.
 
+logger = logging.getLogger(__name__)
+
 admin.site.site_header="Sistema ITCG"
 admin.site.site_title="Sistema Gestor de Biblioteca"
 admin.site.index_title="Administración Biblioteca"
@@ -36,20 +44,16 @@ class MyAdminSite(AdminSite):
             path('procedimientos/', self.admin_view(self.procedimientos_view), name='procedimientos'),
             path('procedimientos/ejecutar/<str:procedimiento_id>/', self.admin_view(self.ejecutar_procedimiento_view), name='ejecutar_procedimiento'),
             path('procedimientos/resultado/', self.admin_view(self.resultado_procedimiento_view), name='resultado_procedimiento'),
+            path('procedimientos/tareas/enviar/<str:procedimiento_id>/', self.admin_view(self.enviar_tarea_view), name='enviar_tarea'),
+            path('procedimientos/tareas/<str:id_tarea>/', self.admin_view(self.estado_tarea_view), name='estado_tarea'),
+            path('procedimientos/tareas/<str:id_tarea>/resultado/', self.admin_view(self.resultado_tarea_view), name='resultado_tarea'),
         ]
         return my_urls + urls
 
     def _get_mysql_settings(self):
-        db = settings.DATABASES.get('default', {})
-        engine = db.get('ENGINE', '')
-        if 'mysql' not in engine:
-            raise RuntimeError("La base de datos configurada no es MySQL.")
-        host = db.get('HOST') or 'localhost'
-        port = str(db.get('PORT') or 3306)
-        user = db.get('USER') or ''
-        password = db.get('PASSWORD') or ''
-        name = db.get('NAME') or ''
-        return host, port, user, password, name
+        from biblioteca.respaldos import configuracion_mysql
+        config = configuracion_mysql()
+        return config['host'], config['port'], config['user'], config['password'], config['name']
 
     def backup_db_view(self, request):
         user = request.user
@@ -71,30 +75,26 @@ class MyAdminSite(AdminSite):
             dbname,
         ]
 
-        # Ejecutar comando y capturar stdout
+        from biblioteca.respaldos import RespaldoStreaming
+        
+        # Iniciar el volcado; los errores se detectan antes del primer byte de la respuesta
+        marca = datetime.now().strftime("%Y%m%d-%H%M%S")
+        respaldo = RespaldoStreaming(mysqldump_cmd, f'backup-{dbname}-{marca}.sql')
         try:
-            proc = subprocess.Popen(mysqldump_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            out, err = proc.communicate()
-            if proc.returncode != 0:
-                err_text = err.decode('utf-8', errors='ignore')
-                messages.error(request, f"mysqldump falló: {err_text}")
-                return HttpResponseRedirect(reverse(f'{self.name}:index'))
+            respaldo.iniciar()
         except FileNotFoundError:
             messages.error(request, "mysqldump no encontrado. Instala el cliente MySQL y asegúrate de que 'mysqldump' esté en PATH.")
             return HttpResponseRedirect(reverse(f'{self.name}:index'))
+        except RuntimeError as e:
+            messages.error(request, str(e))
+            return HttpResponseRedirect(reverse(f'{self.name}:index'))
         except Exception as e:
             messages.error(request, f"Error ejecutando mysqldump: {e}")
             return HttpResponseRedirect(reverse(f'{self.name}:index'))
 
-        # Preparar respuesta como descarga (posible zip)
-        filename_sql = f'backup-{dbname}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.sql'
-        # crear zip en memoria
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-            zf.writestr(filename_sql, out)
-        zip_buffer.seek(0)
-        response = HttpResponse(zip_buffer.read(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="backup-{dbname}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.zip"'
+        # El ZIP se comprime y se envía mientras mysqldump sigue escribiendo
+        response = StreamingHttpResponse(respaldo, content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="backup-{dbname}-{marca}.zip"'
         return response
 
     def restore_db_view(self, request):
@@ -117,75 +117,55 @@ class MyAdminSite(AdminSite):
             messages.error(request, "Formato no soportado. Sube .sql o .zip que contenga .sql.")
             return HttpResponseRedirect(reverse(f'{self.name}:index'))
 
+        # Un ZIP con manifiesto es un respaldo paralelo: se restaura con varios
+        # procesos, y eso no se hace dentro de un worker web (igual que el respaldo)
+        from biblioteca.respaldo_paralelo import RestauracionParalela
+
+        if RestauracionParalela.es_respaldo_paralelo(uploaded):
+            messages.error(
+                request,
+                "El archivo es un respaldo paralelo; restáuralo desde el servidor con "
+                "'python manage.py respaldo_paralelo restaurar <archivo.zip>'."
+            )
+            return HttpResponseRedirect(reverse(f'{self.name}:index'))
+
         try:
             host, port, dbuser, dbpass, dbname = self._get_mysql_settings()
         except RuntimeError as e:
             messages.error(request, str(e))
             return HttpResponseRedirect(reverse(f'{self.name}:index'))
 
-        # Guardar archivo temporal
-        tmp_path = None
+        from biblioteca.respaldos import RestauracionStreaming
+        
+        mysql_cmd = [
+            'mysql',
+            '-h', host,
+            '-P', port,
+            '-u', dbuser,
+            f'--password={dbpass}',
+            dbname,
+        ]
+        
+        # El archivo subido (o cada .sql dentro del ZIP) se envía por bloques al stdin de mysql
+        restauracion = RestauracionStreaming(mysql_cmd, progreso=self._progreso_restauracion)
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded.name)[1]) as tf:
-                for chunk in uploaded.chunks():
-                    tf.write(chunk)
-                tmp_path = tf.name
-
-            sql_files = []
-
-            # Si es zip, extraer archivos .sql
-            if zipfile.is_zipfile(tmp_path) or filename.endswith('.zip'):
-                with zipfile.ZipFile(tmp_path, 'r') as zf:
-                    for member in zf.namelist():
-                        if member.lower().endswith('.sql'):
-                            with tempfile.NamedTemporaryFile(delete=False, suffix='.sql') as ef:
-                                ef.write(zf.read(member))
-                                sql_files.append(ef.name)
-                if not sql_files:
-                    raise ValueError("El ZIP no contiene archivos .sql")
-            else:
-                sql_files = [tmp_path]
-
-            # Ejecutar mysql < archivo.sql para cada sql
-            for sql in sql_files:
-                # comando sin shell: pasamos el archivo como stdin
-                mysql_cmd = [
-                    'mysql',
-                    '-h', host,
-                    '-P', port,
-                    '-u', dbuser,
-                    f'--password={dbpass}',
-                    dbname,
-                ]
-                try:
-                    with open(sql, 'rb') as infile:
-                        proc = subprocess.Popen(mysql_cmd, stdin=infile, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                        out, err = proc.communicate()
-                        if proc.returncode != 0:
-                            err_text = err.decode('utf-8', errors='ignore')
-                            raise RuntimeError(f"mysql falló al importar {os.path.basename(sql)}: {err_text}")
-                except FileNotFoundError:
-                    raise RuntimeError("El cliente 'mysql' no se encontró. Instala MySQL client y añade 'mysql' al PATH.")
-            messages.success(request, "Restauración completada correctamente.")
+            restauracion.restaurar_subida(uploaded)
+            messages.success(
+                request,
+                f"Restauración completada correctamente: {len(restauracion.archivos)} archivo(s), "
+                f"{restauracion.bytes / (1024 * 1024):.1f} MB, {restauracion.sentencias} sentencias ejecutadas."
+            )
         except Exception as e:
-            messages.error(request, f"Error durante la restauración: {e}")
-        finally:
-            # limpiar archivos temporales
-            try:
-                if tmp_path and os.path.exists(tmp_path):
-                    os.remove(tmp_path)
-            except:
-                pass
-            # borrar extraídos
-            # (si los sql_files no están en tmp_path y existen, eliminarlos)
-            try:
-                for f in sql_files:
-                    if os.path.exists(f):
-                        os.remove(f)
-            except:
-                pass
-
+            messages.error(
+                request,
+                f"Error durante la restauración: {e} "
+                f"(enviado hasta el error: {restauracion.bytes / (1024 * 1024):.1f} MB, {restauracion.sentencias} sentencias)"
+            )
+        
         return HttpResponseRedirect(reverse(f'{self.name}:index'))
+    
+    def _progreso_restauracion(self, nombre, enviados, sentencias):
+        logger.info(f"Restaurando {nombre}: {enviados / (1024 * 1024):.1f} MB, {sentencias} sentencias")
 
     def procedimientos_view(self, request):
             """Vista principal de procedimientos - Solo 2 procedimientos"""
@@ -193,7 +173,7 @@ class MyAdminSite(AdminSite):
             if not user.is_authenticated:
                 return redirect(f'{self.name}:index')
             
-            from biblioteca.procedimientos import ProcedimientosBiblioteca
+            from biblioteca.procedimientos import REPORTES_POR_FECHA, ProcedimientosBiblioteca
             
             # Verificar si los procedimientos existen
             estado = ProcedimientosBiblioteca.verificar_estado_procedimientos()
@@ -209,7 +189,9 @@ class MyAdminSite(AdminSite):
                         'icono': 'chart-bar',
                         'color': 'primary',
                         'url': reverse(f'{self.name}:ejecutar_procedimiento', args=['reporte_carreras']),
-                        'disponible': any('ReportePrestamosPorCarrera' in p.get('nombre', '') for p in estado.get('procedimientos', []))
+                        'url_tarea': reverse(f'{self.name}:enviar_tarea', args=['reporte_carreras']),
+                        # La versión con archivo se usa en cuanto el rango incluye préstamos archivados
+                        'disponible': set(REPORTES_POR_FECHA) <= {p.get('nombre') for p in estado.get('procedimientos', [])}
                     },
                     {
                         'id': 'libros_populares',
@@ -218,6 +200,7 @@ class MyAdminSite(AdminSite):
                         'icono': 'book',
                         'color': 'success',
                         'url': reverse(f'{self.name}:ejecutar_procedimiento', args=['libros_populares']),
+                        'url_tarea': reverse(f'{self.name}:enviar_tarea', args=['libros_populares']),
                         'disponible': True  # Siempre disponible (no usa procedimiento almacenado)
                     }
                 ],
@@ -243,59 +226,47 @@ class MyAdminSite(AdminSite):
         
         return redirect(f'{self.name}:procedimientos')
     
+    def _parametros_procedimiento(self, request, procedimiento_id):
+        """Parámetros del procedimiento a partir del formulario del panel"""
+        from datetime import timedelta
+        
+        if procedimiento_id == 'reporte_carreras':
+            fecha_inicio = request.POST.get('fecha_inicio') if request.method == 'POST' else None
+            fecha_fin = request.POST.get('fecha_fin') if request.method == 'POST' else None
+            
+            if not (fecha_inicio and fecha_fin):
+                # Últimos 30 días por defecto
+                fecha_fin = datetime.now().date()
+                fecha_inicio = fecha_fin - timedelta(days=30)
+            return {'fecha_inicio': str(fecha_inicio), 'fecha_fin': str(fecha_fin)}
+        
+        if procedimiento_id == 'libros_populares':
+            # Solo maneja el límite
+            if request.method == 'POST':
+                limite_actual = request.POST.get('limite', '10')
+            else:
+                limite_actual = '10'
+            
+            # Guardar en sesión
+            request.session['limite_seleccionado'] = limite_actual
+            return {'limite': limite_actual}
+        
+        return None
+    
     def ejecutar_procedimiento_view(self, request, procedimiento_id):
         """Ejecuta un procedimiento específico"""
         user = request.user
         if not user.is_authenticated:
             return redirect(f'{self.name}:index')
         
-        from datetime import datetime, timedelta
-        from biblioteca.procedimientos import ProcedimientosBiblioteca
+        from biblioteca.tareas import ejecutar_procedimiento
         
         resultado = None
         
         try:
-            if procedimiento_id == 'reporte_carreras':
-                fecha_actual = datetime.now().date()
-                
-                if request.method == 'POST':
-                    fecha_inicio = request.POST.get('fecha_inicio')
-                    fecha_fin = request.POST.get('fecha_fin')
-                    
-                    if fecha_inicio and fecha_fin:
-                        resultado = ProcedimientosBiblioteca.generar_reporte_prestamos_carrera(
-                            fecha_inicio=fecha_inicio,
-                            fecha_fin=fecha_fin
-                        )
-                    else:
-                        # Últimos 30 días por defecto
-                        fecha_fin = fecha_actual
-                        fecha_inicio = fecha_fin - timedelta(days=30)
-                        resultado = ProcedimientosBiblioteca.generar_reporte_prestamos_carrera(
-                            fecha_inicio=fecha_inicio,
-                            fecha_fin=fecha_fin
-                        )
-                else:
-                    # Datos iniciales
-                    fecha_fin = fecha_actual
-                    fecha_inicio = fecha_fin - timedelta(days=30)
-                    resultado = ProcedimientosBiblioteca.generar_reporte_prestamos_carrera(
-                        fecha_inicio=fecha_inicio,
-                        fecha_fin=fecha_fin
-                    )
-                    
-            elif procedimiento_id == 'libros_populares':
-                # Solo maneja el límite
-                if request.method == 'POST':
-                    limite_actual = request.POST.get('limite', '10')
-                else:
-                    limite_actual = '10'
-                
-                # Guardar en sesión
-                request.session['limite_seleccionado'] = limite_actual
-                
-                # Ejecutar procedimiento
-                resultado = ProcedimientosBiblioteca.obtener_libros_populares(int(limite_actual))
+            parametros = self._parametros_procedimiento(request, procedimiento_id)
+            if parametros is not None:
+                resultado = ejecutar_procedimiento(procedimiento_id, parametros)
                 
         except Exception as e:
             resultado = {
@@ -304,31 +275,43 @@ class MyAdminSite(AdminSite):
                 'resultados': None
             }
         
-        # Almacenar resultado en sesión
+        # Guardar el resultado en el servidor; en la redirección solo viaja el token
         if resultado:
-            request.session['procedimiento_resultado'] = {
-                'success': resultado.get('success', False),
-                'resultados': resultado.get('resultados'),
-                'error': resultado.get('error'),
-                'procedimiento_id': procedimiento_id,
-                'timestamp': datetime.now().isoformat()
-            }
+            from biblioteca.almacen_resultados import AlmacenResultados
+            id_resultado = AlmacenResultados.guardar(procedimiento_id, resultado, usuario=user)
+            return redirect(f"{reverse(f'{self.name}:resultado_procedimiento')}?id={id_resultado}")
         
         return redirect(f'{self.name}:resultado_procedimiento')
     
     
     def resultado_procedimiento_view(self, request):
-        """Muestra los resultados del procedimiento"""
+        """Muestra los resultados del procedimiento, por páginas"""
         user = request.user
         if not user.is_authenticated:
             return redirect(f'{self.name}:index')
         
-        resultado_data = request.session.pop('procedimiento_resultado', None)
+        from biblioteca.almacen_resultados import AlmacenResultados
+        
+        registro = AlmacenResultados.obtener(request.GET.get('id'), usuario=user)
         
-        if not resultado_data:
+        if not registro:
             messages.warning(request, "No hay resultados para mostrar. Ejecuta un procedimiento primero.")
             return redirect(f'{self.name}:procedimientos')
         
+        total_paginas = AlmacenResultados.total_paginas(registro)
+        try:
+            numero_pagina = min(max(int(request.GET.get('pagina', 1)), 1), total_paginas)
+        except ValueError:
+            numero_pagina = 1
+        
+        resultado_data = {
+            'success': registro.success,
+            'resultados': AlmacenResultados.pagina(registro, numero_pagina) if registro.success else None,
+            'error': registro.error,
+            'procedimiento_id': registro.procedimiento_id,
+            'timestamp': registro.creado.isoformat(),
+        }
+        
         # Determinar título y columnas según el procedimiento
         procedimiento_id = resultado_data.get('procedimiento_id')
         titulo = "Resultados del Procedimiento"
@@ -359,12 +342,61 @@ class MyAdminSite(AdminSite):
             'procedimiento_id': procedimiento_id,
             'columnas': columnas,
             'selected_limite': selected_limite,  # <-- PASAR AL TEMPLATE
+            'id_resultado': registro.id_resultado,
+            'pagina_actual': numero_pagina,
+            'total_paginas': total_paginas,
             'is_popup': False,
             'has_permission': True,
         }
         
         return TemplateResponse(request, 'admin/procedimientos_resultado.html', context)
     
+    def enviar_tarea_view(self, request, procedimiento_id):
+        """Encola el procedimiento en segundo plano y regresa el id de la tarea"""
+        if request.method != 'POST':
+            return JsonResponse({'error': 'Método no permitido'}, status=405)
+        
+        from biblioteca.tareas import EjecutorTareas
+        
+        parametros = self._parametros_procedimiento(request, procedimiento_id)
+        if parametros is None:
+            return JsonResponse({'error': f'Procedimiento desconocido: {procedimiento_id}'}, status=404)
+        
+        try:
+            tarea = EjecutorTareas.enviar(procedimiento_id, parametros, usuario=request.user)
+        except RuntimeError as e:
+            return JsonResponse({'error': str(e)}, status=503)
+        
+        datos = EjecutorTareas.estado(tarea)
+        datos['url_estado'] = reverse(f'{self.name}:estado_tarea', args=[tarea.id_tarea])
+        datos['url_resultado'] = reverse(f'{self.name}:resultado_tarea', args=[tarea.id_tarea])
+        return JsonResponse(datos, status=202)
+    
+    def estado_tarea_view(self, request, id_tarea):
+        """Estado de una tarea, para consultarlo periódicamente"""
+        from biblioteca.tareas import EjecutorTareas
+        
+        tarea = EjecutorTareas.obtener(id_tarea, usuario=request.user)
+        if not tarea:
+            return JsonResponse({'error': 'Tarea no encontrada'}, status=404)
+        return JsonResponse(EjecutorTareas.estado(tarea))
+    
+    def resultado_tarea_view(self, request, id_tarea):
+        """Redirige al resultado guardado de una tarea terminada"""
+        from biblioteca.tareas import EjecutorTareas
+        
+        tarea = EjecutorTareas.obtener(id_tarea, usuario=request.user)
+        if not tarea:
+            messages.warning(request, "La tarea no existe.")
+            return redirect(f'{self.name}:procedimientos')
+        if not tarea.resultado_id:
+            if tarea.estado == TareaProcedimiento.ESTADO_FALLIDA:
+                messages.error(request, f"❌ Error: {tarea.error or 'Error desconocido'}")
+            else:
+                messages.info(request, f"El procedimiento sigue en ejecución ({tarea.get_estado_display().lower()}).")
+            return redirect(f'{self.name}:procedimientos')
+        return redirect(f"{reverse(f'{self.name}:resultado_procedimiento')}?id={tarea.resultado_id}")
+    
     def _build_common_context(self, request):
         """Construye contexto común para las vistas"""
         return {
@@ -432,64 +464,157 @@ try:
 except admin.sites.AlreadyRegistered:
     pass
 
+class ImportacionMasivaAdmin(ImportExportModelAdmin):
+    """Admin con import-export cuyos recursos guardan por lotes (ver resources.py)"""
+
+    actions = ['exportar_csv_streaming', 'exportar_xlsx_streaming']
+
+    def get_queryset(self, request):
+        # Con list_select_related = LISTADO_RELACIONADOS del modelo: las columnas
+        # de llaves foráneas salen del mismo JOIN, sin una consulta por fila
+        return super().get_queryset(request).para_listado()
+
+    @property
+    def media(self):
+        media = super().media
+        extra = media_autocompletar(self)
+        return media + extra if extra else media
+
+    @admin.action(description='Exportar seleccionados a CSV (por bloques)')
+    def exportar_csv_streaming(self, request, queryset):
+        from .exportacion import ExportacionStreaming
+        return ExportacionStreaming(queryset).respuesta_csv()
+
+    @admin.action(description='Exportar seleccionados a XLSX (por bloques)')
+    def exportar_xlsx_streaming(self, request, queryset):
+        from .exportacion import ExportacionStreaming
+        try:
+            return ExportacionStreaming(queryset).respuesta_xlsx()
+        except RuntimeError as e:
+            self.message_user(request, str(e), messages.ERROR)
+
+    def add_success_message(self, result, request):
+        super().add_success_message(result, request)
+        lotes = getattr(result, 'lotes', None)
+        if lotes:
+            segundos = [duracion for _, _, duracion in lotes]
+            messages.info(request,
+                f'{len(lotes)} lotes guardados en {sum(segundos):.2f} s '
+                f'(el más lento: {max(segundos):.2f} s)'
+            )
+
 #admin.site.register(Carrera)
-class CarreraAdmin(ImportExportModelAdmin):
+class CarreraAdmin(ImportacionMasivaAdmin):
+    resource_classes = [CarreraResource]
     list_display = ('id_carrera', 'nombre')
     list_filter = ('id_carrera', 'nombre')
     search_fields = ('id_carrera', 'nombre')
     ordering = ('id_carrera', 'nombre')
 custom_admin_site.register(Carrera, CarreraAdmin)
 
+def buscar_por_nombre(queryset, search_term):
+    """Búsqueda del admin por id o por nombre_busqueda en lugar de icontains sobre search_fields"""
+    search_term = search_term.strip()
+    if not search_term:
+        return queryset, False
+    if search_term.isdigit():
+        return queryset.filter(pk=int(search_term)), False
+    return queryset.buscar_nombre(search_term), False
+
+
 #admin.site.register(Alumno)
-class AlumnoAdmin(ImportExportModelAdmin):
+class AlumnoAdmin(ImportacionMasivaAdmin):
+    resource_classes = [AlumnoResource]
     list_display = ('id_alumno', 'nombre', 'semestre', 'carrera')
+    list_select_related = Alumno.LISTADO_RELACIONADOS
     list_filter = ('semestre', 'carrera')
     search_fields = ('id_alumno', 'nombre', 'carrera__nombre')
     raw_id_fields = ('carrera',)
     ordering = ('id_alumno', 'nombre') 
+
+    def get_search_results(self, request, queryset, search_term):
+        return buscar_por_nombre(queryset, search_term)
 custom_admin_site.register(Alumno, AlumnoAdmin)
 
 
 #admin.site.register(Autor)
-class AutorAdmin(ImportExportModelAdmin):
+class AutorAdmin(ImportacionMasivaAdmin):
+    resource_classes = [AutorResource]
     list_display = ('id_autor', 'nombre', 'nacionalidad')
-    list_filter = ('nombre', 'nacionalidad')
+    list_filter = ('nacionalidad',)
     search_fields = ('id_autor', 'nombre', 'nacionalidad')
     ordering = ('id_autor', 'nombre')
+
+    def get_search_results(self, request, queryset, search_term):
+        return buscar_por_nombre(queryset, search_term)
 custom_admin_site.register(Autor, AutorAdmin)
 
 #admin.site.register(Editorial)
-class EditorialAdmin(ImportExportModelAdmin):
+class EditorialAdmin(ImportacionMasivaAdmin):
+    resource_classes = [EditorialResource]
     list_display = ('id_editorial', 'nombre', 'pais')
-    list_filter = ('nombre', 'pais')
+    list_filter = ('pais',)
     search_fields = ('id_editorial', 'nombre', 'pais')
     ordering = ('id_editorial', 'nombre')
 custom_admin_site.register(Editorial, EditorialAdmin)
 
 #admin.site.register(Categoria)
-class CategoriaAdmin(ImportExportModelAdmin):
+class CategoriaAdmin(ImportacionMasivaAdmin):
+    resource_classes = [CategoriaResource]
     list_display = ('id_categoria', 'nombre')
     list_filter = ('nombre',)
     search_fields = ('id_categoria', 'nombre')
     ordering = ('id_categoria', 'nombre')
 custom_admin_site.register(Categoria, CategoriaAdmin)
 
+class ListadoPorRelevancia(ChangeList):
+    """Con una búsqueda activa y sin orden elegido en las columnas, ordena por relevancia"""
+
+    def get_ordering(self, request, queryset):
+        if ORDER_VAR not in self.params and 'relevancia' in queryset.query.annotations:
+            return ['-relevancia', 'pk']
+        return super().get_ordering(request, queryset)
+
+
 #admin.site.register(Libro)
-class LibroAdmin(ImportExportModelAdmin):
+class LibroAdmin(ImportacionMasivaAdmin):
+    resource_classes = [LibroResource]
     list_display = ('id_libro', 'titulo', 'autor', 'categoria', 'editorial', 'anio_publicacion')
-    list_filter = ('categoria', 'autor', 'editorial', 'anio_publicacion')
+    list_select_related = Libro.LISTADO_RELACIONADOS
+    list_filter = (
+        'categoria', ('autor', FiltroAutocompletar), ('editorial', FiltroAutocompletar), 'anio_publicacion',
+    )
     search_fields = ('id_libro', 'titulo', 'autor__nombre', 'categoria__nombre', 'editorial__nombre')
     raw_id_fields = ('autor', 'categoria', 'editorial')
     ordering = ('id_libro', 'titulo', 'autor', 'categoria', 'editorial')
+
+    # La caja de búsqueda (y el autocompletado) usa BusquedaCatalogo en lugar
+    # de icontains sobre search_fields
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if search_term.isdigit():
+            return queryset.filter(id_libro=int(search_term)), False
+        return BusquedaCatalogo.buscar(search_term, queryset), False
+
+    def get_changelist(self, request, **kwargs):
+        return ListadoPorRelevancia
 custom_admin_site.register(Libro, LibroAdmin)
 
 from django.db import transaction
 from django.http import JsonResponse
 
 #admin.site.register(Prestamo)
-class PrestamoAdmin(ImportExportModelAdmin):
+class PrestamoAdmin(ImportacionMasivaAdmin):
+    resource_classes = [PrestamoResource]
     list_display = ('id_prestamo', 'libro', 'alumno', 'fecha_prestamo', 'fecha_devolucion', 'estado_display')
-    list_filter = ('libro', 'fecha_prestamo', 'fecha_devolucion')
+    list_select_related = Prestamo.LISTADO_RELACIONADOS
+    # Tablas de millones de filas: total estimado y sin el segundo COUNT(*)
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    list_filter = (('libro', FiltroAutocompletar), ('alumno', FiltroAutocompletar), 'fecha_devolucion')
+    date_hierarchy = 'fecha_prestamo'
     search_fields = ('id_prestamo', 'libro__titulo', 'alumno__nombre')
     raw_id_fields = ('libro', 'alumno')
     ordering = ('id_prestamo', 'fecha_prestamo')
@@ -509,13 +634,11 @@ class PrestamoAdmin(ImportExportModelAdmin):
     
     # NUEVO: Método para validar disponibilidad en tiempo real
     def validacion_disponibilidad(self, obj):
-        if obj and obj.libro:
-            from .models import Prestamo
-            # Verificar si el libro ya está prestado
-            prestado = Prestamo.objects.filter(
-                libro=obj.libro,
-                fecha_devolucion__isnull=True
-            ).exclude(pk=obj.pk if obj.pk else None).exists()
+        if obj and obj.libro_id:
+            from .disponibilidad import DisponibilidadLibros
+            # Verificar si el libro ya está prestado (en otro préstamo)
+            info = DisponibilidadLibros.consultar(obj.libro_id)
+            prestado = bool(info and info['prestado'] and info['id_prestamo'] != obj.pk)
             
             if prestado:
                 return '<span style="color:red;font-weight:bold;">LIBRO PRESTADO - No disponible</span>'
@@ -546,47 +669,67 @@ class PrestamoAdmin(ImportExportModelAdmin):
         custom_urls = [
             path('check-libro/<int:libro_id>/', self.admin_site.admin_view(self.check_libro_disponible), 
                  name='check_libro_disponible'),
+            path('check-libros/', self.admin_site.admin_view(self.check_libros_disponibles),
+                 name='check_libros_disponibles'),
         ]
         return custom_urls + urls
     
     #Endpoint para validación AJAX
     def check_libro_disponible(self, request, libro_id):
-        from .models import Prestamo, Libro
-        try:
-            libro = Libro.objects.get(id_libro=libro_id)
-            
-            # Verificar si está prestado
-            prestado = Prestamo.objects.filter(
-                libro=libro,
-                fecha_devolucion__isnull=True
-            ).exists()
-            
-            data = {
-                'disponible': not prestado,
-                'libro': libro.titulo,
-                'autor': libro.autor.nombre if libro.autor else 'Sin autor',
-                'prestado': prestado,
-                'mensaje': 'No disponible' if prestado else 'Disponible'
-            }
-            
-            if prestado:
-                # Obtener información del préstamo activo
-                prestamo_activo = Prestamo.objects.filter(
-                    libro=libro,
-                    fecha_devolucion__isnull=True
-                ).first()
-                
-                if prestamo_activo:
-                    data.update({
-                        'prestado_a': prestamo_activo.alumno.nombre,
-                        'desde': prestamo_activo.fecha_prestamo.strftime('%d/%m/%Y'),
-                        'id_prestamo': prestamo_activo.id_prestamo
-                    })
-            
-            return JsonResponse(data)
-            
-        except Libro.DoesNotExist:
+        from .disponibilidad import DisponibilidadLibros
+        info = DisponibilidadLibros.consultar(libro_id)
+        if info is None:
             return JsonResponse({'error': 'Libro no encontrado'}, status=404)
+        return JsonResponse(self._datos_disponibilidad(info))
+
+    # Máximo de libros por consulta en lote (una pila de mostrador)
+    MAX_LIBROS_LOTE = 100
+
+    #Endpoint para validar varios libros a la vez: ?ids=1,2,3
+    def check_libros_disponibles(self, request):
+        from .disponibilidad import DisponibilidadLibros
+        valores = ','.join(request.GET.getlist('ids')).split(',')
+        try:
+            libro_ids = [int(valor) for valor in valores if valor.strip()]
+        except ValueError:
+            return JsonResponse({'error': 'IDs de libro inválidos'}, status=400)
+
+        if not libro_ids:
+            return JsonResponse({'error': 'No se enviaron IDs de libro'}, status=400)
+        if len(libro_ids) > self.MAX_LIBROS_LOTE:
+            return JsonResponse(
+                {'error': f'Máximo {self.MAX_LIBROS_LOTE} libros por consulta'}, status=400
+            )
+
+        encontrados = DisponibilidadLibros.consultar_varios(libro_ids)
+        return JsonResponse({
+            'libros': {
+                str(libro_id): self._datos_disponibilidad(info)
+                for libro_id, info in encontrados.items()
+            },
+            'no_encontrados': [libro_id for libro_id in dict.fromkeys(libro_ids) if libro_id not in encontrados],
+        })
+
+    def _datos_disponibilidad(self, info):
+        """Respuesta JSON del endpoint de validación a partir de DisponibilidadLibros"""
+        prestado = info['prestado']
+        data = {
+            'disponible': not prestado,
+            'libro': info['titulo'],
+            'autor': info['autor'] or 'Sin autor',
+            'prestado': prestado,
+            'mensaje': 'No disponible' if prestado else 'Disponible'
+        }
+        
+        if prestado:
+            # Información del préstamo activo
+            data.update({
+                'prestado_a': info['prestado_a'],
+                'desde': info['desde'].strftime('%d/%m/%Y'),
+                'id_prestamo': info['id_prestamo']
+            })
+        
+        return data
     
     # NUEVO: Sobrescribir save_model con transacción y validación visual
     def save_model(self, request, obj, form, change):
@@ -595,15 +738,12 @@ class PrestamoAdmin(ImportExportModelAdmin):
             with transaction.atomic():
                 # Validar disponibilidad (solo para nuevos préstamos)
                 if not change:  # Es un nuevo préstamo
-                    from .models import Prestamo
+                    from .disponibilidad import DisponibilidadLibros
                     
-                    # Verificar si el libro ya está prestado
-                    libro_prestado = Prestamo.objects.filter(
-                        libro=obj.libro,
-                        fecha_devolucion__isnull=True
-                    ).exists()
+                    # Verificar si el libro ya está prestado (sin cache: decide el préstamo)
+                    info = DisponibilidadLibros.consultar(obj.libro_id, usar_cache=False)
                     
-                    if libro_prestado:
+                    if info and info['prestado']:
                         # Lanzar excepción con mensaje amigable
                         raise Exception(
                             f'TRANSACCIÓN CANCELADA: El libro "{obj.libro.titulo}" '
@@ -635,7 +775,8 @@ class PrestamoAdmin(ImportExportModelAdmin):
 custom_admin_site.register(Prestamo, PrestamoAdmin)
 
 #admin.site.register(Usuario)
-class UsuarioAdmin(ImportExportModelAdmin):
+class UsuarioAdmin(ImportacionMasivaAdmin):
+    resource_classes = [UsuarioResource]
     list_display = ('id_usuario', 'nombre')
     list_filter = ('nombre',)
     search_fields = ('id_usuario', 'nombre')
@@ -643,10 +784,49 @@ class UsuarioAdmin(ImportExportModelAdmin):
 custom_admin_site.register(Usuario, UsuarioAdmin)
 
 #admin.site.register(Historial)
-class HistorialAdmin(ImportExportModelAdmin):
+class HistorialAdmin(ImportacionMasivaAdmin):
+    resource_classes = [HistorialResource]
     list_display = ('id_historial', 'alumno', 'libro', 'fecha_prestamo', 'fecha_devolucion')
-    list_filter = ('fecha_prestamo', 'fecha_devolucion')
+    list_select_related = Historial.LISTADO_RELACIONADOS
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    list_filter = (('libro', FiltroAutocompletar), ('alumno', FiltroAutocompletar), 'fecha_devolucion')
+    date_hierarchy = 'fecha_prestamo'
     search_fields = ('id_historial', 'alumno__nombre', 'libro__titulo')
     raw_id_fields = ('alumno', 'libro')
     ordering = ('id_historial', 'fecha_prestamo')
 custom_admin_site.register(Historial, HistorialAdmin)
+
+
+class ArchivoAdmin(admin.ModelAdmin):
+    """Consulta de las tablas de archivo (ver archivo.py): solo lectura"""
+    list_display = ('alumno', 'libro', 'fecha_prestamo', 'fecha_devolucion', 'archivado')
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    date_hierarchy = 'fecha_prestamo'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).para_listado()
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class PrestamoArchivadoAdmin(ArchivoAdmin):
+    list_display = ('id_prestamo', *ArchivoAdmin.list_display)
+    list_select_related = PrestamoArchivado.LISTADO_RELACIONADOS
+    ordering = ('-fecha_prestamo',)
+custom_admin_site.register(PrestamoArchivado, PrestamoArchivadoAdmin)
+
+
+class HistorialArchivadoAdmin(ArchivoAdmin):
+    list_display = ('id_historial', *ArchivoAdmin.list_display)
+    list_select_related = HistorialArchivado.LISTADO_RELACIONADOS
+    ordering = ('-fecha_prestamo',)
+custom_admin_site.register(HistorialArchivado, HistorialArchivadoAdmin)
@@ -0,0 +1,96 @@
+import logging
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import FilaResultado, ResultadoProcedimiento
+
+logger = logging.getLogger(__name__)
+
+
+class AlmacenResultados:
+    """
+    Guarda los resultados de los procedimientos en la base de datos.
+
+    El reporte se escribe una sola vez (una fila por registro) y en la
+    redirección solo viaja su token; la vista de resultados lo lee por
+    páginas con un rango sobre (resultado, conjunto, orden). Los resultados
+    vencidos se borran cada vez que se guarda uno nuevo.
+    """
+
+    DURACION = timedelta(minutes=getattr(settings, 'BIBLIOTECA_RESULTADOS_MINUTOS', 60))
+    TAMANO_PAGINA = getattr(settings, 'BIBLIOTECA_RESULTADOS_PAGINA', 50)
+    TAMANO_LOTE = 1000
+
+    @staticmethod
+    def guardar(procedimiento_id, resultado, usuario=None):
+        """Guarda un dict success/error/resultados y regresa el token para consultarlo"""
+        AlmacenResultados.purgar()
+
+        conjuntos = resultado.get('resultados') or []
+        registro = ResultadoProcedimiento(
+            id_resultado=secrets.token_urlsafe(16),
+            procedimiento_id=procedimiento_id,
+            usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+            success=resultado.get('success', False),
+            error=resultado.get('error'),
+            tamanos=[len(filas) for filas in conjuntos],
+            expira=timezone.now() + AlmacenResultados.DURACION,
+        )
+
+        with transaction.atomic():
+            registro.save(force_insert=True)
+            FilaResultado.objects.bulk_create(
+                (FilaResultado(resultado=registro, conjunto=conjunto, orden=orden, datos=datos)
+                 for conjunto, filas in enumerate(conjuntos)
+                 for orden, datos in enumerate(filas)),
+                batch_size=AlmacenResultados.TAMANO_LOTE,
+            )
+        return registro.id_resultado
+
+    @staticmethod
+    def obtener(id_resultado, usuario=None):
+        """Resultado vigente con ese token, o None; si se da usuario, debe ser el dueño"""
+        if not id_resultado:
+            return None
+        registros = ResultadoProcedimiento.objects.filter(pk=id_resultado, expira__gt=timezone.now())
+        if usuario is not None:
+            registros = registros.filter(usuario=usuario)
+        return registros.first()
+
+    @staticmethod
+    def total_paginas(registro, tamano=None):
+        tamano = tamano or AlmacenResultados.TAMANO_PAGINA
+        mayor = max(registro.tamanos, default=0)
+        return max(1, -(-mayor // tamano))
+
+    @staticmethod
+    def pagina(registro, numero=1, tamano=None):
+        """
+        Filas de la página indicada, agrupadas por conjunto de resultados
+        (misma forma que 'resultados' en ProcedimientosBiblioteca).
+        """
+        tamano = tamano or AlmacenResultados.TAMANO_PAGINA
+        inicio = (numero - 1) * tamano
+        conjuntos = [[] for _ in registro.tamanos]
+        filas = (
+            FilaResultado.objects
+            .filter(resultado=registro, orden__gte=inicio, orden__lt=inicio + tamano)
+            .order_by('conjunto', 'orden')
+            .values_list('conjunto', 'datos')
+        )
+        for conjunto, datos in filas:
+            conjuntos[conjunto].append(datos)
+        return conjuntos
+
+    @staticmethod
+    def purgar():
+        """Elimina los resultados vencidos con sus filas"""
+        vencidos = ResultadoProcedimiento.objects.filter(expira__lte=timezone.now())
+        borrados, _ = vencidos.delete()
+        if borrados:
+            logger.info(f"Resultados de procedimientos vencidos eliminados: {borrados} registros")
+        return borrados
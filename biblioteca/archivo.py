@@ -0,0 +1,129 @@
+from contextlib import contextmanager
+from datetime import date, timedelta
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Historial, HistorialArchivado, Prestamo, PrestamoArchivado
+from .procedimientos import ProcedimientosBiblioteca
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _sin_triggers():
+    """Desactiva los triggers de la biblioteca en esta conexión (solo MySQL los tiene)"""
+    if connection.vendor != 'mysql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SET @biblioteca_sin_triggers = 1")
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SET @biblioteca_sin_triggers = NULL")
+
+
+class ArchivoPrestamos:
+    """
+    Archivo de préstamos cerrados.
+
+    Los préstamos devueltos hace más de ANTIGUEDAD_DIAS, y su historial, se
+    mueven a biblioteca_prestamoarchivado / biblioteca_historialarchivado con
+    INSERT ... SELECT + DELETE por lotes de llaves primarias, cada lote en su
+    propia transacción. Los triggers se desactivan mientras tanto: mover un
+    préstamo no es devolverlo ni borrarlo, y total_prestamos no debe bajar.
+
+    Los reportes por fecha consultan también el archivo cuando su rango lo
+    incluye (ver ProcedimientosBiblioteca.procedimiento_reporte_carrera).
+    """
+
+    ANTIGUEDAD_DIAS = getattr(settings, 'BIBLIOTECA_ARCHIVO_DIAS', 730)
+    TAMANO_LOTE = getattr(settings, 'BIBLIOTECA_ARCHIVO_LOTE', 2000)
+    # (tabla en uso, tabla de archivo)
+    TABLAS = ((Prestamo, PrestamoArchivado), (Historial, HistorialArchivado))
+
+    @staticmethod
+    def fecha_limite(antiguedad_dias=None):
+        """Se archivan los préstamos devueltos antes de esta fecha"""
+        if antiguedad_dias is None:
+            antiguedad_dias = ArchivoPrestamos.ANTIGUEDAD_DIAS
+        return date.today() - timedelta(days=antiguedad_dias)
+
+    @staticmethod
+    def pendientes(modelo, limite):
+        return modelo.objects.filter(fecha_devolucion__isnull=False, fecha_devolucion__lt=limite)
+
+    @staticmethod
+    def archivar(antiguedad_dias=None, tamano_lote=None, progreso=None):
+        """
+        Mueve al archivo los préstamos y el historial devueltos antes de la fecha límite.
+
+        progreso: función opcional que recibe un dict por cada lote movido
+        """
+        limite = ArchivoPrestamos.fecha_limite(antiguedad_dias)
+        tamano_lote = tamano_lote or ArchivoPrestamos.TAMANO_LOTE
+        resultado = {'success': True, 'limite': limite, 'tablas': {}, 'lotes': 0}
+
+        with _sin_triggers():
+            for modelo, archivo in ArchivoPrestamos.TABLAS:
+                filas, lotes = ArchivoPrestamos._archivar_tabla(modelo, archivo, limite, tamano_lote, progreso)
+                resultado['tablas'][modelo._meta.db_table] = filas
+                resultado['lotes'] += lotes
+
+        total = sum(resultado['tablas'].values())
+        if total:
+            ProcedimientosBiblioteca.invalidar_reportes()
+        resultado['mensaje'] = (
+            f"Archivo terminado: {total} filas devueltas antes del {limite} movidas "
+            f"en {resultado['lotes']} lotes ({resultado['tablas']})"
+        )
+        logger.info(resultado['mensaje'])
+        return resultado
+
+    @staticmethod
+    def _archivar_tabla(modelo, archivo, limite, tamano_lote, progreso):
+        nombre = connection.ops.quote_name
+        tabla = nombre(modelo._meta.db_table)
+        pk = nombre(modelo._meta.pk.column)
+        # Mismas columnas en las dos tablas; 'archivado' la pone el motor
+        columnas = ', '.join(
+            nombre(campo.column) for campo in archivo._meta.concrete_fields if campo.name != 'archivado'
+        )
+        # La condición se repite en el INSERT y el DELETE: si un préstamo
+        # cambió después de leer los ids, no se mueve en este lote
+        condicion = "fecha_devolucion IS NOT NULL AND fecha_devolucion < %s"
+
+        filas = lotes = 0
+        ultimo = None
+        while True:
+            pendientes = ArchivoPrestamos.pendientes(modelo, limite)
+            if ultimo is not None:
+                pendientes = pendientes.filter(pk__gt=ultimo)
+            ids = list(pendientes.order_by('pk').values_list('pk', flat=True)[:tamano_lote])
+            if not ids:
+                break
+
+            marcadores = ', '.join(['%s'] * len(ids))
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {nombre(archivo._meta.db_table)} ({columnas}) "
+                    f"SELECT {columnas} FROM {tabla} WHERE {pk} IN ({marcadores}) AND {condicion}",
+                    [*ids, limite],
+                )
+                cursor.execute(f"DELETE FROM {tabla} WHERE {pk} IN ({marcadores}) AND {condicion}", [*ids, limite])
+                movidas = cursor.rowcount
+
+            filas += movidas
+            lotes += 1
+            ultimo = ids[-1]
+            if progreso:
+                progreso({
+                    'tabla': modelo._meta.db_table,
+                    'lote': lotes,
+                    'hasta': ultimo,
+                    'filas': movidas,
+                })
+        return filas, lotes
@@ -0,0 +1,114 @@
+"""
+Backend MySQL con pool de conexiones.
+
+Se configura en DATABASES con ENGINE = 'biblioteca.backends.mysql_pool' y
+OPTIONS['pool'] = True o un dict con los parámetros de PoolConexiones
+(maximo, espera, inactividad, vida_maxima). Sin 'pool' se comporta igual que
+django.db.backends.mysql.
+
+Con CONN_MAX_AGE = 0 Django "cierra" la conexión al terminar cada petición;
+aquí eso la devuelve al pool en lugar de cerrarla, y la siguiente petición
+la toma verificada con un ping en lugar de abrir otra. Antes de devolverla
+se limpia el estado de sesión (LIMPIAR_SESION); si no se puede, se cierra.
+"""
+from functools import partial
+import os
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.mysql.base import Database
+from django.db.backends.mysql.base import DatabaseWrapper as MySQLDatabaseWrapper
+
+from .pool import PoolAgotado, PoolConexiones
+
+PARAMETROS_POOL = ('maximo', 'espera', 'inactividad', 'vida_maxima')
+# Estado de sesión que la aplicación cambia y que no debe pasar a otra petición
+LIMPIAR_SESION = ("SET @biblioteca_sin_triggers = NULL",)
+
+# Un pool por alias de base de datos en cada proceso
+_pools = {}
+_candado = threading.Lock()
+
+
+def _verificar(conexion):
+    # Sin reconectar: si la conexión murió, el pool abre otra limpia
+    conexion.ping(False)
+
+
+class DatabaseWrapper(MySQLDatabaseWrapper):
+    # Permite medir sin el pool en el mismo proceso (bench_conexiones)
+    usar_pool = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool_conexion = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def configuracion_pool(self):
+        configuracion = self.settings_dict['OPTIONS'].get('pool')
+        if not configuracion:
+            return None
+        if configuracion is True:
+            return {}
+        desconocidos = set(configuracion) - set(PARAMETROS_POOL)
+        if desconocidos:
+            raise ImproperlyConfigured(
+                f"Parámetros de OPTIONS['pool'] desconocidos: {', '.join(sorted(desconocidos))}"
+            )
+        return dict(configuracion)
+
+    @property
+    def pool(self):
+        """Pool de este alias en el proceso actual (None si no está configurado)"""
+        configuracion = self.configuracion_pool()
+        if configuracion is None:
+            return None
+        with _candado:
+            pid, pool = _pools.get(self.alias, (None, None))
+            # Después de un fork las conexiones del padre no se comparten
+            if pid != os.getpid():
+                pool = PoolConexiones(verificar=_verificar, **configuracion)
+                _pools[self.alias] = (os.getpid(), pool)
+            return pool
+
+    def metricas_pool(self):
+        pool = self.pool
+        return pool.metricas() if pool else None
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool if self.usar_pool else None
+        self._pool_conexion = pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            return pool.obtener(partial(super().get_new_connection, conn_params))
+        except PoolAgotado as e:
+            raise Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        pool, self._pool_conexion = self._pool_conexion, None
+        if pool is None or self.connection is None:
+            return super()._close()
+        # Dentro de un atomic la conexión queda a medias: no se reutiliza
+        descartar = self.in_atomic_block
+        if not descartar:
+            descartar = not self._limpiar_sesion(self.connection)
+        pool.devolver(self.connection, descartar=descartar)
+
+    def _limpiar_sesion(self, conexion):
+        """Deja la sesión como nueva antes de devolverla al pool; False si no se pudo"""
+        try:
+            if not self.autocommit:
+                conexion.rollback()
+            # Una petición que falló a la mitad de _sin_triggers() (archivo,
+            # restauraciones) no debe dejar los triggers apagados a la siguiente
+            with conexion.cursor() as cursor:
+                for sentencia in LIMPIAR_SESION:
+                    cursor.execute(sentencia)
+        except Database.Error:
+            return False
+        return True
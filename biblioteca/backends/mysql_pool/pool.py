@@ -0,0 +1,169 @@
+from collections import deque
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PoolAgotado(Exception):
+    """Todas las conexiones del pool siguen en uso después de la espera máxima"""
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones DB-API compartido por los hilos de un proceso.
+
+    - maximo: conexiones abiertas a la vez (en uso + libres); si se llega al
+      tope, obtener() espera hasta ``espera`` segundos a que se devuelva una
+    - cada conexión libre se verifica al sacarla (verificar); si falla se
+      cierra y se abre otra en su lugar
+    - las conexiones libres más de ``inactividad`` segundos, o abiertas hace
+      más de ``vida_maxima``, se cierran (antes de que lo haga wait_timeout)
+
+    Las libres se reutilizan de la más reciente a la más antigua, así las que
+    sobran cuando baja la carga quedan quietas y expiran.
+    """
+
+    def __init__(self, maximo=10, espera=5.0, inactividad=300.0, vida_maxima=3600.0, verificar=None):
+        self.maximo = maximo
+        self.espera = espera
+        self.inactividad = inactividad
+        self.vida_maxima = vida_maxima
+        self.verificar = verificar
+        self._condicion = threading.Condition()
+        # (conexion, creada, devuelta), la más reciente a la derecha
+        self._libres = deque()
+        self._creadas = {}
+        self._abiertas = 0
+        self._contadores = dict.fromkeys(
+            ('creadas', 'reutilizadas', 'descartadas', 'expiradas', 'esperas', 'agotado'), 0,
+        )
+        self._segundos_espera = 0.0
+
+    def obtener(self, conectar):
+        """Conexión libre y verificada del pool, o una nueva con ``conectar()`` si hay cupo"""
+        inicio = time.monotonic()
+        cerrar = []
+        libre = None
+        try:
+            with self._condicion:
+                esperando = False
+                while True:
+                    cerrar.extend(self._expirar(time.monotonic()))
+                    if self._libres:
+                        libre = self._libres.pop()
+                        break
+                    if self._abiertas < self.maximo:
+                        self._abiertas += 1
+                        break
+                    restante = self.espera - (time.monotonic() - inicio)
+                    if restante <= 0:
+                        self._contadores['agotado'] += 1
+                        raise PoolAgotado(
+                            f"Las {self.maximo} conexiones del pool siguen en uso después de {self.espera} s"
+                        )
+                    if not esperando:
+                        esperando = True
+                        self._contadores['esperas'] += 1
+                    self._condicion.wait(restante)
+                if esperando:
+                    self._segundos_espera += time.monotonic() - inicio
+        finally:
+            for conexion in cerrar:
+                self._cerrar(conexion)
+
+        if libre is not None:
+            conexion, creada, _ = libre
+            if self._verificar(conexion):
+                with self._condicion:
+                    self._contadores['reutilizadas'] += 1
+                return conexion
+            # Se cierra y su lugar en el pool lo ocupa una conexión nueva
+            self._cerrar(conexion)
+            with self._condicion:
+                self._creadas.pop(id(conexion), None)
+                self._contadores['descartadas'] += 1
+
+        try:
+            conexion = conectar()
+        except BaseException:
+            with self._condicion:
+                self._abiertas -= 1
+                self._condicion.notify()
+            raise
+        with self._condicion:
+            self._creadas[id(conexion)] = time.monotonic()
+            self._contadores['creadas'] += 1
+        return conexion
+
+    def devolver(self, conexion, descartar=False):
+        """Regresa una conexión al pool; con ``descartar`` (o si ya es vieja) se cierra"""
+        ahora = time.monotonic()
+        with self._condicion:
+            creada = self._creadas.get(id(conexion), ahora)
+            descartar = descartar or ahora - creada >= self.vida_maxima
+            if descartar:
+                self._creadas.pop(id(conexion), None)
+                self._abiertas -= 1
+            else:
+                self._libres.append((conexion, creada, ahora))
+            self._condicion.notify()
+        if descartar:
+            self._cerrar(conexion)
+
+    def cerrar_libres(self):
+        """Cierra las conexiones que no están en uso"""
+        with self._condicion:
+            libres = [conexion for conexion, _, _ in self._libres]
+            self._libres.clear()
+            for conexion in libres:
+                self._creadas.pop(id(conexion), None)
+            self._abiertas -= len(libres)
+            self._condicion.notify_all()
+        for conexion in libres:
+            self._cerrar(conexion)
+
+    def metricas(self):
+        with self._condicion:
+            return {
+                **self._contadores,
+                'segundos_espera': round(self._segundos_espera, 6),
+                'abiertas': self._abiertas,
+                'libres': len(self._libres),
+                'en_uso': self._abiertas - len(self._libres),
+                'maximo': self.maximo,
+            }
+
+    def _expirar(self, ahora):
+        """Saca (sin cerrarlas) las libres inactivas o viejas; se llama con el candado tomado"""
+        vencidas = []
+        vigentes = deque()
+        for conexion, creada, devuelta in self._libres:
+            if ahora - devuelta >= self.inactividad or ahora - creada >= self.vida_maxima:
+                vencidas.append(conexion)
+                self._creadas.pop(id(conexion), None)
+            else:
+                vigentes.append((conexion, creada, devuelta))
+        if vencidas:
+            self._libres = vigentes
+            self._abiertas -= len(vencidas)
+            self._contadores['expiradas'] += len(vencidas)
+        return vencidas
+
+    def _verificar(self, conexion):
+        if self.verificar is None:
+            return True
+        try:
+            self.verificar(conexion)
+        except Exception as e:
+            logger.info(f"Conexión del pool descartada al verificarla: {e}")
+            return False
+        return True
+
+    @staticmethod
+    def _cerrar(conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
@@ -0,0 +1,172 @@
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
+
+from .models import Libro, TerminoLibro
+from .texto import normalizar, terminos
+
+
+class BusquedaCatalogo:
+    """
+    Búsqueda de libros por título, autor, categoría y editorial con relevancia.
+
+    Cada libro guarda en texto_busqueda esos campos normalizados (sin
+    acentos ni mayúsculas), y el título y el autor también por separado. En
+    MySQL la búsqueda es MATCH ... AGAINST en modo booleano sobre el índice
+    FULLTEXT de texto_busqueda, y la relevancia le suma la de los índices
+    del título y del autor con su peso (PESOS_FULLTEXT); en los demás
+    motores se usa el índice invertido TerminoLibro (una fila por palabra y
+    libro con el peso del campo donde aparece). En los dos casos cada
+    palabra de la consulta funciona como prefijo y todas deben aparecer, y
+    el título pesa más que el autor y éste más que categoría y editorial.
+
+    Los save() del ORM reindexan por señales (signals.py); la importación
+    masiva reindexa en after_import y reindexar_catalogo reconstruye todo.
+    """
+
+    # (lookup, peso): el peso ordena los resultados en el índice invertido
+    CAMPOS = (
+        ('titulo', 3),
+        ('autor__nombre', 2),
+        ('categoria__nombre', 1),
+        ('editorial__nombre', 1),
+    )
+    # Columna con índice FULLTEXT propio, campo de CAMPOS que guarda y peso
+    # en la relevancia de MySQL; más el 1 de texto_busqueda dan los de CAMPOS
+    PESOS_FULLTEXT = (
+        ('titulo_busqueda', 'titulo', 2),
+        ('autor_busqueda', 'autor__nombre', 1),
+    )
+    MAXIMO_TERMINOS = 8
+    MAXIMO_RESULTADOS = getattr(settings, 'BIBLIOTECA_BUSQUEDA_RESULTADOS', 50)
+    TAMANO_LOTE = 1000
+
+    @staticmethod
+    def usa_fulltext():
+        return connection.vendor == 'mysql'
+
+    @staticmethod
+    def _terminos_con_peso(valores):
+        pesos = {}
+        for valor, (_, peso) in zip(valores, BusquedaCatalogo.CAMPOS):
+            for termino in terminos(valor):
+                pesos[termino] = max(peso, pesos.get(termino, 0))
+        return pesos
+
+    @staticmethod
+    def reindexar(queryset=None):
+        """Recalcula texto_busqueda (y TerminoLibro sin FULLTEXT) de los libros del queryset"""
+        queryset = (Libro.objects.all() if queryset is None else queryset).order_by()
+        invertido = not BusquedaCatalogo.usa_fulltext()
+        por_separado = [(columna, lookup) for columna, lookup, _ in BusquedaCatalogo.PESOS_FULLTEXT]
+        lookups = [lookup for lookup, _ in BusquedaCatalogo.CAMPOS]
+        total = 0
+        ultimo = None
+        while True:
+            bloque = queryset if ultimo is None else queryset.filter(pk__gt=ultimo)
+            filas = list(bloque.order_by('pk').values_list('pk', *lookups)[:BusquedaCatalogo.TAMANO_LOTE])
+            if not filas:
+                break
+
+            libros = []
+            terminos_libro = []
+            for pk, *valores in filas:
+                por_campo = dict(zip(lookups, valores))
+                libros.append(Libro(
+                    pk=pk,
+                    texto_busqueda=normalizar(' '.join(v for v in valores if v)),
+                    **{columna: normalizar(por_campo[lookup]) for columna, lookup in por_separado},
+                ))
+                if invertido:
+                    terminos_libro.extend(
+                        TerminoLibro(libro_id=pk, termino=termino, peso=peso)
+                        for termino, peso in BusquedaCatalogo._terminos_con_peso(valores).items()
+                    )
+
+            with transaction.atomic():
+                Libro.objects.bulk_update(libros, ['texto_busqueda', *(columna for columna, _ in por_separado)])
+                if invertido:
+                    ids = [libro.pk for libro in libros]
+                    TerminoLibro.objects.filter(libro_id__in=ids).delete()
+                    TerminoLibro.objects.bulk_create(terminos_libro, batch_size=BusquedaCatalogo.TAMANO_LOTE)
+
+            total += len(filas)
+            ultimo = filas[-1][0]
+            if len(filas) < BusquedaCatalogo.TAMANO_LOTE:
+                break
+        return total
+
+    @staticmethod
+    def buscar(consulta, queryset=None):
+        """
+        Libros que contienen todas las palabras de ``consulta`` (como prefijo),
+        anotados con ``relevancia`` y ordenados de mayor a menor.
+        """
+        queryset = Libro.objects.all() if queryset is None else queryset
+        palabras = terminos(consulta)[:BusquedaCatalogo.MAXIMO_TERMINOS]
+        if not palabras:
+            # Solo palabras cortas: no están en el índice
+            consulta = (consulta or '').strip()
+            if not consulta:
+                return queryset.none()
+            return queryset.filter(titulo__istartswith=consulta).annotate(
+                relevancia=models.Value(0.0, output_field=models.FloatField()),
+            ).order_by('titulo', 'pk')
+
+        if BusquedaCatalogo.usa_fulltext():
+            return BusquedaCatalogo._buscar_fulltext(palabras, queryset)
+        return BusquedaCatalogo._buscar_invertido(palabras, queryset)
+
+    @staticmethod
+    def _buscar_fulltext(palabras, queryset):
+        tabla = connection.ops.quote_name(Libro._meta.db_table)
+
+        def match(columna):
+            return f"MATCH({tabla}.{connection.ops.quote_name(columna)}) AGAINST (%s IN BOOLEAN MODE)"
+
+        # Solo hay letras y números: no se cuelan operadores del modo booleano
+        todas = ' '.join(f'+{palabra}*' for palabra in palabras)
+        alguna = ' '.join(f'{palabra}*' for palabra in palabras)
+        # WHERE MATCH(...) > 0 sobre texto_busqueda: el optimizador usa su índice
+        # FULLTEXT (una suma o un filtro booleano no lo usarían). El título y
+        # el autor solo suman a la relevancia, con cualquiera de las palabras
+        coincide = RawSQL(match('texto_busqueda'), (todas,), output_field=models.FloatField())
+        relevancia = ' + '.join([
+            match('texto_busqueda'),
+            *(f"{peso} * {match(columna)}" for columna, _, peso in BusquedaCatalogo.PESOS_FULLTEXT),
+        ])
+        parametros = (todas, *(alguna for _ in BusquedaCatalogo.PESOS_FULLTEXT))
+        return (
+            queryset
+            .alias(coincide=coincide)
+            .filter(coincide__gt=0)
+            .annotate(relevancia=RawSQL(relevancia, parametros, output_field=models.FloatField()))
+            .order_by('-relevancia', 'pk')
+        )
+
+    @staticmethod
+    def _buscar_invertido(palabras, queryset):
+        alguna = reduce(or_, (models.Q(termino__startswith=palabra) for palabra in palabras))
+        por_palabra = {
+            f'p{i}': models.Max(models.Case(
+                models.When(termino__startswith=palabra, then=1), default=0,
+            ))
+            for i, palabra in enumerate(palabras)
+        }
+        coincidencias = (
+            TerminoLibro.objects.filter(alguna)
+            .values('libro')
+            .annotate(**por_palabra)
+            .filter(**{nombre: 1 for nombre in por_palabra})
+            .annotate(puntaje=models.Sum('peso'))
+        )
+        relevancia = coincidencias.filter(libro=models.OuterRef('pk')).values('puntaje')[:1]
+        return (
+            queryset
+            .filter(pk__in=coincidencias.values('libro'))
+            .annotate(relevancia=models.Subquery(relevancia, output_field=models.FloatField()))
+            .order_by('-relevancia', 'pk')
+        )
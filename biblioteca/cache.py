@@ -0,0 +1,112 @@
+import threading
+import time
+
+_FALTANTE = object()
+
+
+class CacheLocal:
+    """
+    Cache en memoria del proceso con expiración (TTL).
+
+    Cada worker tiene la suya; el TTL acota qué tan desactualizada puede
+    quedar una entrada cuando el cambio ocurre en otro proceso.
+    """
+
+    def __init__(self, ttl, maximo=10000):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._datos = {}
+        self._lock = threading.Lock()
+        self._calculando = {}
+        self._generacion = 0
+
+    def obtener(self, clave, defecto=None):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return defecto
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return defecto
+            return valor
+
+    @property
+    def generacion(self):
+        """Cambia con cada invalidación; se toma antes de leer lo que se va a guardar"""
+        return self._generacion
+
+    def guardar(self, clave, valor, ttl=None):
+        with self._lock:
+            self._guardar(clave, valor, ttl)
+
+    def guardar_si_vigente(self, generacion, clave, valor, ttl=None):
+        """
+        guardar() solo si no hubo invalidaciones desde ``generacion``.
+
+        Un valor leído antes de una invalidación ya puede estar viejo; se
+        regresa False y no se guarda.
+        """
+        with self._lock:
+            if generacion != self._generacion:
+                return False
+            self._guardar(clave, valor, ttl)
+            return True
+
+    def _guardar(self, clave, valor, ttl):
+        # Se llama con el candado tomado
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._datos.pop(clave, None)
+        if len(self._datos) >= self.maximo:
+            # Se descarta la entrada más antigua
+            del self._datos[next(iter(self._datos))]
+        self._datos[clave] = (expira, valor)
+
+    def obtener_o_calcular(self, clave, calcular, guardar_si=None):
+        """
+        Regresa el valor en cache o lo calcula una sola vez.
+
+        Si varios hilos piden la misma clave al mismo tiempo, solo uno ejecuta
+        ``calcular`` y los demás esperan su resultado. Si hubo una invalidación
+        mientras se calculaba, el valor se regresa pero no se guarda.
+        """
+        valor = self.obtener(clave, _FALTANTE)
+        if valor is not _FALTANTE:
+            return valor
+
+        with self._lock:
+            candado = self._calculando.setdefault(clave, threading.Lock())
+
+        with candado:
+            try:
+                valor = self.obtener(clave, _FALTANTE)
+                if valor is not _FALTANTE:
+                    return valor
+
+                generacion = self.generacion
+                valor = calcular()
+                if guardar_si is None or guardar_si(valor):
+                    self.guardar_si_vigente(generacion, clave, valor)
+                return valor
+            finally:
+                with self._lock:
+                    if self._calculando.get(clave) is candado:
+                        del self._calculando[clave]
+
+    def invalidar(self, *claves):
+        with self._lock:
+            self._generacion += 1
+            for clave in claves:
+                self._datos.pop(clave, None)
+
+    def invalidar_si(self, condicion):
+        """Elimina las entradas cuya clave cumple ``condicion(clave)``"""
+        with self._lock:
+            self._generacion += 1
+            for clave in [clave for clave in self._datos if condicion(clave)]:
+                del self._datos[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._generacion += 1
+            self._datos.clear()
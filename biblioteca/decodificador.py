@@ -0,0 +1,138 @@
+from decimal import Decimal
+
+from django.db import connection
+
+
+def _decimal(valor):
+    if valor is None:
+        return None
+    # Comparado en Decimal: float() redondea los valores grandes y 1e17 + 0.5
+    # parecería entero
+    return int(valor) if valor == valor.to_integral_value() else float(valor)
+
+
+def _decimal_entero(valor):
+    return None if valor is None else int(valor)
+
+
+def _isoformat(valor):
+    return None if valor is None else valor.isoformat()
+
+
+def _convertidor_por_valor(valor):
+    """Convertidor para una columna a partir de su primer valor no nulo"""
+    if isinstance(valor, Decimal):
+        return _decimal
+    if hasattr(valor, 'isoformat'):
+        return _isoformat
+    return None
+
+
+def _tipos_mysql():
+    """type_code de cursor.description -> convertidor, si el driver es MySQL"""
+    constantes = getattr(connection.Database, 'constants', None)
+    tipos = getattr(constantes, 'FIELD_TYPE', None)
+    if connection.vendor != 'mysql' or tipos is None:
+        return None
+
+    convertidores = dict.fromkeys(
+        [tipos.TINY, tipos.SHORT, tipos.LONG, tipos.LONGLONG, tipos.INT24, tipos.YEAR,
+         tipos.FLOAT, tipos.DOUBLE, tipos.VARCHAR, tipos.VAR_STRING, tipos.STRING,
+         tipos.BLOB, tipos.TINY_BLOB, tipos.MEDIUM_BLOB, tipos.LONG_BLOB, tipos.ENUM,
+         tipos.TIME, tipos.JSON],
+    )
+    convertidores.update({
+        tipos.DECIMAL: _decimal,
+        tipos.NEWDECIMAL: _decimal,
+        tipos.DATE: _isoformat,
+        tipos.NEWDATE: _isoformat,
+        tipos.DATETIME: _isoformat,
+        tipos.TIMESTAMP: _isoformat,
+    })
+    return convertidores
+
+
+_DESCONOCIDO = object()
+
+
+class DecodificadorResultados:
+    """
+    Convierte filas de un cursor a tipos serializables en JSON.
+
+    El convertidor de cada columna se decide una sola vez a partir de
+    cursor.description (o del primer valor no nulo si el driver no da el
+    tipo); las columnas que no necesitan conversión (enteros, texto) no se
+    tocan y las demás se convierten sin revisar el tipo de cada celda.
+    """
+
+    FORMATOS = ('dict', 'tupla', 'columnas')
+
+    def __init__(self, description):
+        tipos = _tipos_mysql()
+        self.columnas = [col[0] for col in description]
+        self.convertidores = []
+        for col in description:
+            convertidor = _DESCONOCIDO if tipos is None else tipos.get(col[1], _DESCONOCIDO)
+            if convertidor is _decimal and len(col) > 5 and col[5] == 0:
+                # DECIMAL(n, 0): siempre entero
+                convertidor = _decimal_entero
+            self.convertidores.append(convertidor)
+
+    @classmethod
+    def desde_cursor(cls, cursor):
+        return cls(cursor.description)
+
+    def _activos(self, filas):
+        """[(indice, convertidor)] de las columnas que sí requieren conversión"""
+        activos = []
+        for indice, convertidor in enumerate(self.convertidores):
+            if convertidor is _DESCONOCIDO:
+                primero = next((fila[indice] for fila in filas if fila[indice] is not None), None)
+                if primero is None:
+                    # Columna sin datos todavía: se decide en el siguiente lote
+                    continue
+                convertidor = self.convertidores[indice] = _convertidor_por_valor(primero)
+            if convertidor is not None:
+                activos.append((indice, convertidor))
+        return activos
+
+    def convertir(self, filas, formato='dict'):
+        """
+        Convierte las filas al formato pedido:
+          - 'dict': lista de diccionarios columna -> valor
+          - 'tupla': lista de tuplas
+          - 'columnas': diccionario columna -> lista de valores
+        """
+        if formato not in self.FORMATOS:
+            raise ValueError(f"Formato no soportado: {formato}")
+
+        if not filas:
+            return {nombre: [] for nombre in self.columnas} if formato == 'columnas' else []
+
+        activos = self._activos(filas)
+
+        if formato == 'columnas':
+            columnas = list(zip(*filas))
+            for indice, convertidor in activos:
+                columnas[indice] = map(convertidor, columnas[indice])
+            return {nombre: list(valores) for nombre, valores in zip(self.columnas, columnas)}
+
+        if formato == 'tupla':
+            if not activos:
+                return [tuple(fila) for fila in filas]
+            columnas = list(zip(*filas))
+            for indice, convertidor in activos:
+                columnas[indice] = map(convertidor, columnas[indice])
+            return list(zip(*columnas))
+
+        # dict: fila por fila, pero solo se tocan las columnas que lo necesitan
+        nombres = self.columnas
+        if not activos:
+            return [dict(zip(nombres, fila)) for fila in filas]
+        resultado = []
+        for fila in filas:
+            fila = list(fila)
+            for indice, convertidor in activos:
+                fila[indice] = convertidor(fila[indice])
+            resultado.append(dict(zip(nombres, fila)))
+        return resultado
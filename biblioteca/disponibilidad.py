@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db.models import F, OuterRef, Subquery
+
+from .cache import CacheLocal
+from .models import Libro, Prestamo
+
+
+class DisponibilidadLibros:
+    """
+    Responde "¿está disponible el libro X y quién lo tiene?" en una sola consulta.
+
+    Los resultados se guardan en una cache del proceso que se invalida al
+    crear, devolver o eliminar un préstamo (ver signals.py).
+    """
+
+    cache = CacheLocal(ttl=getattr(settings, 'BIBLIOTECA_DISPONIBILIDAD_TTL', 30))
+
+    @staticmethod
+    def _consulta():
+        activo = Prestamo.objects.filter(
+            libro=OuterRef('pk'),
+            fecha_devolucion__isnull=True,
+        ).order_by('id_prestamo')
+
+        return Libro.objects.annotate(
+            autor_nombre=F('autor__nombre'),
+            prestamo_id=Subquery(activo.values('id_prestamo')[:1]),
+            prestado_a=Subquery(activo.values('alumno__nombre')[:1]),
+            prestado_desde=Subquery(activo.values('fecha_prestamo')[:1]),
+        ).values('id_libro', 'titulo', 'autor_nombre', 'prestamo_id', 'prestado_a', 'prestado_desde')
+
+    @staticmethod
+    def _formatear(fila):
+        prestado = fila['prestamo_id'] is not None
+        return {
+            'id_libro': fila['id_libro'],
+            'titulo': fila['titulo'],
+            'autor': fila['autor_nombre'],
+            'disponible': not prestado,
+            'prestado': prestado,
+            'id_prestamo': fila['prestamo_id'],
+            'prestado_a': fila['prestado_a'],
+            'desde': fila['prestado_desde'],
+        }
+
+    @classmethod
+    def consultar(cls, libro_id, usar_cache=True):
+        """Disponibilidad de un libro o None si no existe"""
+        return cls.consultar_varios([libro_id], usar_cache=usar_cache).get(libro_id)
+
+    @classmethod
+    def consultar_varios(cls, libro_ids, usar_cache=True):
+        """
+        Disponibilidad de varios libros: {id_libro: info}.
+
+        Lo que no está en cache se resuelve en una sola consulta agrupada;
+        los IDs que no existen no aparecen en el resultado. Con
+        usar_cache=False no se lee ni se escribe la cache.
+        """
+        resultado = {}
+        faltantes = []
+        for libro_id in dict.fromkeys(libro_ids):
+            info = cls.cache.obtener(libro_id) if usar_cache else None
+            if info is None:
+                faltantes.append(libro_id)
+            else:
+                resultado[libro_id] = dict(info)
+
+        if faltantes:
+            # Si un préstamo se confirma mientras se consulta, lo leído ya no se guarda
+            generacion = cls.cache.generacion
+            for fila in cls._consulta().filter(id_libro__in=faltantes):
+                info = cls._formatear(fila)
+                if usar_cache:
+                    cls.cache.guardar_si_vigente(generacion, fila['id_libro'], info)
+                resultado[fila['id_libro']] = dict(info)
+
+        return resultado
+
+    @classmethod
+    def invalidar(cls, *libro_ids):
+        cls.cache.invalidar(*libro_ids)
@@ -0,0 +1,57 @@
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class FiltroAutocompletar(admin.FieldListFilter):
+    """
+    Filtro del listado para una llave foránea que busca mientras se escribe.
+
+    RelatedFieldListFilter pinta un enlace por cada registro relacionado (un
+    libro, un autor...) en cada carga del listado. Este filtro solo consulta
+    el registro seleccionado; las opciones se piden a la vista de
+    autocompletado del admin, así que el admin del modelo relacionado debe
+    tener search_fields. Los scripts de select2 los agrega el ModelAdmin
+    con media_autocompletar().
+    """
+
+    template = 'admin/filtro_autocompletar.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.parametro = f'{field_path}__{field.target_field.name}__exact'
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.title = field.verbose_name
+        self.admin_site = model_admin.admin_site
+
+    def expected_parameters(self):
+        return [self.parametro]
+
+    def get_facet_counts(self, pk_attname, filtered_qs):
+        return {}
+
+    def _selector(self):
+        widget = AutocompleteSelect(
+            self.field, self.admin_site, attrs={'style': 'width: 100%'},
+            choices=self.field.formfield().choices,
+        )
+        return widget.render(f'filtro_{self.parametro}', self.used_parameters.get(self.parametro))
+
+    def choices(self, changelist):
+        seleccionado = self.parametro in self.used_parameters
+        yield {
+            'selected': not seleccionado,
+            'query_string': changelist.get_query_string(remove=[self.parametro]),
+            'display': 'Todos',
+        }
+        yield {
+            'selector': self._selector(),
+            'query_string': changelist.get_query_string({self.parametro: '__valor__'}),
+        }
+
+
+def media_autocompletar(model_admin):
+    """Scripts de select2 si algún filtro del admin es FiltroAutocompletar"""
+    for filtro in model_admin.list_filter:
+        if isinstance(filtro, (list, tuple)) and filtro[1] is FiltroAutocompletar:
+            campo = model_admin.model._meta.get_field(filtro[0])
+            return AutocompleteSelect(campo, model_admin.admin_site).media
+    return None
@@ -1,52 +1,63 @@
 from django import forms
 from .models import *
 
-class LibroForm(forms.ModelForm):   
+
+class FormularioBase(forms.ModelForm):
+    """ModelForm cuyos selects de llaves foráneas solo cargan los campos de __str__"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for campo in self.fields.values():
+            queryset = getattr(campo, 'queryset', None)
+            if queryset is not None and hasattr(queryset, 'para_opciones'):
+                campo.queryset = queryset.para_opciones()
+
+class LibroForm(FormularioBase):
     class Meta:   
         model = Libro   
         fields = '__all__'
 
-class AlumnoForm(forms.ModelForm):
+class AlumnoForm(FormularioBase):
     class Meta:
         model = Alumno
         fields = '__all__'
 
-class AutorForm(forms.ModelForm):
+class AutorForm(FormularioBase):
     class Meta:
         model = Autor
         fields = '__all__'
 
-class CarreraForm(forms.ModelForm):
+class CarreraForm(FormularioBase):
     class Meta:
         model = Carrera
         fields = '__all__'
 
-class CategoriaForm(forms.ModelForm):
+class CategoriaForm(FormularioBase):
     class Meta:
         model = Categoria
         fields = '__all__'
 
-class EditorialForm(forms.ModelForm):
+class EditorialForm(FormularioBase):
     class Meta:
         model = Editorial
         fields = '__all__'
 
-class HistorialForm(forms.ModelForm):
+class HistorialForm(FormularioBase):
     class Meta:
         model = Historial
         fields = '__all__'
 
-class UsuarioForm(forms.ModelForm):
+class UsuarioForm(FormularioBase):
     class Meta:
         model = Usuario
         fields = '__all__'  
 
-class PrestamoForm(forms.ModelForm):
+class PrestamoForm(FormularioBase):
     class Meta:
         model = Prestamo
         fields = '__all__'
 
-class SancionForm(forms.ModelForm):
+class SancionForm(FormularioBase):
     class Meta:
         model = Sancion
         fields = '__all__'
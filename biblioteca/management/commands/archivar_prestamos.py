@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from biblioteca.archivo import ArchivoPrestamos
+
+
+class Command(BaseCommand):
+    help = 'Mueve los préstamos devueltos hace tiempo (y su historial) a las tablas de archivo por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None,
+                            help=f'Antigüedad mínima de la devolución (por defecto {ArchivoPrestamos.ANTIGUEDAD_DIAS})')
+        parser.add_argument('--lote', type=int, default=None, help='Filas por lote')
+        parser.add_argument('--simular', action='store_true', help='Solo contar lo que se archivaría')
+
+    def handle(self, *args, **options):
+        limite = ArchivoPrestamos.fecha_limite(options['dias'])
+
+        if options['simular']:
+            for modelo, _ in ArchivoPrestamos.TABLAS:
+                total = ArchivoPrestamos.pendientes(modelo, limite).count()
+                self.stdout.write(f"{modelo._meta.db_table}: {total} filas devueltas antes del {limite}")
+            return
+
+        self.stdout.write(f"Archivando préstamos devueltos antes del {limite}...")
+        resultado = ArchivoPrestamos.archivar(
+            antiguedad_dias=options['dias'],
+            tamano_lote=options['lote'],
+            progreso=self.mostrar_progreso,
+        )
+        self.stdout.write(self.style.SUCCESS(resultado['mensaje']))
+
+    def mostrar_progreso(self, avance):
+        self.stdout.write(
+            f"  {avance['tabla']} lote {avance['lote']}: hasta {avance['hasta']} → {avance['filas']} filas"
+        )
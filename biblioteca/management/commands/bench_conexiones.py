@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from biblioteca.models import Libro
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de check_libro_disponible abriendo una conexión por petición y con el pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--muestras', type=int, default=300, help='Peticiones por medición')
+        parser.add_argument('--usuario', type=str, default=None,
+                            help='Usuario staff para el admin (por defecto el primer superusuario)')
+
+    def handle(self, *args, **options):
+        usuario = (User.objects.filter(username=options['usuario']) if options['usuario']
+                   else User.objects.filter(is_superuser=True)).first()
+        libro = Libro.objects.order_by('pk').first()
+        if usuario is None or libro is None:
+            self.stdout.write(self.style.ERROR("Se necesita un superusuario (o --usuario) y al menos un libro"))
+            return
+
+        url = reverse('custom_admin:check_libro_disponible', args=[libro.pk])
+        cliente = Client()
+        cliente.force_login(usuario)
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            if not hasattr(connection, 'metricas_pool') or connection.configuracion_pool() is None:
+                self.stdout.write("El backend no tiene pool configurado: solo se mide sin pool")
+                self.reportar('Sin pool', self.medir(cliente, url, options['muestras']))
+                return
+
+            connection.usar_pool = False
+            try:
+                self.reportar('Sin pool', self.medir(cliente, url, options['muestras']))
+            finally:
+                connection.usar_pool = True
+            self.reportar('Con pool', self.medir(cliente, url, options['muestras']))
+
+        self.stdout.write(f"\nMétricas del pool: {connection.metricas_pool()}")
+
+    def medir(self, cliente, url, muestras):
+        # El cliente de pruebas no cierra la conexión al terminar la petición;
+        # se cierra a mano, como lo hace Django con CONN_MAX_AGE = 0
+        connection.close()
+        for _ in range(5):
+            cliente.get(url)
+            connection.close()
+
+        tiempos = []
+        for _ in range(muestras):
+            inicio = time.perf_counter()
+            respuesta = cliente.get(url)
+            connection.close()
+            tiempos.append(time.perf_counter() - inicio)
+            if respuesta.status_code != 200:
+                raise RuntimeError(f"{url} respondió {respuesta.status_code}")
+        return tiempos
+
+    def reportar(self, titulo, tiempos):
+        valores = sorted(t * 1000 for t in tiempos)
+        p95 = valores[int(len(valores) * 0.95) - 1]
+        self.stdout.write(self.style.SUCCESS(f"\n{titulo}"))
+        self.stdout.write(
+            f"  check_libro_disponible prom {statistics.mean(valores):7.3f} ms  "
+            f"p50 {statistics.median(valores):7.3f} ms  p95 {p95:7.3f} ms"
+        )
@@ -0,0 +1,99 @@
+import gc
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from biblioteca.decodificador import DecodificadorResultados
+
+# type_code de MySQL (pymysql.constants.FIELD_TYPE)
+LONG, NEWDECIMAL, DATE, VAR_STRING, LONGLONG = 3, 246, 10, 253, 8
+
+DESCRIPTION = [
+    # (nombre, type_code, display_size, internal_size, precision, scale, null_ok)
+    ('id_carrera', LONG, None, 11, 11, 0, False),
+    ('carrera_nombre', VAR_STRING, None, 200, 200, 0, False),
+    ('total_prestamos', LONGLONG, None, 21, 21, 0, False),
+    ('duracion_promedio', NEWDECIMAL, None, 12, 10, 2, True),
+    ('fecha', DATE, None, 10, 10, 0, True),
+]
+
+
+def convertir_por_valor(columns, rows):
+    """Conversión anterior: cadena de isinstance/hasattr por cada celda"""
+    converted_rows = []
+    for row in rows:
+        converted_row = {}
+        for i, value in enumerate(row):
+            column_name = columns[i]
+            if isinstance(value, Decimal):
+                try:
+                    if value % 1 == 0:
+                        converted_row[column_name] = int(value)
+                    else:
+                        converted_row[column_name] = float(value)
+                except:
+                    converted_row[column_name] = float(value)
+            elif hasattr(value, 'isoformat'):
+                converted_row[column_name] = value.isoformat()
+            elif value is None:
+                converted_row[column_name] = None
+            else:
+                converted_row[column_name] = value
+        converted_rows.append(converted_row)
+    return converted_rows
+
+
+class Command(BaseCommand):
+    help = 'Compara la conversión celda por celda contra DecodificadorResultados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=100000)
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        azar = random.Random(7)
+        inicio = date(2025, 1, 1)
+        filas = [
+            (
+                i,
+                f'Carrera {i % 40}',
+                azar.randint(0, 5000),
+                None if i % 10 == 0 else Decimal(azar.randint(0, 3000)) / 100,
+                inicio + timedelta(days=i % 365),
+            )
+            for i in range(options['filas'])
+        ]
+        columnas = [col[0] for col in DESCRIPTION]
+        self.stdout.write(f"{len(filas)} filas x {len(columnas)} columnas, mejor de {options['repeticiones']}")
+
+        mediciones = {
+            'celda por celda (anterior)': lambda: convertir_por_valor(columnas, filas),
+            'decodificador dict': lambda: DecodificadorResultados(DESCRIPTION).convertir(filas),
+            'decodificador tupla': lambda: DecodificadorResultados(DESCRIPTION).convertir(filas, 'tupla'),
+            'decodificador columnas': lambda: DecodificadorResultados(DESCRIPTION).convertir(filas, 'columnas'),
+        }
+
+        esperado = convertir_por_valor(columnas, filas)
+        if DecodificadorResultados(DESCRIPTION).convertir(filas) != esperado:
+            self.stdout.write(self.style.ERROR("El decodificador no produce el mismo resultado"))
+            return
+
+        base = None
+        for nombre, funcion in mediciones.items():
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                # Igual que timeit: sin el recolector de basura durante la medición
+                gc.collect()
+                gc.disable()
+                try:
+                    t = time.perf_counter()
+                    funcion()
+                    tiempos.append(time.perf_counter() - t)
+                finally:
+                    gc.enable()
+            mejor = min(tiempos)
+            base = base or mejor
+            self.stdout.write(f"  {nombre:<28} {mejor * 1000:8.1f} ms  ({base / mejor:4.2f}x)")
@@ -0,0 +1,148 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from biblioteca.models import Alumno, Carrera, Historial, Libro, Prestamo
+
+PREFIJO = 'BENCH-'
+# Índices de las consultas medidas (ver Meta.indexes de Prestamo e Historial)
+INDICES_COMPUESTOS = ('prestamo_libro_devol_idx', 'prestamo_alumno_status_idx', 'historial_libro_alumno_idx')
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de las consultas de disponibilidad y cupo, con y sin índices compuestos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--libros', type=int, default=0,
+                            help='Sembrar N libros con un préstamo cada uno antes de medir')
+        parser.add_argument('--muestras', type=int, default=500, help='Consultas por medición')
+        parser.add_argument('--comparar', action='store_true',
+                            help='Medir sin los índices compuestos y después con ellos')
+        parser.add_argument('--limpiar', action='store_true', help='Eliminar los datos sembrados y salir')
+
+    def handle(self, *args, **options):
+        if options['limpiar']:
+            self.limpiar()
+            return
+
+        if options['libros']:
+            self.sembrar(options['libros'])
+
+        libros = list(Prestamo.objects.values_list('libro_id', flat=True).distinct()[:50000])
+        alumnos = list(Prestamo.objects.values_list('alumno_id', flat=True).distinct()[:50000])
+        if not libros:
+            self.stdout.write(self.style.ERROR("No hay préstamos para medir. Usa --libros N para sembrar."))
+            return
+
+        self.stdout.write(f"Préstamos en la tabla: {Prestamo.objects.count()}")
+        muestras = options['muestras']
+        azar = random.Random(42)
+        libros = [azar.choice(libros) for _ in range(muestras)]
+        alumnos = [azar.choice(alumnos) for _ in range(muestras)]
+
+        if options['comparar']:
+            indices = self.indices_compuestos()
+            with connection.schema_editor() as editor:
+                for modelo, indice in indices:
+                    editor.remove_index(modelo, indice)
+            try:
+                self.reportar('Sin índices compuestos', self.medir(libros, alumnos))
+            finally:
+                with connection.schema_editor() as editor:
+                    for modelo, indice in indices:
+                        editor.add_index(modelo, indice)
+
+        self.reportar('Con índices compuestos', self.medir(libros, alumnos))
+
+    def indices_compuestos(self):
+        # Solo estos: los de fecha_prestamo los usan los reportes y no se tocan
+        indices = []
+        for modelo in (Prestamo, Historial):
+            indices.extend((modelo, indice) for indice in modelo._meta.indexes if indice.name in INDICES_COMPUESTOS)
+        faltantes = set(INDICES_COMPUESTOS) - {indice.name for _, indice in indices}
+        if faltantes:
+            raise CommandError(f"No existen los índices {', '.join(sorted(faltantes))}")
+        return indices
+
+    def medir(self, libros, alumnos):
+        tiempos = {'disponibilidad': [], 'cupo': [], 'historial_abierto': []}
+
+        for libro_id, alumno_id in zip(libros, alumnos):
+            inicio = time.perf_counter()
+            Prestamo.objects.filter(libro_id=libro_id, fecha_devolucion__isnull=True).exists()
+            tiempos['disponibilidad'].append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            Prestamo.objects.filter(alumno_id=alumno_id, status=Prestamo.STATUS_ACTIVO).count()
+            tiempos['cupo'].append(time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            Historial.objects.filter(
+                libro_id=libro_id, alumno_id=alumno_id, fecha_devolucion__isnull=True,
+            ).order_by('-fecha_prestamo').values_list('pk', flat=True).first()
+            tiempos['historial_abierto'].append(time.perf_counter() - inicio)
+
+        return tiempos
+
+    def reportar(self, titulo, tiempos):
+        self.stdout.write(self.style.SUCCESS(f"\n{titulo}"))
+        for consulta, valores in tiempos.items():
+            valores = sorted(v * 1000 for v in valores)
+            p95 = valores[int(len(valores) * 0.95) - 1]
+            self.stdout.write(
+                f"  {consulta:<18} prom {statistics.mean(valores):7.3f} ms  "
+                f"p50 {statistics.median(valores):7.3f} ms  p95 {p95:7.3f} ms"
+            )
+
+    def sembrar(self, total_libros):
+        """Un préstamo por libro, máximo 3 activos por alumno (respeta los triggers)"""
+        self.stdout.write(f"Sembrando {total_libros} libros y préstamos...")
+        lote = 2000
+        hoy = date.today()
+
+        with transaction.atomic():
+            carrera, _ = Carrera.objects.get_or_create(nombre=f'{PREFIJO}CARRERA')
+            Alumno.objects.bulk_create(
+                (Alumno(nombre=f'{PREFIJO}{i}', semestre=1, carrera=carrera)
+                 for i in range((total_libros + 2) // 3)),
+                batch_size=lote,
+            )
+            Libro.objects.bulk_create(
+                (Libro(titulo=f'{PREFIJO}{i}', anio_publicacion='2000') for i in range(total_libros)),
+                batch_size=lote,
+            )
+
+        alumnos = list(Alumno.objects.filter(nombre__startswith=PREFIJO).values_list('id_alumno', flat=True))
+        libros = Libro.objects.filter(titulo__startswith=PREFIJO).values_list('id_libro', flat=True)
+
+        pendientes = []
+        for i, libro_id in enumerate(libros.iterator(chunk_size=lote)):
+            pendientes.append(Prestamo(
+                libro_id=libro_id,
+                alumno_id=alumnos[i // 3],
+                fecha_prestamo=hoy - timedelta(days=i % 365),
+            ))
+            if len(pendientes) >= lote:
+                Prestamo.objects.bulk_create(pendientes)
+                pendientes = []
+        if pendientes:
+            Prestamo.objects.bulk_create(pendientes)
+
+        # Dos de cada tres préstamos quedan devueltos
+        sembrados = Prestamo.objects.filter(alumno__nombre__startswith=PREFIJO)
+        ids = list(sembrados.values_list('id_prestamo', flat=True))
+        devueltos = [pk for i, pk in enumerate(ids) if i % 3]
+        for i in range(0, len(devueltos), lote):
+            Prestamo.objects.filter(pk__in=devueltos[i:i + lote]).update(
+                status=Prestamo.STATUS_DEVUELTO, fecha_devolucion=hoy,
+            )
+        self.stdout.write(f"Sembrados {len(ids)} préstamos ({len(devueltos)} devueltos)")
+
+    def limpiar(self):
+        Carrera.objects.filter(nombre=f'{PREFIJO}CARRERA').delete()
+        Libro.objects.filter(titulo__startswith=PREFIJO).delete()
+        self.stdout.write(self.style.SUCCESS("Datos de prueba eliminados"))
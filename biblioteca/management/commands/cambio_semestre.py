@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from biblioteca.semestres import CambioSemestre
+
+
+class Command(BaseCommand):
+    help = 'Cierre de semestre: promueve alumnos y topa el semestre máximo por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('periodo', type=str, help='Periodo que se cierra, p. ej. 2026-1')
+        parser.add_argument('--tope', type=int, default=12, help='Semestre máximo')
+        parser.add_argument('--lote', type=int, default=None, help='Alumnos por lote (rango de IDs)')
+        parser.add_argument('--sin-promover', action='store_true', help='Solo aplicar el tope')
+        parser.add_argument('--reiniciar', action='store_true', help='Ignorar el avance guardado')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Cerrando semestre {options['periodo']}...")
+
+        resultado = CambioSemestre.ejecutar(
+            periodo=options['periodo'],
+            tope=options['tope'],
+            promover=not options['sin_promover'],
+            tamano_lote=options['lote'],
+            reiniciar=options['reiniciar'],
+            progreso=self.mostrar_progreso,
+        )
+
+        if resultado.get('reanudado'):
+            self.stdout.write("Se reanudó desde el último lote completado")
+        self.stdout.write(self.style.SUCCESS(resultado['mensaje']))
+
+    def mostrar_progreso(self, avance):
+        self.stdout.write(
+            f"  Lote {avance['lote']}: IDs {avance['desde']}-{avance['hasta']} de {avance['limite']} "
+            f"→ {avance['promovidos']} promovidos, {avance['topados']} topados"
+        )
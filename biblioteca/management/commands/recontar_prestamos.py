@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from biblioteca.models import Libro
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero el contador total_prestamos de cada libro'
+
+    def handle(self, *args, **options):
+        self.stdout.write("Recalculando préstamos por libro...")
+        actualizados = Libro.recalcular_total_prestamos()
+        self.stdout.write(self.style.SUCCESS(f"{actualizados} libros actualizados"))
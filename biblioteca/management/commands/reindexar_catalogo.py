@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from biblioteca.busqueda import BusquedaCatalogo
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero el índice de búsqueda del catálogo de libros'
+
+    def handle(self, *args, **options):
+        indice = 'FULLTEXT' if BusquedaCatalogo.usa_fulltext() else 'índice invertido'
+        self.stdout.write(f"Reindexando el catálogo ({indice})...")
+        total = BusquedaCatalogo.reindexar()
+        self.stdout.write(self.style.SUCCESS(f"{total} libros indexados"))
@@ -0,0 +1,76 @@
+from datetime import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biblioteca.models import RegistroRespaldo
+from biblioteca.respaldo_paralelo import RespaldoParalelo, RestauracionParalela
+from biblioteca.respaldos import configuracion_mysql
+
+
+class Command(BaseCommand):
+    help = 'Respaldo completo o incremental y restauración por tablas en paralelo'
+
+    def add_arguments(self, parser):
+        parser.add_argument('accion', choices=['respaldar', 'incremental', 'restaurar'])
+        parser.add_argument('archivos', nargs='*',
+                            help='ZIP de salida, o base seguida de los incrementales a restaurar')
+        parser.add_argument('--procesos', type=int, default=None, help='Procesos en paralelo')
+        parser.add_argument('--desde', default=None,
+                            help='ID del respaldo del que parte el incremental (por defecto, el último)')
+
+    def handle(self, *args, **options):
+        try:
+            config = configuracion_mysql()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        if options['accion'] == 'restaurar':
+            self.restaurar(config, options)
+            return
+
+        anterior = None
+        if options['accion'] == 'incremental':
+            if options['desde']:
+                anterior = RegistroRespaldo.objects.filter(pk=options['desde']).first()
+            else:
+                anterior = RespaldoParalelo.ultimo()
+            if anterior is None:
+                raise CommandError("No hay un respaldo previo; haz primero un respaldo completo")
+
+        sufijo = 'incremental' if anterior else 'paralelo'
+        archivo = (options['archivos'] or [None])[0] or \
+            f"backup-{config['name']}-{datetime.now():%Y%m%d-%H%M%S}-{sufijo}.zip"
+        # Se registra (y el siguiente incremental parte de él) solo con el ZIP completo en su lugar
+        parcial = f'{archivo}.parcial'
+        try:
+            manifiesto = RespaldoParalelo(config, procesos=options['procesos']).respaldar(parcial, anterior=anterior)
+            os.replace(parcial, archivo)
+        finally:
+            if os.path.exists(parcial):
+                os.remove(parcial)
+        RespaldoParalelo.registrar(manifiesto, anterior=anterior, archivo=archivo)
+        for tabla in manifiesto['tablas']:
+            self.stdout.write(f"  {tabla['tabla']:<40} {tabla['filas']:>10} filas  {tabla['bytes']:>12} bytes")
+        self.stdout.write(self.style.SUCCESS(f"Respaldo {manifiesto['id']} guardado en {archivo}"))
+
+    def restaurar(self, config, options):
+        archivos = options['archivos']
+        if not archivos:
+            raise CommandError("Indica el respaldo completo y, después, sus incrementales en orden")
+        for archivo in archivos:
+            if not RestauracionParalela.es_respaldo_paralelo(archivo):
+                raise CommandError(f"{archivo} no es un respaldo paralelo (falta manifest.json)")
+
+        restauracion = RestauracionParalela(config, procesos=options['procesos'], progreso=self.mostrar_progreso)
+        try:
+            restauracion.restaurar_cadena(archivos)
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"Restauración completada: {len(restauracion.archivos)} archivos, "
+            f"{restauracion.bytes / (1024 * 1024):.1f} MB, {restauracion.sentencias} sentencias"
+        ))
+
+    def mostrar_progreso(self, archivo, enviados, sentencias):
+        self.stdout.write(f"  {archivo}: {enviados / (1024 * 1024):.1f} MB, {sentencias} sentencias")
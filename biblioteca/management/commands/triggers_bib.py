@@ -2,6 +2,8 @@ from django.core.management.base import BaseCommand
 from django.db import connection
 from django.utils import timezone
 
+from biblioteca.respaldo_paralelo import MARCAS_CAMBIO, TABLA_LAPIDAS
+
 class Command(BaseCommand):
     
     def handle(self, *args, **options):
@@ -22,6 +24,15 @@ class Command(BaseCommand):
                     pass
             
             print("Todos los triggers anteriores eliminados")
+
+            # Contador de IDs de historial: se inicializa una sola vez con el
+            # máximo actual; a partir de aquí el trigger ya no recorre la tabla
+            cursor.execute("""
+                INSERT IGNORE INTO biblioteca_secuencia (nombre, valor)
+                SELECT 'historial', COALESCE(MAX(CAST(SUBSTRING(id_historial, 2) AS UNSIGNED)), 0)
+                FROM biblioteca_historial
+                WHERE id_historial LIKE 'H%'
+            """)
             print("\n" + "="*60)
             print("Creando NUEVOS triggers correctos...")
             print("="*60)
@@ -38,29 +49,33 @@ class Command(BaseCommand):
                         DECLARE libro_status VARCHAR(12);
                         DECLARE prestamos_activos INT;
                         
-                        -- 1. Verificar estado del libro
-                        SELECT status INTO libro_status
-                        FROM biblioteca_libro 
-                        WHERE id_libro = NEW.libro_id;
-                        
-                        IF libro_status != 'DISPONIBLE' THEN
-                            SIGNAL SQLSTATE '45000'
-                            SET MESSAGE_TEXT = 'Libro no disponible';
-                        END IF;
-                        
-                        -- 2. Verificar límite de préstamos (3 máximo)
-                        SELECT COUNT(*) INTO prestamos_activos
-                        FROM biblioteca_prestamo
-                        WHERE alumno_id = NEW.alumno_id
-                        AND status = 'ACTIVO';
-                        
-                        IF prestamos_activos >= 3 THEN
-                            SIGNAL SQLSTATE '45000'
-                            SET MESSAGE_TEXT = 'Límite de 3 préstamos activos alcanzado';
+                        -- Las restauraciones incrementales cargan filas ya validadas
+                        IF @biblioteca_sin_triggers IS NULL THEN
+                            -- 1. Verificar estado del libro
+                            SELECT status INTO libro_status
+                            FROM biblioteca_libro 
+                            WHERE id_libro = NEW.libro_id;
+                            
+                            IF libro_status != 'DISPONIBLE' THEN
+                                SIGNAL SQLSTATE '45000'
+                                SET MESSAGE_TEXT = 'Libro no disponible';
+                            END IF;
+                            
+                            -- 2. Verificar límite de préstamos (3 máximo)
+                            SELECT COUNT(*) INTO prestamos_activos
+                            FROM biblioteca_prestamo
+                            WHERE alumno_id = NEW.alumno_id
+                            AND status = 'ACTIVO';
+                            
+                            IF prestamos_activos >= 3 THEN
+                                SIGNAL SQLSTATE '45000'
+                                SET MESSAGE_TEXT = 'Límite de 3 préstamos activos alcanzado';
+                            END IF;
+                            
+                            -- 3. Forzar status inicial y marca de cambios (UTC, como Django)
+                            SET NEW.status = 'ACTIVO';
+                            SET NEW.actualizado = UTC_TIMESTAMP(6);
                         END IF;
-                        
-                        -- 3. Forzar status inicial
-                        SET NEW.status = 'ACTIVO';
                     END
                 """)
                 print("✓ Trigger 1: Validación antes de INSERT")
@@ -74,41 +89,46 @@ class Command(BaseCommand):
                     AFTER INSERT ON biblioteca_prestamo
                     FOR EACH ROW
                     BEGIN
-                        DECLARE next_id VARCHAR(10);
-                        DECLARE max_num INT;
+                        DECLARE next_id VARCHAR(25);
+                        DECLARE next_num BIGINT;
                         
-                        -- 1. Cambiar libro a PRESTADO
-                        UPDATE biblioteca_libro 
-                        SET status = 'PRESTADO'
-                        WHERE id_libro = NEW.libro_id;
+                        IF @biblioteca_sin_triggers IS NULL THEN
+                            -- 1. Cambiar libro a PRESTADO y sumar al contador de préstamos
+                            UPDATE biblioteca_libro 
+                            SET status = 'PRESTADO',
+                                total_prestamos = total_prestamos + 1
+                            WHERE id_libro = NEW.libro_id;
                         
-                        -- 2. Generar nuevo ID para historial
-                        -- Obtener el máximo número actual
-                        SELECT MAX(CAST(SUBSTRING(id_historial, 2) AS UNSIGNED)) 
-                        INTO max_num
-                        FROM biblioteca_historial 
-                        WHERE id_historial LIKE 'H%';
+                            -- 2. Generar nuevo ID para historial desde el contador
+                            -- FOR UPDATE bloquea la fila hasta el COMMIT, así que dos
+                            -- préstamos simultáneos nunca obtienen el mismo número
+                            SELECT valor + 1 INTO next_num
+                            FROM biblioteca_secuencia
+                            WHERE nombre = 'historial'
+                            FOR UPDATE;
                         
-                        -- Si no hay registros, empezar en 1
-                        IF max_num IS NULL THEN
-                            SET max_num = 0;
-                        END IF;
+                            UPDATE biblioteca_secuencia
+                            SET valor = next_num
+                            WHERE nombre = 'historial';
                         
-                        -- Crear nuevo ID (H001, H002, etc.)
-                        SET next_id = CONCAT('H', LPAD(max_num + 1, 3, '0'));
+                            -- Crear nuevo ID (H001, H002, ..., H1000)
+                            SET next_id = CONCAT('H', LPAD(next_num, GREATEST(3, CHAR_LENGTH(next_num)), '0'));
                         
-                        -- 3. Insertar en historial con ID generado
-                        INSERT INTO biblioteca_historial 
-                        (id_historial, alumno_id, libro_id, usuario_id, fecha_prestamo)
-                        VALUES (
-                            next_id,
-                            NEW.alumno_id,
-                            NEW.libro_id,
-                            NEW.usuario_id,
-                            NEW.fecha_prestamo
-                        );
+                            -- 3. Insertar en historial con ID generado
+                            INSERT INTO biblioteca_historial 
+                            (id_historial, alumno_id, libro_id, usuario_id, fecha_prestamo, actualizado)
+                            VALUES (
+                                next_id,
+                                NEW.alumno_id,
+                                NEW.libro_id,
+                                NEW.usuario_id,
+                                NEW.fecha_prestamo,
+                                UTC_TIMESTAMP(6)
+                            );
+                        END IF;
                     END
                 """)
+                print("✓ Trigger 2: Historial con ID de biblioteca_secuencia")
             except Exception as e:
                 print(f"✗ Error Trigger 2: {e}")
             
@@ -119,21 +139,26 @@ class Command(BaseCommand):
                     BEFORE UPDATE ON biblioteca_prestamo
                     FOR EACH ROW
                     BEGIN
-                        -- Si cambia de ACTIVO a DEVUELTO
-                        IF OLD.status = 'ACTIVO' AND NEW.status = 'DEVUELTO' THEN
-                            -- Poner fecha de devolución si no tiene
-                            IF NEW.fecha_devolucion IS NULL THEN
-                                SET NEW.fecha_devolucion = CURDATE();
-                            END IF;
+                        IF @biblioteca_sin_triggers IS NULL THEN
+                            -- Marca de cambios para respaldos incrementales (UTC, como Django)
+                            SET NEW.actualizado = UTC_TIMESTAMP(6);
+                            
+                            -- Si cambia de ACTIVO a DEVUELTO
+                            IF OLD.status = 'ACTIVO' AND NEW.status = 'DEVUELTO' THEN
+                                -- Poner fecha de devolución si no tiene
+                                IF NEW.fecha_devolucion IS NULL THEN
+                                    SET NEW.fecha_devolucion = CURDATE();
+                                END IF;
                             
-                            -- Cambiar libro a DISPONIBLE (esto lo hará otro trigger)
+                                -- Cambiar libro a DISPONIBLE (esto lo hará otro trigger)
                             
-                        -- Si cambia de DEVUELTO a ACTIVO
-                        ELSEIF OLD.status = 'DEVUELTO' AND NEW.status = 'ACTIVO' THEN
-                            -- Quitar fecha de devolución
-                            SET NEW.fecha_devolucion = NULL;
+                            -- Si cambia de DEVUELTO a ACTIVO
+                            ELSEIF OLD.status = 'DEVUELTO' AND NEW.status = 'ACTIVO' THEN
+                                -- Quitar fecha de devolución
+                                SET NEW.fecha_devolucion = NULL;
                             
-                            -- Cambiar libro a PRESTADO (esto lo hará otro trigger)
+                                -- Cambiar libro a PRESTADO (esto lo hará otro trigger)
+                            END IF;
                         END IF;
                     END
                 """)
@@ -148,36 +173,49 @@ class Command(BaseCommand):
                     AFTER UPDATE ON biblioteca_prestamo
                     FOR EACH ROW
                     BEGIN
-                        -- Si cambió de ACTIVO a DEVUELTO
-                        IF OLD.status = 'ACTIVO' AND NEW.status = 'DEVUELTO' THEN
-                            -- Cambiar libro a DISPONIBLE
-                            UPDATE biblioteca_libro 
-                            SET status = 'DISPONIBLE'
-                            WHERE id_libro = NEW.libro_id;
+                        IF @biblioteca_sin_triggers IS NULL THEN
+                            -- Si cambió de ACTIVO a DEVUELTO
+                            IF OLD.status = 'ACTIVO' AND NEW.status = 'DEVUELTO' THEN
+                                -- Cambiar libro a DISPONIBLE
+                                UPDATE biblioteca_libro 
+                                SET status = 'DISPONIBLE'
+                                WHERE id_libro = NEW.libro_id;
                             
-                            -- Actualizar historial
-                            UPDATE biblioteca_historial 
-                            SET fecha_devolucion = NEW.fecha_devolucion
-                            WHERE libro_id = NEW.libro_id 
-                              AND alumno_id = NEW.alumno_id
-                              AND fecha_devolucion IS NULL
-                            ORDER BY fecha_prestamo DESC
-                            LIMIT 1;
+                                -- Actualizar historial
+                                UPDATE biblioteca_historial 
+                                SET fecha_devolucion = NEW.fecha_devolucion
+                                WHERE libro_id = NEW.libro_id 
+                                  AND alumno_id = NEW.alumno_id
+                                  AND fecha_devolucion IS NULL
+                                ORDER BY fecha_prestamo DESC
+                                LIMIT 1;
                             
-                        -- Si cambió de DEVUELTO a ACTIVO (raro, pero posible)
-                        ELSEIF OLD.status = 'DEVUELTO' AND NEW.status = 'ACTIVO' THEN
-                            -- Cambiar libro a PRESTADO
-                            UPDATE biblioteca_libro 
-                            SET status = 'PRESTADO'
-                            WHERE id_libro = NEW.libro_id;
+                            -- Si cambió de DEVUELTO a ACTIVO (raro, pero posible)
+                            ELSEIF OLD.status = 'DEVUELTO' AND NEW.status = 'ACTIVO' THEN
+                                -- Cambiar libro a PRESTADO
+                                UPDATE biblioteca_libro 
+                                SET status = 'PRESTADO'
+                                WHERE id_libro = NEW.libro_id;
+                            
+                                -- Quitar fecha de devolución del historial
+                                UPDATE biblioteca_historial 
+                                SET fecha_devolucion = NULL
+                                WHERE libro_id = NEW.libro_id 
+                                  AND alumno_id = NEW.alumno_id
+                                  AND fecha_devolucion = OLD.fecha_devolucion
+                                LIMIT 1;
+                            END IF;
+                        
+                            -- Si el préstamo se movió a otro libro, mover el contador
+                            IF OLD.libro_id <> NEW.libro_id THEN
+                                UPDATE biblioteca_libro
+                                SET total_prestamos = IF(total_prestamos > 0, total_prestamos - 1, 0)
+                                WHERE id_libro = OLD.libro_id;
                             
-                            -- Quitar fecha de devolución del historial
-                            UPDATE biblioteca_historial 
-                            SET fecha_devolucion = NULL
-                            WHERE libro_id = NEW.libro_id 
-                              AND alumno_id = NEW.alumno_id
-                              AND fecha_devolucion = OLD.fecha_devolucion
-                            LIMIT 1;
+                                UPDATE biblioteca_libro
+                                SET total_prestamos = total_prestamos + 1
+                                WHERE id_libro = NEW.libro_id;
+                            END IF;
                         END IF;
                     END
                 """)
@@ -185,5 +223,54 @@ class Command(BaseCommand):
             except Exception as e:
                 print(f"✗ Error Trigger 4: {e}")
             
+            # Trigger 5: DESPUÉS de DELETE (contador de préstamos)
+            try:
+                cursor.execute("""
+                    CREATE TRIGGER trigger_despues_delete_prestamo
+                    AFTER DELETE ON biblioteca_prestamo
+                    FOR EACH ROW
+                    BEGIN
+                        IF @biblioteca_sin_triggers IS NULL THEN
+                            UPDATE biblioteca_libro
+                            SET total_prestamos = IF(total_prestamos > 0, total_prestamos - 1, 0)
+                            WHERE id_libro = OLD.libro_id;
+                        END IF;
+                    END
+                """)
+                print("✓ Trigger 5: Contador de préstamos después de DELETE")
+            except Exception as e:
+                print(f"✗ Error Trigger 5: {e}")
             
-          
\ No newline at end of file
+            # Trigger 6: ANTES de UPDATE en historial (marca de cambios)
+            try:
+                cursor.execute("""
+                    CREATE TRIGGER trigger_antes_update_historial
+                    BEFORE UPDATE ON biblioteca_historial
+                    FOR EACH ROW
+                    BEGIN
+                        IF @biblioteca_sin_triggers IS NULL THEN
+                            SET NEW.actualizado = UTC_TIMESTAMP(6);
+                        END IF;
+                    END
+                """)
+                print("✓ Trigger 6: Marca de cambios del historial")
+            except Exception as e:
+                print(f"✗ Error Trigger 6: {e}")
+
+            # Trigger 7: DESPUÉS de DELETE en las tablas con marca de cambios
+            # (lápidas para los respaldos incrementales). No depende de
+            # @biblioteca_sin_triggers: archivar un préstamo también lo saca de
+            # la tabla y el incremental debe borrarlo
+            for tabla in MARCAS_CAMBIO:
+                try:
+                    llave = connection.introspection.get_primary_key_column(cursor, tabla)
+                    cursor.execute(f"""
+                        CREATE TRIGGER trigger_lapida_{tabla}
+                        AFTER DELETE ON {tabla}
+                        FOR EACH ROW
+                        INSERT INTO {TABLA_LAPIDAS} (tabla, llave, eliminado)
+                        VALUES ('{tabla}', OLD.{llave}, UTC_TIMESTAMP(6))
+                    """)
+                    print(f"✓ Trigger 7: Lápidas de {tabla}")
+                except Exception as e:
+                    print(f"✗ Error Trigger 7 ({tabla}): {e}")
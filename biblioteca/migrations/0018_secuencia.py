@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:30
+
+import re
+
+from django.db import migrations, models
+
+
+def inicializar_secuencia_historial(apps, schema_editor):
+    """Arranca el contador en el mayor número de historial existente (H001, H12_20251206, ...)"""
+    Historial = apps.get_model('biblioteca', 'Historial')
+    Secuencia = apps.get_model('biblioteca', 'Secuencia')
+
+    patron = re.compile(r'^H(\d+)')
+    maximo = 0
+    for id_historial in Historial.objects.values_list('id_historial', flat=True).iterator():
+        coincidencia = patron.match(id_historial)
+        if coincidencia:
+            maximo = max(maximo, int(coincidencia.group(1)))
+
+    Secuencia.objects.update_or_create(nombre='historial', defaults={'valor': maximo})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0017_puntocontrol'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(inicializar_secuencia_historial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0018_secuencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historial',
+            index=models.Index(fields=['libro', 'alumno', 'fecha_devolucion', 'fecha_prestamo'], name='historial_libro_alumno_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['libro', 'fecha_devolucion'], name='prestamo_libro_devol_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['alumno', 'status'], name='prestamo_alumno_status_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:32
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def calcular_total_prestamos(apps, schema_editor):
+    Libro = apps.get_model('biblioteca', 'Libro')
+    Prestamo = apps.get_model('biblioteca', 'Prestamo')
+    conteo = Prestamo.objects.filter(libro=models.OuterRef('pk')).order_by().values('libro').annotate(
+        total=models.Count('*'),
+    ).values('total')
+    Libro.objects.update(total_prestamos=Coalesce(models.Subquery(conteo), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0019_indices_prestamo_historial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='total_prestamos',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(calcular_total_prestamos, migrations.RunPython.noop),
+    ]
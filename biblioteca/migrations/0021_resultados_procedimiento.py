@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0020_libro_total_prestamos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultadoProcedimiento',
+            fields=[
+                ('id_resultado', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('procedimiento_id', models.CharField(max_length=50)),
+                ('success', models.BooleanField(default=False)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('tamanos', models.JSONField(default=list)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('expira', models.DateTimeField(db_index=True)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FilaResultado',
+            fields=[
+                ('id_fila', models.BigAutoField(primary_key=True, serialize=False)),
+                ('conjunto', models.PositiveSmallIntegerField()),
+                ('orden', models.PositiveIntegerField()),
+                ('datos', models.JSONField()),
+                ('resultado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='filas', to='biblioteca.resultadoprocedimiento')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('resultado', 'conjunto', 'orden'), name='fila_resultado_orden_uniq')],
+            },
+        ),
+    ]
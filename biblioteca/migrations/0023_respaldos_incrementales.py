@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:46
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0022_tareaprocedimiento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historial',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now(), db_index=True),
+        ),
+        migrations.AddField(
+            model_name='prestamo',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True, db_default=django.db.models.functions.datetime.Now(), db_index=True),
+        ),
+        migrations.CreateModel(
+            name='RegistroRespaldo',
+            fields=[
+                ('id_respaldo', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('COMPLETO', 'Completo'), ('INCREMENTAL', 'Incremental')], max_length=12)),
+                ('marcas', models.JSONField(default=dict)),
+                ('archivo', models.CharField(blank=True, max_length=255)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('anterior', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='biblioteca.registrorespaldo')),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0023_respaldos_incrementales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historial',
+            index=models.Index(fields=['fecha_prestamo'], name='historial_fecha_prestamo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prestamo',
+            index=models.Index(fields=['fecha_prestamo'], name='prestamo_fecha_prestamo_idx'),
+        ),
+    ]
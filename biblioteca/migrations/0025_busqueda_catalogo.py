@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:55
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+CAMPOS = (('titulo', 3), ('autor__nombre', 2), ('categoria__nombre', 1), ('editorial__nombre', 1))
+TAMANO_LOTE = 1000
+
+# Copias congeladas de biblioteca.texto: la migración no debe cambiar si ese módulo cambia
+TERMINO_MINIMO = 3
+TERMINO_MAXIMO = 40
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def terminos(texto):
+    return list(dict.fromkeys(
+        palabra[:TERMINO_MAXIMO] for palabra in normalizar(texto).split()
+        if len(palabra) >= TERMINO_MINIMO
+    ))
+
+
+def indexar_catalogo(apps, schema_editor):
+    """Llena texto_busqueda y, sin FULLTEXT (no MySQL), el índice invertido"""
+    Libro = apps.get_model('biblioteca', 'Libro')
+    TerminoLibro = apps.get_model('biblioteca', 'TerminoLibro')
+    invertido = schema_editor.connection.vendor != 'mysql'
+
+    consulta = Libro.objects.order_by('pk').values_list('pk', *(lookup for lookup, _ in CAMPOS))
+    ultimo = 0
+    while True:
+        # Un bloque a la vez: la memoria no crece con el tamaño del catálogo
+        filas = list(consulta.filter(pk__gt=ultimo)[:TAMANO_LOTE])
+        if not filas:
+            break
+        libros = []
+        terminos_libro = []
+        for pk, *valores in filas:
+            libros.append(Libro(pk=pk, texto_busqueda=normalizar(' '.join(v for v in valores if v))))
+            if invertido:
+                pesos = {}
+                for valor, (_, peso) in zip(valores, CAMPOS):
+                    for termino in terminos(valor):
+                        pesos[termino] = max(peso, pesos.get(termino, 0))
+                terminos_libro.extend(
+                    TerminoLibro(libro_id=pk, termino=termino, peso=peso) for termino, peso in pesos.items()
+                )
+        Libro.objects.bulk_update(libros, ['texto_busqueda'])
+        TerminoLibro.objects.bulk_create(terminos_libro, batch_size=TAMANO_LOTE)
+        ultimo = filas[-1][0]
+
+
+def crear_indice_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX libro_texto_busqueda_ft ON biblioteca_libro (texto_busqueda)'
+        )
+
+
+def eliminar_indice_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX libro_texto_busqueda_ft ON biblioteca_libro')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0024_indices_fecha_prestamo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='texto_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.CreateModel(
+            name='TerminoLibro',
+            fields=[
+                ('id_termino', models.BigAutoField(primary_key=True, serialize=False)),
+                ('termino', models.CharField(max_length=40)),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='biblioteca.libro')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('termino', 'libro'), name='termino_libro_uniq')],
+            },
+        ),
+        migrations.RunPython(indexar_catalogo, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice_fulltext, eliminar_indice_fulltext),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:00
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Copia congelada de biblioteca.texto: la migración no debe cambiar si ese módulo cambia
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def clave_nombre(texto):
+    return ' '.join(sorted(normalizar(texto).split()))
+
+
+def calcular_claves(apps, schema_editor):
+    for nombre_modelo in ('Alumno', 'Autor'):
+        modelo = apps.get_model('biblioteca', nombre_modelo)
+        largo = modelo._meta.get_field('nombre_busqueda').max_length
+        registros = [
+            modelo(pk=pk, nombre_busqueda=clave_nombre(nombre)[:largo])
+            for pk, nombre in modelo.objects.order_by('pk').values_list('pk', 'nombre').iterator(chunk_size=1000)
+        ]
+        modelo.objects.bulk_update(registros, ['nombre_busqueda'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0025_busqueda_catalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alumno',
+            name='nombre_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=35),
+        ),
+        migrations.AddField(
+            model_name='autor',
+            name='nombre_busqueda',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(calcular_claves, migrations.RunPython.noop),
+    ]
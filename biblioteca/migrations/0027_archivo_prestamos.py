@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:02
+
+import django.db.models.deletion
+import django.db.models.functions.datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0026_claves_nombre'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistorialArchivado',
+            fields=[
+                ('id_historial', models.CharField(max_length=25, primary_key=True, serialize=False)),
+                ('fecha_prestamo', models.DateField()),
+                ('fecha_devolucion', models.DateField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(editable=False)),
+                ('archivado', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True, editable=False)),
+                ('alumno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.alumno')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.libro')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='biblioteca.usuario')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha_prestamo'], name='historialarch_fecha_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PrestamoArchivado',
+            fields=[
+                ('id_prestamo', models.IntegerField(primary_key=True, serialize=False)),
+                ('fecha_prestamo', models.DateField()),
+                ('fecha_devolucion', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('ACTIVO', 'Activo'), ('DEVUELTO', 'Devuelto')], max_length=12)),
+                ('actualizado', models.DateTimeField(editable=False)),
+                ('archivado', models.DateTimeField(db_default=django.db.models.functions.datetime.Now(), db_index=True, editable=False)),
+                ('alumno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.alumno')),
+                ('libro', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='biblioteca.libro')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='biblioteca.usuario')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha_prestamo'], name='prestamoarch_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:16
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Copia congelada de biblioteca.texto: la migración no debe cambiar si ese módulo cambia
+TERMINO_MAXIMO = 40
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def palabras_nombre(texto):
+    return list(dict.fromkeys(palabra[:TERMINO_MAXIMO] for palabra in normalizar(texto).split()))
+
+
+def indexar_nombres(apps, schema_editor):
+    for nombre_modelo, nombre_termino, columna in (
+        ('Alumno', 'TerminoAlumno', 'alumno_id'), ('Autor', 'TerminoAutor', 'autor_id'),
+    ):
+        modelo = apps.get_model('biblioteca', nombre_modelo)
+        termino = apps.get_model('biblioteca', nombre_termino)
+        termino.objects.bulk_create(
+            (
+                termino(**{columna: pk, 'termino': palabra})
+                for pk, nombre in modelo.objects.order_by('pk').values_list('pk', 'nombre').iterator(chunk_size=1000)
+                for palabra in palabras_nombre(nombre)
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0027_archivo_prestamos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoAlumno',
+            fields=[
+                ('id_termino', models.BigAutoField(primary_key=True, serialize=False)),
+                ('termino', models.CharField(max_length=40)),
+                ('alumno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='biblioteca.alumno')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('termino', 'alumno'), name='termino_alumno_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TerminoAutor',
+            fields=[
+                ('id_termino', models.BigAutoField(primary_key=True, serialize=False)),
+                ('termino', models.CharField(max_length=40)),
+                ('autor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='biblioteca.autor')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('termino', 'autor'), name='termino_autor_uniq')],
+            },
+        ),
+        migrations.RunPython(indexar_nombres, migrations.RunPython.noop),
+    ]
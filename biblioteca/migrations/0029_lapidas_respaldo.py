@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0028_terminos_nombre'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilaEliminada',
+            fields=[
+                ('id_lapida', models.BigAutoField(primary_key=True, serialize=False)),
+                ('tabla', models.CharField(max_length=64)),
+                ('llave', models.CharField(max_length=100)),
+                ('eliminado', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tabla', 'eliminado'], name='fila_eliminada_tabla_idx')],
+            },
+        ),
+    ]
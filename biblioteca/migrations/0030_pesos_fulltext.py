@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:23
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# (columna, campo, índice FULLTEXT)
+COLUMNAS = (
+    ('titulo_busqueda', 'titulo', 'libro_titulo_busqueda_ft'),
+    ('autor_busqueda', 'autor__nombre', 'libro_autor_busqueda_ft'),
+)
+TAMANO_LOTE = 1000
+
+# Copia congelada de biblioteca.texto.normalizar: la migración no debe cambiar si ese módulo cambia
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def llenar_columnas(apps, schema_editor):
+    Libro = apps.get_model('biblioteca', 'Libro')
+    consulta = Libro.objects.order_by('pk').values_list('pk', *(campo for _, campo, _ in COLUMNAS))
+    ultimo = 0
+    while True:
+        filas = list(consulta.filter(pk__gt=ultimo)[:TAMANO_LOTE])
+        if not filas:
+            break
+        libros = [
+            Libro(pk=pk, **{columna: normalizar(valor) for (columna, _, _), valor in zip(COLUMNAS, valores)})
+            for pk, *valores in filas
+        ]
+        Libro.objects.bulk_update(libros, [columna for columna, _, _ in COLUMNAS])
+        ultimo = filas[-1][0]
+
+
+def crear_indices_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        for columna, _, indice in COLUMNAS:
+            schema_editor.execute(f'CREATE FULLTEXT INDEX {indice} ON biblioteca_libro ({columna})')
+
+
+def eliminar_indices_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        for _, _, indice in COLUMNAS:
+            schema_editor.execute(f'DROP INDEX {indice} ON biblioteca_libro')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0029_lapidas_respaldo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='libro',
+            name='autor_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='libro',
+            name='titulo_busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(llenar_columnas, migrations.RunPython.noop),
+        migrations.RunPython(crear_indices_fulltext, eliminar_indices_fulltext),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:41
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0030_pesos_fulltext'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='tareaprocedimiento',
+            name='progreso',
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+# Copia de ProcedimientosBiblioteca.crear_procedimientos_basicos() al crear
+# esta migración: en una instalación existente el reporte cambia a esta
+# versión en cuanto se archiva un préstamo (archivar_prestamos), aunque nadie
+# haya vuelto a crear los procedimientos
+CREAR_PROCEDIMIENTO = """
+    CREATE PROCEDURE ReportePrestamosPorCarreraConArchivo(
+        IN fecha_inicio DATE,
+        IN fecha_fin DATE
+    )
+    BEGIN
+        SELECT 
+            c.id_carrera,
+            c.nombre as carrera_nombre,
+            COUNT(DISTINCT a.id_alumno) as alumnos_activos,
+            COUNT(p.id_prestamo) as total_prestamos,
+            COUNT(DISTINCT p.libro_id) as libros_diferentes,
+            CAST(AVG(DATEDIFF(p.fecha_devolucion, p.fecha_prestamo)) AS DECIMAL(10,2)) as duracion_promedio
+        FROM biblioteca_carrera c
+        LEFT JOIN biblioteca_alumno a ON c.id_carrera = a.carrera_id
+        LEFT JOIN (
+            SELECT id_prestamo, alumno_id, libro_id, fecha_prestamo, fecha_devolucion
+            FROM biblioteca_prestamo
+            WHERE fecha_prestamo BETWEEN fecha_inicio AND fecha_fin
+            UNION ALL
+            SELECT id_prestamo, alumno_id, libro_id, fecha_prestamo, fecha_devolucion
+            FROM biblioteca_prestamoarchivado
+            WHERE fecha_prestamo BETWEEN fecha_inicio AND fecha_fin
+        ) p ON a.id_alumno = p.alumno_id
+        GROUP BY c.id_carrera, c.nombre
+        ORDER BY total_prestamos DESC;
+    END
+"""
+ELIMINAR_PROCEDIMIENTO = "DROP PROCEDURE IF EXISTS ReportePrestamosPorCarreraConArchivo"
+
+
+def crear_procedimiento(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(ELIMINAR_PROCEDIMIENTO)
+        schema_editor.execute(CREAR_PROCEDIMIENTO)
+
+
+def eliminar_procedimiento(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(ELIMINAR_PROCEDIMIENTO)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biblioteca', '0031_sin_progreso_tareas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_procedimiento, eliminar_procedimiento),
+    ]
@@ -1,47 +1,181 @@
+import logging
+
 from django.db import models
+from django.conf import settings
+from django.db.models.functions import Coalesce, Now
 from django.core.validators import MinValueValidator, MaxValueValidator, RegexValidator
 import django.db.transaction as transaction
 from django.core.exceptions import ValidationError
 
+from .texto import TERMINO_MAXIMO, clave_nombre, palabras_nombre
+
+logger = logging.getLogger(__name__)
+
+
+class ListadoQuerySet(models.QuerySet):
+    """
+    QuerySet que sabe qué relaciones cargar en listados y selects.
+
+    Cada modelo declara:
+      - CAMPOS_STR: campos que usa su __str__ (lo mínimo para mostrarlo)
+      - LISTADO_RELACIONADOS: llaves foráneas que se muestran en su listado
+    """
+
+    def para_listado(self):
+        """Trae las relaciones del listado con JOIN para no hacer una consulta por fila"""
+        relacionados = getattr(self.model, 'LISTADO_RELACIONADOS', ())
+        if not relacionados:
+            return self
+        campos = [f.name for f in self.model._meta.concrete_fields]
+        for nombre in relacionados:
+            relacionado = self.model._meta.get_field(nombre).related_model
+            campos_str = getattr(relacionado, 'CAMPOS_STR', None)
+            if campos_str is None:
+                # Sin declaración: se carga el modelo relacionado completo
+                campos.extend(f'{nombre}__{f.name}' for f in relacionado._meta.concrete_fields)
+            else:
+                campos.extend(f'{nombre}__{campo}' for campo in campos_str)
+        return self.select_related(*relacionados).only(*campos)
+
+    def para_opciones(self):
+        """Solo los campos necesarios para pintar cada opción de un select"""
+        campos_str = getattr(self.model, 'CAMPOS_STR', None)
+        return self.only(*campos_str) if campos_str else self
+
+
+class NombreQuerySet(ListadoQuerySet):
+    """ListadoQuerySet de un modelo NombreBuscable"""
+
+    def buscar_nombre(self, consulta):
+        """
+        Registros cuyo nombre tiene, al inicio de alguna de sus palabras, cada
+        palabra de la consulta; sin importar acentos, mayúsculas ni orden.
+        """
+        palabras = palabras_nombre(consulta)
+        if not palabras:
+            return self
+        relacion = self.model._meta.get_field('terminos')
+        terminos = relacion.related_model.objects
+        # Una subconsulta por palabra sobre el índice (termino, registro). Los
+        # términos ya vienen en minúsculas: istartswith es LIKE 'x%' y usa el
+        # índice (startswith sería LIKE BINARY en MySQL y no lo usaría)
+        queryset = self
+        for palabra in palabras:
+            queryset = queryset.filter(
+                pk__in=terminos.filter(termino__istartswith=palabra).values(relacion.field.name),
+            )
+        return queryset
+
+
+class NombreBuscable:
+    """
+    Modelo con un campo nombre_busqueda derivado de nombre (clave_nombre) y un
+    índice de sus palabras (related_name='terminos') para buscar_nombre.
+
+    save() recalcula los dos; bulk_create y bulk_update no llaman a save(),
+    así que quien los use debe llamar antes a actualizar_nombre_busqueda() y
+    después a guardar_terminos() o indexar_nombres().
+    """
+
+    def actualizar_nombre_busqueda(self):
+        largo = self._meta.get_field('nombre_busqueda').max_length
+        self.nombre_busqueda = clave_nombre(self.nombre)[:largo]
+
+    @classmethod
+    def indexar_nombres(cls, queryset=None, tamano_lote=1000):
+        """Recalcula los términos de los registros del queryset; regresa cuántos se indexaron"""
+        queryset = (cls.objects.all() if queryset is None else queryset).order_by()
+        total = 0
+        ultimo = None
+        while True:
+            bloque = queryset if ultimo is None else queryset.filter(pk__gt=ultimo)
+            filas = list(bloque.order_by('pk').values_list('pk', 'nombre')[:tamano_lote])
+            if not filas:
+                break
+            cls.guardar_terminos(filas, tamano_lote)
+            total += len(filas)
+            ultimo = filas[-1][0]
+            if len(filas) < tamano_lote:
+                break
+        return total
+
+    @classmethod
+    def guardar_terminos(cls, filas, tamano_lote=1000):
+        """Reemplaza los términos de cada (pk, nombre) de ``filas``"""
+        relacion = cls._meta.get_field('terminos')
+        modelo, columna = relacion.related_model, relacion.field.attname
+        for inicio in range(0, len(filas), tamano_lote):
+            lote = filas[inicio:inicio + tamano_lote]
+            # Sin savepoint: dentro de otra transacción (una importación) basta con la de afuera
+            with transaction.atomic(savepoint=False):
+                modelo.objects.filter(**{f'{columna}__in': [pk for pk, _ in lote]}).delete()
+                modelo.objects.bulk_create(
+                    [modelo(**{columna: pk, 'termino': termino}) for pk, nombre in lote
+                     for termino in palabras_nombre(nombre)],
+                    batch_size=tamano_lote,
+                )
+
+    def save(self, *args, **kwargs):
+        # Sin nombre_busqueda cargado (nuevo o diferido) no se sabe si cambió
+        clave_anterior = None if self._state.adding else self.__dict__.get('nombre_busqueda')
+        self.actualizar_nombre_busqueda()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nombre' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'nombre_busqueda'}
+        super().save(*args, **kwargs)
+        if self.nombre_busqueda != clave_anterior:
+            self.guardar_terminos([(self.pk, self.nombre)])
+
+
 class Carrera(models.Model):
     id_carrera = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=50, unique=True)
 
+    objects = ListadoQuerySet.as_manager()
+
+    CAMPOS_STR = ('id_carrera', 'nombre')
+
     def __str__(self):
         return f"{self.id_carrera} - {self.nombre}"
 
 
-class Alumno(models.Model):
+class Alumno(NombreBuscable, models.Model):
     id_alumno = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=35)
+    nombre_busqueda = models.CharField(max_length=35, blank=True, default='', editable=False, db_index=True)
     semestre = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(12)])
     carrera = models.ForeignKey(Carrera, on_delete=models.CASCADE)
 
     @classmethod
     def changes(cls):
+        from .semestres import CambioSemestre
         try:
-            with transaction.atomic():
-                x = Alumno.objects.filter(
-                    semestre__gt=9,
-                    semestre__lte=12,
-                )
-                for alumno in x:
-                    alumno.semestre = 9
-                    alumno.save()
-        except Exception as e:
-            print(f"Error durante la actualización: {e}")
-            
+            # Tope a 9 sin promover; se hace con UPDATE por lotes
+            return CambioSemestre.ejecutar(tope=9, promover=False)
+        except Exception:
+            logger.exception("Error durante la actualización de semestres")
+            raise
+
+
+    objects = NombreQuerySet.as_manager()
 
+    CAMPOS_STR = ('id_alumno', 'nombre')
+    LISTADO_RELACIONADOS = ('carrera',)
 
     def __str__(self):
         return f"{self.id_alumno} - {self.nombre}"
 
 
-class Autor(models.Model):
+class Autor(NombreBuscable, models.Model):
     id_autor = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=100)
+    nombre_busqueda = models.CharField(max_length=100, blank=True, default='', editable=False, db_index=True)
     nacionalidad = models.CharField(max_length=50, blank=True, null=True)
 
+    objects = NombreQuerySet.as_manager()
+
+    CAMPOS_STR = ('id_autor', 'nombre', 'nacionalidad')
+
     def __str__(self):
         return f"{self.id_autor} - {self.nombre} - {self.nacionalidad}"
 
@@ -51,6 +185,10 @@ class Editorial(models.Model):
     nombre = models.CharField(max_length=50)
     pais = models.CharField(max_length=50)
 
+    objects = ListadoQuerySet.as_manager()
+
+    CAMPOS_STR = ('id_editorial', 'nombre')
+
     def __str__(self):
         return f"{self.id_editorial} - {self.nombre}"
 
@@ -59,6 +197,10 @@ class Categoria(models.Model):
     id_categoria = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=50, unique=True)
 
+    objects = ListadoQuerySet.as_manager()
+
+    CAMPOS_STR = ('id_categoria', 'nombre')
+
     def __str__(self):
         return f"{self.id_categoria} - {self.nombre}"
 
@@ -84,6 +226,29 @@ class Libro(models.Model):
         max_length=4,
         validators=[RegexValidator(r'^\d{4}$', 'Debe ser un año de 4 dígitos.')]
     )
+    # Lo mantienen los triggers de biblioteca_prestamo (ver triggers_bib);
+    # se reconstruye con: python manage.py recontar_prestamos
+    total_prestamos = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    # Título, autor, categoría y editorial normalizados para la búsqueda del
+    # catálogo, y el título y el autor solos para su peso en la relevancia
+    # (ver busqueda.py); se reconstruyen con: python manage.py reindexar_catalogo
+    texto_busqueda = models.TextField(blank=True, default='', editable=False)
+    titulo_busqueda = models.TextField(blank=True, default='', editable=False)
+    autor_busqueda = models.TextField(blank=True, default='', editable=False)
+
+    @classmethod
+    def recalcular_total_prestamos(cls):
+        """Recalcula el contador de todos los libros con un solo UPDATE (incluye los préstamos archivados)"""
+        def conteo(modelo):
+            return Coalesce(models.Subquery(
+                modelo.objects.filter(libro=models.OuterRef('pk')).order_by().values('libro').annotate(
+                    total=models.Count('*'),
+                ).values('total')
+            ), 0)
+
+        return cls.objects.update(
+            total_prestamos=conteo(Prestamo) + conteo(PrestamoArchivado),
+        )
 
     @classmethod
     def changes(cls):
@@ -96,18 +261,98 @@ class Libro(models.Model):
             except Exception as e:
                 print(f"Error al guardar el libro: {e}")
 
+    objects = ListadoQuerySet.as_manager()
+
+    CAMPOS_STR = ('id_libro', 'titulo')
+    LISTADO_RELACIONADOS = ('autor', 'editorial', 'categoria')
+
     def __str__(self):
         return f"{self.id_libro} - {self.titulo}"
 
 
+class TerminoLibro(models.Model):
+    """Índice invertido del catálogo para los motores sin FULLTEXT (ver busqueda.py)"""
+    id_termino = models.BigAutoField(primary_key=True)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE, related_name='terminos')
+    termino = models.CharField(max_length=40)
+    # Peso del campo de mayor importancia donde aparece (título > autor > categoría/editorial)
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            # También sirve para buscar por prefijo: termino LIKE 'abc%'
+            models.UniqueConstraint(fields=['termino', 'libro'], name='termino_libro_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.termino} - {self.libro_id}"
+
+
+class TerminoAlumno(models.Model):
+    """Palabras del nombre de cada alumno para buscar por prefijo (ver NombreQuerySet)"""
+    id_termino = models.BigAutoField(primary_key=True)
+    alumno = models.ForeignKey(Alumno, on_delete=models.CASCADE, related_name='terminos')
+    termino = models.CharField(max_length=TERMINO_MAXIMO)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['termino', 'alumno'], name='termino_alumno_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.termino} - {self.alumno_id}"
+
+
+class TerminoAutor(models.Model):
+    """Palabras del nombre de cada autor para buscar por prefijo (ver NombreQuerySet)"""
+    id_termino = models.BigAutoField(primary_key=True)
+    autor = models.ForeignKey(Autor, on_delete=models.CASCADE, related_name='terminos')
+    termino = models.CharField(max_length=TERMINO_MAXIMO)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['termino', 'autor'], name='termino_autor_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.termino} - {self.autor_id}"
+
+
 class Usuario(models.Model):
     id_usuario = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=100)
 
+    objects = ListadoQuerySet.as_manager()
+
+    CAMPOS_STR = ('id_usuario', 'nombre')
+
     def __str__(self):
         return f"{self.id_usuario} - {self.nombre}"
 
 
+class Secuencia(models.Model):
+    """Contador por nombre para generar IDs sin recorrer la tabla (p. ej. 'historial')"""
+    nombre = models.CharField(primary_key=True, max_length=50)
+    valor = models.BigIntegerField(default=0)
+
+    @classmethod
+    def siguiente(cls, nombre, cantidad=1):
+        """Reserva ``cantidad`` valores y regresa el último; el UPDATE bloquea la fila"""
+        with transaction.atomic():
+            actualizadas = cls.objects.filter(nombre=nombre).update(valor=models.F('valor') + cantidad)
+            if not actualizadas:
+                secuencia, creada = cls.objects.select_for_update().get_or_create(nombre=nombre)
+                if not creada:
+                    # Otra transacción la creó al mismo tiempo
+                    return cls.siguiente(nombre, cantidad)
+                secuencia.valor = cantidad
+                secuencia.save(update_fields=['valor'])
+            return cls.objects.values_list('valor', flat=True).get(nombre=nombre)
+
+    def __str__(self):
+        return f"{self.nombre} - {self.valor}"
+
+
 class Historial(models.Model):
     id_historial = models.CharField(primary_key=True, max_length=25)
     alumno = models.ForeignKey(Alumno, on_delete=models.CASCADE)
@@ -115,6 +360,36 @@ class Historial(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
     fecha_prestamo = models.DateField()
     fecha_devolucion = models.DateField(null=True, blank=True)
+    # Marca de cambios para los respaldos incrementales; los triggers la
+    # actualizan también en los cambios que no pasan por el ORM
+    actualizado = models.DateTimeField(auto_now=True, db_default=Now(), db_index=True, editable=False)
+
+    objects = ListadoQuerySet.as_manager()
+
+    LISTADO_RELACIONADOS = ('alumno', 'libro', 'usuario')
+
+    class Meta:
+        indexes = [
+            # trigger_despues_update_libro: último historial abierto del libro/alumno
+            models.Index(fields=['libro', 'alumno', 'fecha_devolucion', 'fecha_prestamo'],
+                         name='historial_libro_alumno_idx'),
+            # date_hierarchy del admin y rangos de fechas
+            models.Index(fields=['fecha_prestamo'], name='historial_fecha_prestamo_idx'),
+        ]
+
+    @staticmethod
+    def formatear_id(numero):
+        """Mismo formato que el trigger: H001, H002, ..., H1000"""
+        return f"H{numero:03d}"
+
+    @classmethod
+    def generar_id(cls):
+        return cls.formatear_id(Secuencia.siguiente('historial'))
+
+    def save(self, *args, **kwargs):
+        if not self.id_historial:
+            self.id_historial = Historial.generar_id()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.id_historial} - Alumno: {self.alumno.nombre}"
@@ -133,11 +408,76 @@ class Prestamo(models.Model):
         (STATUS_DEVUELTO, 'Devuelto'),
     ]
     status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=STATUS_ACTIVO)
+    actualizado = models.DateTimeField(auto_now=True, db_default=Now(), db_index=True, editable=False)
     
+    objects = ListadoQuerySet.as_manager()
+
+    LISTADO_RELACIONADOS = ('alumno', 'libro', 'usuario')
+
+    class Meta:
+        indexes = [
+            # Disponibilidad: ¿el libro tiene un préstamo sin devolver?
+            models.Index(fields=['libro', 'fecha_devolucion'], name='prestamo_libro_devol_idx'),
+            # Cupo: préstamos activos del alumno (trigger_validar_antes_insert)
+            models.Index(fields=['alumno', 'status'], name='prestamo_alumno_status_idx'),
+            # date_hierarchy del admin y rangos de fechas de los reportes
+            models.Index(fields=['fecha_prestamo'], name='prestamo_fecha_prestamo_idx'),
+        ]
+
     def __str__(self):
         return f"{self.id_prestamo} - Alumno: {self.alumno.nombre} - Libro: {self.libro.titulo} - Usuario: {self.usuario.nombre if self.usuario else 'Desconocido'} - Prestamo: {self.fecha_prestamo} - Devolución: {self.fecha_devolucion}"
 
 
+class PrestamoArchivado(models.Model):
+    """Préstamo devuelto que se movió fuera de biblioteca_prestamo (ver archivo.py); conserva su id"""
+    id_prestamo = models.IntegerField(primary_key=True)
+    alumno = models.ForeignKey(Alumno, on_delete=models.CASCADE)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
+    fecha_prestamo = models.DateField()
+    fecha_devolucion = models.DateField(null=True, blank=True)
+    status = models.CharField(max_length=12, choices=Prestamo.STATUS_CHOICES)
+    actualizado = models.DateTimeField(editable=False)
+    # Marca de los respaldos incrementales: la tabla solo recibe inserciones
+    archivado = models.DateTimeField(db_default=Now(), db_index=True, editable=False)
+
+    objects = ListadoQuerySet.as_manager()
+
+    LISTADO_RELACIONADOS = ('alumno', 'libro', 'usuario')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha_prestamo'], name='prestamoarch_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_prestamo} - Alumno: {self.alumno.nombre} - Libro: {self.libro.titulo} (archivado)"
+
+
+class HistorialArchivado(models.Model):
+    """Historial de un préstamo devuelto que se movió fuera de biblioteca_historial"""
+    id_historial = models.CharField(primary_key=True, max_length=25)
+    alumno = models.ForeignKey(Alumno, on_delete=models.CASCADE)
+    libro = models.ForeignKey(Libro, on_delete=models.CASCADE)
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True)
+    fecha_prestamo = models.DateField()
+    fecha_devolucion = models.DateField(null=True, blank=True)
+    actualizado = models.DateTimeField(editable=False)
+    archivado = models.DateTimeField(db_default=Now(), db_index=True, editable=False)
+
+    objects = ListadoQuerySet.as_manager()
+
+    LISTADO_RELACIONADOS = ('alumno', 'libro', 'usuario')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fecha_prestamo'], name='historialarch_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_historial} - Alumno: {self.alumno.nombre} (archivado)"
+
+
 class Sancion(models.Model):
     id_sancion = models.AutoField(primary_key=True)
     alumno = models.ForeignKey(Alumno, on_delete=models.CASCADE)
@@ -145,5 +485,126 @@ class Sancion(models.Model):
     fecha = models.DateField()
     fecha_fin = models.DateField(null=True, blank=True)
 
+    objects = ListadoQuerySet.as_manager()
+
+    LISTADO_RELACIONADOS = ('alumno',)
+
     def __str__(self):
         return f"{self.id_sancion} - Alumno: {self.alumno.nombre}"
+
+
+class PuntoControl(models.Model):
+    """Avance de un proceso por lotes para poder reanudarlo si se interrumpe"""
+    id_punto = models.AutoField(primary_key=True)
+    nombre = models.CharField(max_length=100, unique=True)
+    ultimo_id = models.BigIntegerField(default=0)
+    limite_id = models.BigIntegerField(default=0)
+    filas = models.BigIntegerField(default=0)
+    completado = models.BooleanField(default=False)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} - {self.ultimo_id}/{self.limite_id}"
+
+
+class ResultadoProcedimiento(models.Model):
+    """Resultado de un procedimiento guardado en el servidor; se consulta por su token"""
+    id_resultado = models.CharField(max_length=32, primary_key=True)
+    procedimiento_id = models.CharField(max_length=50)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    success = models.BooleanField(default=False)
+    error = models.TextField(null=True, blank=True)
+    tamanos = models.JSONField(default=list)
+    creado = models.DateTimeField(auto_now_add=True)
+    expira = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.id_resultado} - {self.procedimiento_id}"
+
+
+class FilaResultado(models.Model):
+    id_fila = models.BigAutoField(primary_key=True)
+    resultado = models.ForeignKey(ResultadoProcedimiento, on_delete=models.CASCADE, related_name='filas')
+    conjunto = models.PositiveSmallIntegerField()
+    orden = models.PositiveIntegerField()
+    datos = models.JSONField()
+
+    class Meta:
+        constraints = [
+            # Paginación por rango de orden dentro de cada conjunto
+            models.UniqueConstraint(fields=['resultado', 'conjunto', 'orden'], name='fila_resultado_orden_uniq'),
+        ]
+
+
+class TareaProcedimiento(models.Model):
+    """
+    Ejecución en segundo plano de un procedimiento del panel de administración.
+
+    El avance se sigue solo por el estado: un procedimiento almacenado no
+    informa qué porcentaje lleva.
+    """
+    ESTADO_PENDIENTE = 'PENDIENTE'
+    ESTADO_EJECUTANDO = 'EJECUTANDO'
+    ESTADO_TERMINADA = 'TERMINADA'
+    ESTADO_FALLIDA = 'FALLIDA'
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_EJECUTANDO, 'Ejecutando'),
+        (ESTADO_TERMINADA, 'Terminada'),
+        (ESTADO_FALLIDA, 'Fallida'),
+    ]
+    ESTADOS_FINALES = (ESTADO_TERMINADA, ESTADO_FALLIDA)
+
+    id_tarea = models.CharField(max_length=32, primary_key=True)
+    procedimiento_id = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE)
+    resultado = models.ForeignKey(ResultadoProcedimiento, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(null=True, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.id_tarea} - {self.procedimiento_id} - {self.estado}"
+
+
+class RegistroRespaldo(models.Model):
+    """Respaldos por tablas tomados; guarda las marcas de cambios para el siguiente incremental"""
+    TIPO_COMPLETO = 'COMPLETO'
+    TIPO_INCREMENTAL = 'INCREMENTAL'
+    TIPO_CHOICES = [
+        (TIPO_COMPLETO, 'Completo'),
+        (TIPO_INCREMENTAL, 'Incremental'),
+    ]
+
+    id_respaldo = models.CharField(max_length=32, primary_key=True)
+    tipo = models.CharField(max_length=12, choices=TIPO_CHOICES)
+    anterior = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True)
+    marcas = models.JSONField(default=dict)
+    archivo = models.CharField(max_length=255, blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.id_respaldo} - {self.tipo} - {self.creado}"
+
+
+class FilaEliminada(models.Model):
+    """
+    Lápida de una fila borrada de una tabla con marca de cambios; la escribe
+    un trigger AFTER DELETE (triggers_bib) y los respaldos incrementales
+    envían solo las posteriores a su marca.
+    """
+    id_lapida = models.BigAutoField(primary_key=True)
+    tabla = models.CharField(max_length=64)
+    llave = models.CharField(max_length=100)
+    eliminado = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tabla', 'eliminado'], name='fila_eliminada_tabla_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tabla} - {self.llave} - {self.eliminado}"
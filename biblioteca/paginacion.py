@@ -0,0 +1,148 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+class PaginaKeyset:
+    """Una página de resultados con los cursores para moverse entre páginas"""
+
+    def __init__(self, objetos, campo, tamano, tiene_siguiente, tiene_anterior):
+        self.objetos = objetos
+        self.campo = campo
+        self.tamano = tamano
+        self.tiene_siguiente = tiene_siguiente
+        self.tiene_anterior = tiene_anterior
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def cursor_siguiente(self):
+        if self.tiene_siguiente and self.objetos:
+            return getattr(self.objetos[-1], self.campo)
+        return None
+
+    @property
+    def cursor_anterior(self):
+        if self.tiene_anterior and self.objetos:
+            return getattr(self.objetos[0], self.campo)
+        return None
+
+
+class PaginadorKeyset:
+    """
+    Paginación por cursor sobre la llave primaria.
+
+    En lugar de OFFSET se filtra por ``pk > cursor`` (o ``pk < cursor`` hacia
+    atrás), así que cualquier página cuesta lo mismo que la primera.
+    """
+
+    TAMANO_DEFECTO = getattr(settings, 'BIBLIOTECA_PAGINA_TAMANO', 25)
+    TAMANO_MAXIMO = getattr(settings, 'BIBLIOTECA_PAGINA_TAMANO_MAXIMO', 200)
+
+    def __init__(self, queryset, tamano=None):
+        self.queryset = queryset
+        self.campo_pk = queryset.model._meta.pk
+        self.tamano = self._limitar_tamano(tamano)
+
+    def _limitar_tamano(self, tamano):
+        try:
+            tamano = int(tamano)
+        except (TypeError, ValueError):
+            return self.TAMANO_DEFECTO
+        return max(1, min(tamano, self.TAMANO_MAXIMO))
+
+    def _convertir_cursor(self, valor):
+        """Convierte el cursor recibido en la URL al tipo de la llave primaria"""
+        if valor in (None, ''):
+            return None
+        try:
+            return self.campo_pk.to_python(valor)
+        except ValidationError:
+            return None
+
+    def pagina(self, despues=None, antes=None):
+        """Obtiene la página que sigue a ``despues`` o la que precede a ``antes``"""
+        nombre = self.campo_pk.attname
+        despues = self._convertir_cursor(despues)
+        antes = self._convertir_cursor(antes)
+
+        if antes is not None:
+            # Hacia atrás: orden descendente y se invierte al final
+            qs = self.queryset.filter(**{f'{nombre}__lt': antes}).order_by(f'-{nombre}')
+            objetos = list(qs[:self.tamano + 1])
+            hay_mas = len(objetos) > self.tamano
+            objetos = objetos[:self.tamano]
+            objetos.reverse()
+            # El cursor puede venir de una fila ya eliminada o estar después de la última
+            siguiente = self.queryset.filter(**{f'{nombre}__gte': antes}).exists()
+            return PaginaKeyset(objetos, nombre, self.tamano,
+                                tiene_siguiente=siguiente, tiene_anterior=hay_mas)
+
+        qs = self.queryset
+        if despues is not None:
+            qs = qs.filter(**{f'{nombre}__gt': despues})
+        objetos = list(qs.order_by(nombre)[:self.tamano + 1])
+        hay_mas = len(objetos) > self.tamano
+        return PaginaKeyset(objetos[:self.tamano], nombre, self.tamano,
+                            tiene_siguiente=hay_mas, tiene_anterior=despues is not None)
+
+
+def paginar(request, queryset):
+    """Pagina un queryset con los parámetros ``despues``, ``antes`` y ``tamano`` del GET"""
+    paginador = PaginadorKeyset(queryset, tamano=request.GET.get('tamano'))
+    return paginador.pagina(
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+    )
+
+
+class PaginadorEstimado(Paginator):
+    """
+    Paginator del admin para tablas grandes (préstamos, historial).
+
+    Sin filtros, el total sale de las estadísticas de la tabla en lugar de un
+    COUNT(*) que la recorre completa; si la estimación queda por debajo de
+    UMBRAL, o hay filtros o búsqueda, se cuenta exacto (son conjuntos chicos
+    o el índice del filtro acota el conteo). El total estimado puede diferir
+    un poco del real: las últimas páginas pueden quedar incompletas.
+
+    Se usa junto con show_full_result_count = False para que el admin no
+    cuente además la tabla completa cuando hay filtros.
+    """
+
+    UMBRAL = getattr(settings, 'BIBLIOTECA_CONTEO_ESTIMADO_UMBRAL', 100000)
+
+    @staticmethod
+    def estimar_filas(queryset):
+        """Filas de la tabla según el optimizador; None si no hay estimación (solo MySQL la da)"""
+        conexion = connections[queryset.db]
+        if conexion.vendor != 'mysql':
+            return None
+        # El plan usa las estadísticas vivas de InnoDB; TABLE_ROWS de
+        # information_schema queda en cache (information_schema_stats_expiry,
+        # un día por omisión). Sin COUNT(*): su plan es "Select tables
+        # optimized away" y no trae filas.
+        tabla = conexion.ops.quote_name(queryset.model._meta.db_table)
+        with conexion.cursor() as cursor:
+            cursor.execute(f'EXPLAIN SELECT 1 FROM {tabla}')
+            columnas = [col[0].lower() for col in cursor.description]
+            fila = cursor.fetchone()
+        if not fila or 'rows' not in columnas:
+            return None
+        filas = fila[columnas.index('rows')]
+        return int(filas) if filas is not None else None
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet) and not self.object_list.query.where:
+            estimado = self.estimar_filas(self.object_list)
+            if estimado is not None and estimado >= self.UMBRAL:
+                return estimado
+        return super().count
@@ -1,69 +1,138 @@
 # En biblioteca/procedimientos.py
-from django.db import connection
+from django.conf import settings
+from django.db import connection, transaction
 from datetime import date, datetime
-from decimal import Decimal
 import logging
 
+from .cache import CacheLocal
+from .decodificador import DecodificadorResultados
+from .models import PrestamoArchivado
+
 logger = logging.getLogger(__name__)
 
+# Reportes con parámetros (fecha_inicio, fecha_fin): su cache se invalida por fecha
+REPORTES_POR_FECHA = ('ReportePrestamosPorCarrera', 'ReportePrestamosPorCarreraConArchivo')
+
+
+def _a_fecha(valor):
+    """Convierte 'YYYY-MM-DD' o datetime a date; si no se puede, lo deja igual"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, str):
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            return valor
+    return valor
+
+
 class ProcedimientosBiblioteca:
+    # Resultados de procedimientos por (nombre, parámetros); ver signals.py
+    cache_reportes = CacheLocal(ttl=getattr(settings, 'BIBLIOTECA_REPORTES_TTL', 300), maximo=500)
+
     @staticmethod
-    def generar_reporte_prestamos_carrera(fecha_inicio=None, fecha_fin=None):
-        """Genera reporte de préstamos por carrera"""
+    def _rango_reporte(fecha_inicio=None, fecha_fin=None):
         if not fecha_inicio:
             fecha_inicio = date(date.today().year, 1, 1)  # Inicio del año
         
         if not fecha_fin:
             fecha_fin = date.today()
         
-        return ProcedimientosBiblioteca.ejecutar_procedimiento(
-            'ReportePrestamosPorCarrera',
-            [fecha_inicio, fecha_fin]
+        return [_a_fecha(fecha_inicio), _a_fecha(fecha_fin)]
+
+    @staticmethod
+    def procedimiento_reporte_carrera(fecha_inicio, fecha_fin):
+        """
+        Procedimiento del reporte por carrera para el rango: si hay préstamos
+        archivados en él (ver archivo.py), la versión que une las dos tablas.
+        """
+        if PrestamoArchivado.objects.filter(fecha_prestamo__range=(fecha_inicio, fecha_fin)).exists():
+            return 'ReportePrestamosPorCarreraConArchivo'
+        return 'ReportePrestamosPorCarrera'
+
+    @staticmethod
+    def generar_reporte_prestamos_carrera(fecha_inicio=None, fecha_fin=None):
+        """Genera reporte de préstamos por carrera"""
+        rango = ProcedimientosBiblioteca._rango_reporte(fecha_inicio, fecha_fin)
+        return ProcedimientosBiblioteca.ejecutar_procedimiento_cacheado(
+            ProcedimientosBiblioteca.procedimiento_reporte_carrera(*rango), rango,
         )
+
+    @staticmethod
+    def iterar_reporte_prestamos_carrera(fecha_inicio=None, fecha_fin=None, tamano_lote=500):
+        """Versión en streaming del reporte de préstamos por carrera (ver iterar_procedimiento)"""
+        rango = ProcedimientosBiblioteca._rango_reporte(fecha_inicio, fecha_fin)
+        return ProcedimientosBiblioteca.iterar_procedimiento(
+            ProcedimientosBiblioteca.procedimiento_reporte_carrera(*rango), rango,
+            tamano_lote=tamano_lote,
+        )
+
+    @staticmethod
+    def ejecutar_procedimiento_cacheado(nombre_procedimiento, parametros=[]):
+        """
+        ejecutar_procedimiento con cache por nombre y parámetros.
+
+        Solo se guardan las ejecuciones exitosas; peticiones simultáneas con
+        los mismos parámetros esperan a una sola ejecución del procedimiento.
+        """
+        clave = (nombre_procedimiento, tuple(parametros))
+        return ProcedimientosBiblioteca.cache_reportes.obtener_o_calcular(
+            clave,
+            lambda: ProcedimientosBiblioteca.ejecutar_procedimiento(nombre_procedimiento, parametros),
+            guardar_si=lambda resultado: resultado.get('success'),
+        )
+
+    @staticmethod
+    def invalidar_reportes(*fechas):
+        """
+        Invalida los reportes cuyo rango de fechas incluye alguna de ``fechas``.
+        Sin fechas, invalida todos.
+
+        Dentro de una transacción se invalida al confirmarla: antes, otra
+        petición calcularía el reporte con los datos viejos y lo guardaría
+        con la generación ya incrementada.
+        """
+        fechas = [f for f in fechas if f is not None]
+        if not fechas:
+            transaction.on_commit(ProcedimientosBiblioteca.cache_reportes.limpiar)
+            return
+
+        def afectado(clave):
+            nombre, parametros = clave
+            if nombre not in REPORTES_POR_FECHA:
+                return True
+            inicio, fin = parametros
+            try:
+                return any(inicio <= fecha <= fin for fecha in fechas)
+            except TypeError:
+                return True
+
+        transaction.on_commit(lambda: ProcedimientosBiblioteca.cache_reportes.invalidar_si(afectado))
     
     @staticmethod
     def obtener_libros_populares(limite=10):
         """Obtiene los libros más populares (más prestados)"""
         try:
             with connection.cursor() as cursor:
+                # total_prestamos lo mantienen los triggers; el ORDER BY ... LIMIT
+                # se resuelve leyendo su índice en lugar de agrupar biblioteca_prestamo
                 cursor.execute("""
                     SELECT 
                         l.id_libro,
                         l.titulo,
                         a.nombre as autor,
-                        COUNT(p.id_prestamo) as total_prestamos,
+                        l.total_prestamos,
                         c.nombre as categoria,
                         l.status
                     FROM biblioteca_libro l
                     LEFT JOIN biblioteca_autor a ON l.autor_id = a.id_autor
                     LEFT JOIN biblioteca_categoria c ON l.categoria_id = c.id_categoria
-                    LEFT JOIN biblioteca_prestamo p ON l.id_libro = p.libro_id
-                    GROUP BY l.id_libro, l.titulo, a.nombre, c.nombre, l.status
-                    ORDER BY total_prestamos DESC
+                    ORDER BY l.total_prestamos DESC
                     LIMIT %s
                 """, [int(limite)])
                 
-                columns = [col[0] for col in cursor.description]
-                rows = cursor.fetchall()
-                
-                # Convertir Decimal a tipos serializables
-                converted_rows = []
-                for row in rows:
-                    row_dict = {}
-                    for idx, value in enumerate(row):
-                        column_name = columns[idx]
-                        if isinstance(value, Decimal):
-                            if value % 1 == 0:
-                                row_dict[column_name] = int(value)
-                            else:
-                                row_dict[column_name] = float(value)
-                        elif value is None:
-                            row_dict[column_name] = None
-                        elif hasattr(value, 'isoformat'):
-                            row_dict[column_name] = value.isoformat()
-                        else:
-                            row_dict[column_name] = value
-                    converted_rows.append(row_dict)
+                decodificador = DecodificadorResultados.desde_cursor(cursor)
+                converted_rows = decodificador.convertir(cursor.fetchall())
                 
                 resultados = [converted_rows]
                 
@@ -140,6 +209,39 @@ class ProcedimientosBiblioteca:
                     END
                 """)
                 logger.info("Procedimiento ReportePrestamosPorCarrera creado")
+
+                # ===== PROCEDIMIENTO 2: el mismo reporte incluyendo el archivo =====
+                # Cada rama del UNION filtra por su índice de fecha_prestamo
+                cursor.execute("DROP PROCEDURE IF EXISTS ReportePrestamosPorCarreraConArchivo")
+                cursor.execute("""
+                    CREATE PROCEDURE ReportePrestamosPorCarreraConArchivo(
+                        IN fecha_inicio DATE,
+                        IN fecha_fin DATE
+                    )
+                    BEGIN
+                        SELECT 
+                            c.id_carrera,
+                            c.nombre as carrera_nombre,
+                            COUNT(DISTINCT a.id_alumno) as alumnos_activos,
+                            COUNT(p.id_prestamo) as total_prestamos,
+                            COUNT(DISTINCT p.libro_id) as libros_diferentes,
+                            CAST(AVG(DATEDIFF(p.fecha_devolucion, p.fecha_prestamo)) AS DECIMAL(10,2)) as duracion_promedio
+                        FROM biblioteca_carrera c
+                        LEFT JOIN biblioteca_alumno a ON c.id_carrera = a.carrera_id
+                        LEFT JOIN (
+                            SELECT id_prestamo, alumno_id, libro_id, fecha_prestamo, fecha_devolucion
+                            FROM biblioteca_prestamo
+                            WHERE fecha_prestamo BETWEEN fecha_inicio AND fecha_fin
+                            UNION ALL
+                            SELECT id_prestamo, alumno_id, libro_id, fecha_prestamo, fecha_devolucion
+                            FROM biblioteca_prestamoarchivado
+                            WHERE fecha_prestamo BETWEEN fecha_inicio AND fecha_fin
+                        ) p ON a.id_alumno = p.alumno_id
+                        GROUP BY c.id_carrera, c.nombre
+                        ORDER BY total_prestamos DESC;
+                    END
+                """)
+                logger.info("Procedimiento ReportePrestamosPorCarreraConArchivo creado")
                 
                 return True
                 
@@ -148,8 +250,8 @@ class ProcedimientosBiblioteca:
             return False
     
     @staticmethod 
-    def ejecutar_procedimiento(nombre_procedimiento, parametros=[]):
-        """Ejecuta cualquier procedimiento almacenado"""
+    def ejecutar_procedimiento(nombre_procedimiento, parametros=[], formato='dict'):
+        """Ejecuta cualquier procedimiento almacenado (formato: dict, tupla o columnas)"""
         try:
             with connection.cursor() as cursor:
                 # Construir la llamada al procedimiento
@@ -162,30 +264,8 @@ class ProcedimientosBiblioteca:
                 resultados = []
                 while True:
                     if cursor.description:
-                        columns = [col[0] for col in cursor.description]
-                        rows = cursor.fetchall()
-                        
-                        # Convertir cada fila, manejando Decimal
-                        converted_rows = []
-                        for row in rows:
-                            converted_row = {}
-                            for i, value in enumerate(row):
-                                column_name = columns[i]
-                                if isinstance(value, Decimal):
-                                    try:
-                                        if value % 1 == 0:
-                                            converted_row[column_name] = int(value)
-                                        else:
-                                            converted_row[column_name] = float(value)
-                                    except:
-                                        converted_row[column_name] = float(value)
-                                elif hasattr(value, 'isoformat'):
-                                    converted_row[column_name] = value.isoformat()
-                                elif value is None:
-                                    converted_row[column_name] = None
-                                else:
-                                    converted_row[column_name] = value
-                            converted_rows.append(converted_row)
+                        decodificador = DecodificadorResultados.desde_cursor(cursor)
+                        converted_rows = decodificador.convertir(cursor.fetchall(), formato=formato)
                         
                         resultados.append(converted_rows)
                     
@@ -204,4 +284,48 @@ class ProcedimientosBiblioteca:
                 'success': False,
                 'error': str(e),
                 'resultados': None
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def _cursor_sin_buffer():
+        """
+        Cursor que no descarga todo el resultado al cliente (SSCursor en MySQL).
+        En otros motores regresa el cursor normal de Django.
+        """
+        connection.ensure_connection()
+        cursores = getattr(connection.Database, 'cursors', None)
+        clase = getattr(cursores, 'SSCursor', None)
+        if connection.vendor == 'mysql' and clase is not None:
+            return connection.connection.cursor(clase)
+        return connection.cursor()
+
+    @staticmethod
+    def iterar_procedimiento(nombre_procedimiento, parametros=[], tamano_lote=500):
+        """
+        Ejecuta un procedimiento y produce sus filas por lotes sin cargarlas todas.
+
+        Genera tuplas (numero_conjunto, columnas, filas) donde filas es una
+        lista de a lo más ``tamano_lote`` tuplas ya convertidas; cada conjunto
+        de resultados empieza con una tupla sin filas.
+        """
+        placeholders = ', '.join(['%s'] * len(parametros))
+        cursor = ProcedimientosBiblioteca._cursor_sin_buffer()
+        try:
+            cursor.execute(f"CALL {nombre_procedimiento}({placeholders})", parametros)
+            conjunto = 0
+            while True:
+                if cursor.description:
+                    conjunto += 1
+                    decodificador = DecodificadorResultados.desde_cursor(cursor)
+                    columnas = decodificador.columnas
+                    # Primero el conjunto sin filas, para que se puedan escribir encabezados
+                    yield conjunto, columnas, []
+                    while True:
+                        filas = cursor.fetchmany(tamano_lote)
+                        if not filas:
+                            break
+                        yield conjunto, columnas, decodificador.convertir(filas, formato='tupla')
+                if not cursor.nextset():
+                    break
+        finally:
+            cursor.close()
@@ -0,0 +1,315 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from import_export import fields, resources, widgets
+from import_export.instance_loaders import CachedInstanceLoader
+from import_export.results import RowResult
+
+from .busqueda import BusquedaCatalogo
+from .disponibilidad import DisponibilidadLibros
+from .models import (
+    Alumno, Autor, Carrera, Categoria, Editorial, Historial, Libro, Prestamo, Secuencia, Usuario,
+)
+from .procedimientos import ProcedimientosBiblioteca
+
+logger = logging.getLogger(__name__)
+
+
+def _clave(valor):
+    """Forma común de una llave: '3', 3 y 3.0 (celda numérica de Excel) son la misma"""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+class ForeignKeyEnMemoria(widgets.ForeignKeyWidget):
+    """
+    ForeignKeyWidget que resuelve las llaves con una tabla en memoria.
+
+    Antes de importar, la tabla se llena con una consulta por bloque de
+    valores distintos de la columna (cargar()); después cada fila se resuelve
+    con un diccionario en lugar de un .get() por fila. Regresa el pk, así
+    que el campo del recurso debe apuntar a '<relacion>_id'.
+    """
+
+    TAMANO_CONSULTA = 1000
+
+    def __init__(self, model, field='pk', **kwargs):
+        super().__init__(model, field=field, key_is_id=True, **kwargs)
+        self.tabla = None
+
+    def cargar(self, valores):
+        claves = list(dict.fromkeys(_clave(v) for v in valores if v not in (None, '')))
+        self.tabla = {}
+        for inicio in range(0, len(claves), self.TAMANO_CONSULTA):
+            bloque = claves[inicio:inicio + self.TAMANO_CONSULTA]
+            filas = self.model.objects.filter(**{f'{self.field}__in': bloque}).values_list(self.field, 'pk')
+            self.tabla.update((_clave(valor), pk) for valor, pk in filas)
+        return len(self.tabla)
+
+    def clean(self, value, row=None, **kwargs):
+        if value in (None, ''):
+            return None
+        if self.tabla is None:
+            # Sin cargar (uso fuera de import_data): consulta normal
+            return super().clean(value, row=row, **kwargs)
+        clave = _clave(value)
+        if clave not in self.tabla:
+            raise ValueError(f"No existe {self.model._meta.verbose_name} con {self.field} = {clave}")
+        return self.tabla[clave]
+
+
+def campo_foraneo(nombre, modelo, campo='pk'):
+    """Campo de recurso para la llave foránea ``nombre`` resuelto en memoria"""
+    return fields.Field(
+        attribute=f'{nombre}_id', column_name=nombre, widget=ForeignKeyEnMemoria(modelo, campo),
+    )
+
+
+class RecursoMasivo(resources.ModelResource):
+    """
+    Recurso de importación por lotes.
+
+    Las filas se validan una por una pero se guardan con bulk_create /
+    bulk_update en lotes de BIBLIOTECA_IMPORTACION_LOTE; los registros
+    existentes se cargan de una vez (CachedInstanceLoader) y las llaves
+    foráneas se resuelven en memoria. El tiempo de cada lote queda en el
+    log y en result.lotes para el mensaje del admin.
+
+    bulk_create no llama a save() ni manda señales: lo que dependa de ellas
+    se hace en after_import.
+    """
+
+    class Meta:
+        use_bulk = True
+        batch_size = getattr(settings, 'BIBLIOTECA_IMPORTACION_LOTE', 1000)
+        skip_diff = True
+        instance_loader_class = CachedInstanceLoader
+
+    def before_import(self, dataset, **kwargs):
+        super().before_import(dataset, **kwargs)
+        self.lotes = []
+        for campo in self.fields.values():
+            if isinstance(campo.widget, ForeignKeyEnMemoria) and campo.column_name in dataset.headers:
+                inicio = time.perf_counter()
+                total = campo.widget.cargar(dataset[campo.column_name])
+                logger.info(
+                    f"Importación {self._meta.model.__name__}: {total} llaves de '{campo.column_name}' "
+                    f"cargadas en {time.perf_counter() - inicio:.3f} s"
+                )
+
+    def _medir(self, operacion, instancias, guardar, *args, **kwargs):
+        filas = len(instancias)
+        if not filas:
+            return guardar(*args, **kwargs)
+        inicio = time.perf_counter()
+        try:
+            return guardar(*args, **kwargs)
+        finally:
+            segundos = time.perf_counter() - inicio
+            self.lotes.append((operacion, filas, segundos))
+            logger.info(
+                f"Importación {self._meta.model.__name__}: lote {len(self.lotes)} ({operacion}) "
+                f"de {filas} filas en {segundos:.3f} s"
+            )
+
+    def bulk_create(self, *args, **kwargs):
+        return self._medir('alta', self.create_instances, super().bulk_create, *args, **kwargs)
+
+    def bulk_update(self, *args, **kwargs):
+        return self._medir('cambio', self.update_instances, super().bulk_update, *args, **kwargs)
+
+    def bulk_delete(self, *args, **kwargs):
+        return self._medir('baja', self.delete_instances, super().bulk_delete, *args, **kwargs)
+
+    @staticmethod
+    def ids_guardados(result):
+        """pks de las filas nuevas o modificadas (None si el archivo no trae el id)"""
+        guardadas = (RowResult.IMPORT_TYPE_NEW, RowResult.IMPORT_TYPE_UPDATE)
+        return [fila.object_id for fila in result.rows if fila.import_type in guardadas]
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        result.lotes = self.lotes
+        for campo in self.fields.values():
+            if isinstance(campo.widget, ForeignKeyEnMemoria):
+                campo.widget.tabla = None
+        if self.lotes:
+            logger.info(
+                f"Importación {self._meta.model.__name__}: {len(self.lotes)} lotes, "
+                f"{sum(filas for _, filas, _ in self.lotes)} filas en "
+                f"{sum(segundos for _, _, segundos in self.lotes):.3f} s"
+            )
+
+
+class RecursoNombreBuscable(RecursoMasivo):
+    """Recurso de un modelo NombreBuscable: la clave y los términos se calculan aquí porque bulk_create no llama a save()"""
+
+    def before_import(self, dataset, **kwargs):
+        super().before_import(dataset, **kwargs)
+        self.nombres = {}
+
+    def before_save_instance(self, instance, row, **kwargs):
+        super().before_save_instance(instance, row, **kwargs)
+        instance.actualizar_nombre_busqueda()
+        if instance.pk is not None:
+            self.nombres[instance.pk] = instance.nombre
+
+    def get_bulk_update_fields(self):
+        return [*super().get_bulk_update_fields(), 'nombre_busqueda']
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        nombres, self.nombres = self.nombres, {}
+        if self._is_dry_run(kwargs):
+            return
+        modelo = self._meta.model
+        ids = self.ids_guardados(result)
+        # Los nombres ya se leyeron del archivo: sin consultarlos de nuevo
+        filas = [(pk, nombres[pk]) for pk in ids if pk in nombres]
+        if filas:
+            modelo.guardar_terminos(filas)
+        if None in ids:
+            # Altas sin id (bulk_create no siempre regresa la llave): las que aún no tienen términos
+            relacion = modelo._meta.get_field('terminos')
+            modelo.indexar_nombres(modelo.objects.filter(
+                ~Exists(relacion.related_model.objects.filter(**{relacion.field.name: OuterRef('pk')})),
+            ))
+
+
+class CarreraResource(RecursoMasivo):
+    class Meta:
+        model = Carrera
+        import_id_fields = ('id_carrera',)
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if not self._is_dry_run(kwargs):
+            ProcedimientosBiblioteca.invalidar_reportes()
+
+
+class AlumnoResource(RecursoNombreBuscable):
+    carrera = campo_foraneo('carrera', Carrera)
+
+    class Meta:
+        model = Alumno
+        import_id_fields = ('id_alumno',)
+        exclude = ('nombre_busqueda',)
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if not self._is_dry_run(kwargs):
+            ProcedimientosBiblioteca.invalidar_reportes()
+
+
+class RecursoNombreCatalogo(RecursoMasivo):
+    """Autor, categoría o editorial: su nombre es parte de la búsqueda de libros"""
+
+    # Llave foránea de Libro hacia el modelo del recurso
+    relacion_libro = None
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        ids = [pk for pk in self.ids_guardados(result) if pk is not None]
+        if ids and not self._is_dry_run(kwargs):
+            BusquedaCatalogo.reindexar(Libro.objects.filter(**{f'{self.relacion_libro}_id__in': ids}))
+
+
+class AutorResource(RecursoNombreCatalogo, RecursoNombreBuscable):
+    relacion_libro = 'autor'
+
+    class Meta:
+        model = Autor
+        import_id_fields = ('id_autor',)
+        exclude = ('nombre_busqueda',)
+
+
+class EditorialResource(RecursoNombreCatalogo):
+    relacion_libro = 'editorial'
+
+    class Meta:
+        model = Editorial
+        import_id_fields = ('id_editorial',)
+
+
+class CategoriaResource(RecursoNombreCatalogo):
+    relacion_libro = 'categoria'
+
+    class Meta:
+        model = Categoria
+        import_id_fields = ('id_categoria',)
+
+
+class LibroResource(RecursoMasivo):
+    autor = campo_foraneo('autor', Autor)
+    editorial = campo_foraneo('editorial', Editorial)
+    categoria = campo_foraneo('categoria', Categoria)
+
+    class Meta:
+        model = Libro
+        import_id_fields = ('id_libro',)
+        # Los calcula BusquedaCatalogo
+        exclude = ('texto_busqueda', 'titulo_busqueda', 'autor_busqueda')
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if self._is_dry_run(kwargs):
+            return
+        ids = self.ids_guardados(result)
+        libros = Libro.objects.filter(pk__in=[pk for pk in ids if pk is not None])
+        if None in ids:
+            # Filas sin id: los libros nuevos quedan con el texto vacío
+            libros = libros | Libro.objects.filter(texto_busqueda='')
+        BusquedaCatalogo.reindexar(libros)
+
+
+class UsuarioResource(RecursoMasivo):
+    class Meta:
+        model = Usuario
+        import_id_fields = ('id_usuario',)
+
+
+class PrestamoResource(RecursoMasivo):
+    alumno = campo_foraneo('alumno', Alumno)
+    libro = campo_foraneo('libro', Libro)
+    usuario = campo_foraneo('usuario', Usuario)
+
+    class Meta:
+        model = Prestamo
+        import_id_fields = ('id_prestamo',)
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if not self._is_dry_run(kwargs):
+            # Lo que hacen las señales de Prestamo en cada save(), también hasta el COMMIT
+            transaction.on_commit(DisponibilidadLibros.cache.limpiar)
+            ProcedimientosBiblioteca.invalidar_reportes()
+
+
+class HistorialResource(RecursoMasivo):
+    alumno = campo_foraneo('alumno', Alumno)
+    libro = campo_foraneo('libro', Libro)
+    usuario = campo_foraneo('usuario', Usuario)
+
+    class Meta:
+        model = Historial
+        import_id_fields = ('id_historial',)
+
+    def before_import(self, dataset, **kwargs):
+        super().before_import(dataset, **kwargs)
+        # Historial.save() genera el id; con bulk_create se reservan de una vez
+        sin_id = len(dataset)
+        if 'id_historial' in dataset.headers:
+            sin_id = sum(1 for valor in dataset['id_historial'] if valor in (None, ''))
+        self._ids_nuevos = iter(())
+        if sin_id:
+            ultimo = Secuencia.siguiente('historial', sin_id)
+            self._ids_nuevos = (Historial.formatear_id(n) for n in range(ultimo - sin_id + 1, ultimo + 1))
+
+    def before_save_instance(self, instance, row, **kwargs):
+        super().before_save_instance(instance, row, **kwargs)
+        if not instance.id_historial:
+            instance.id_historial = next(self._ids_nuevos)
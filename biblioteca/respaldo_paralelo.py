@@ -0,0 +1,504 @@
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+
+import pymysql
+from django.conf import settings
+from django.utils import timezone
+
+from .respaldos import RestauracionStreaming, comando_mysql
+
+logger = logging.getLogger(__name__)
+
+MANIFIESTO = 'manifest.json'
+VERSION_MANIFIESTO = 1
+ARCHIVO_FINAL = 'esquema/vistas_rutinas.sql'
+# Tamaño aproximado de cada INSERT de varias filas (menor que max_allowed_packet)
+TAMANO_INSERT = 1024 * 1024
+# Columna con la que se detectan los cambios de cada tabla en los respaldos
+# incrementales: fecha de actualización, o PK creciente en las tablas de solo
+# inserción. Las demás tablas se copian completas en cada incremental.
+MARCAS_CAMBIO = getattr(settings, 'BIBLIOTECA_RESPALDO_MARCAS', {
+    'biblioteca_prestamo': ('actualizado', 'fecha'),
+    'biblioteca_historial': ('actualizado', 'fecha'),
+    'biblioteca_prestamoarchivado': ('archivado', 'fecha'),
+    'biblioteca_historialarchivado': ('archivado', 'fecha'),
+    'biblioteca_filaresultado': ('id_fila', 'pk'),
+    'django_admin_log': ('id', 'pk'),
+})
+# Las filas con fecha de actualización cercana a la marca anterior se vuelven
+# a copiar (transacciones largas que confirmaron después); el UPSERT lo tolera
+MARGEN_MARCA = timedelta(minutes=getattr(settings, 'BIBLIOTECA_RESPALDO_MARGEN_MINUTOS', 5))
+# Filas borradas de las tablas de MARCAS_CAMBIO (las escriben los triggers
+# AFTER DELETE); se conservan RETENCION_LAPIDAS
+TABLA_LAPIDAS = 'biblioteca_filaeliminada'
+RETENCION_LAPIDAS = timedelta(days=getattr(settings, 'BIBLIOTECA_RESPALDO_LAPIDAS_DIAS', 30))
+# El registro de respaldos y las lápidas no viajan dentro de los respaldos
+TABLAS_EXCLUIDAS = {'biblioteca_registrorespaldo', TABLA_LAPIDAS}
+ENCABEZADO = (
+    "SET NAMES utf8mb4;\n"
+    "SET FOREIGN_KEY_CHECKS=0;\n"
+    "SET UNIQUE_CHECKS=0;\n"
+    "SET SQL_MODE='NO_AUTO_VALUE_ON_ZERO';\n"
+)
+
+
+def _procesos_por_defecto():
+    return getattr(settings, 'BIBLIOTECA_RESPALDO_PROCESOS', min(4, os.cpu_count() or 1))
+
+
+def _conectar(config):
+    return pymysql.connect(
+        host=config['host'],
+        port=int(config['port']),
+        user=config['user'],
+        password=config['password'],
+        database=config['name'],
+        charset='utf8mb4',
+        binary_prefix=True,
+    )
+
+
+# --- Procesos del pool de respaldo ------------------------------------------
+# Cada proceso abre su conexión e inicia su transacción en el inicializador,
+# mientras el coordinador mantiene las tablas bloqueadas; así todos leen la
+# misma foto de la base de datos. Solo se usa desde el comando
+# respaldo_paralelo: no se hace fork de un worker web.
+
+_volcado = {}
+
+
+def _iniciar_volcado(config, directorio, barrera, espera):
+    # El inicializador no debe fallar: Pool reemplaza al proceso y lo vuelve a
+    # llamar sin fin. Un proceso que no alcanzó la barrera (o que reemplaza a
+    # uno que murió, con la foto ya tomada) queda marcado y _volcar_tabla falla.
+    _volcado.clear()
+    try:
+        conexion = _conectar(config)
+        with conexion.cursor() as cursor:
+            cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+        _volcado.update(conexion=conexion, directorio=directorio)
+        barrera.wait(espera)
+    except Exception as e:
+        _volcado['error'] = f"El proceso {os.getpid()} no tiene la foto del respaldo: {e!r}"
+
+
+def _escribir_filas(conexion, salida, tabla, condicion='', parametros=(), actualizar=False):
+    """INSERTs de varias filas; con actualizar=True son UPSERTs (respaldos incrementales)"""
+    filas = 0
+    with conexion.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(f"SELECT * FROM `{tabla}` {condicion}", parametros)
+        nombres = [col[0] for col in cursor.description]
+        inicio = f"INSERT INTO `{tabla}` ({', '.join(f'`{n}`' for n in nombres)}) VALUES\n"
+        final = ';\n'
+        if actualizar:
+            final = '\nON DUPLICATE KEY UPDATE ' + ', '.join(f'`{n}` = VALUES(`{n}`)' for n in nombres) + ';\n'
+
+        lote, tamano = [], 0
+        for fila in cursor:
+            valores = '(' + ','.join(conexion.escape(valor) for valor in fila) + ')'
+            lote.append(valores)
+            tamano += len(valores)
+            filas += 1
+            if tamano >= TAMANO_INSERT:
+                salida.write(inicio + ',\n'.join(lote) + final)
+                lote, tamano = [], 0
+        if lote:
+            salida.write(inicio + ',\n'.join(lote) + final)
+    return filas
+
+
+def _escribir_eliminados(conexion, salida, tabla, desde):
+    """
+    Borra en destino las filas eliminadas desde la marca anterior: se envían
+    las lápidas (TABLA_LAPIDAS) de la tabla posteriores a ``desde``; todas
+    las que queden si no hay marca.
+    """
+    with conexion.cursor() as cursor:
+        cursor.execute(f"SHOW KEYS FROM `{tabla}` WHERE Key_name = 'PRIMARY'")
+        claves = cursor.fetchall()
+    if len(claves) != 1:
+        logger.warning(f"{tabla} no tiene PK de una columna; no se detectan filas eliminadas")
+        return
+    pk = claves[0][4]
+
+    condicion, parametros = "WHERE `tabla` = %s", [tabla]
+    if desde is not None:
+        # Mismo margen que las marcas de fecha: el trigger fija la hora antes del COMMIT
+        condicion += " AND `eliminado` >= %s"
+        parametros.append(datetime.fromisoformat(desde) - MARGEN_MARCA)
+
+    llaves = []
+
+    def escribir():
+        salida.write(
+            f"DELETE FROM `{tabla}` WHERE `{pk}` IN ({','.join(conexion.escape(llave) for llave in llaves)});\n"
+        )
+        llaves.clear()
+
+    with conexion.cursor(pymysql.cursors.SSCursor) as cursor:
+        cursor.execute(f"SELECT DISTINCT `llave` FROM `{TABLA_LAPIDAS}` {condicion}", parametros)
+        for (llave,) in cursor:
+            llaves.append(llave)
+            if len(llaves) >= 5000:
+                escribir()
+    if llaves:
+        escribir()
+
+
+def _condicion_cambios(marca):
+    """WHERE de las filas cambiadas desde la marca anterior ('' si se copia completa)"""
+    if not marca or marca.get('desde') is None:
+        return '', ()
+    if marca['tipo'] == 'fecha':
+        return f"WHERE `{marca['columna']}` >= %s", (datetime.fromisoformat(marca['desde']) - MARGEN_MARCA,)
+    return f"WHERE `{marca['columna']}` > %s", (marca['desde'],)
+
+
+def _leer_marca(conexion, tabla, marca):
+    """Nueva marca de la tabla dentro de la misma foto; conserva la anterior si está vacía"""
+    if not marca:
+        return None
+    with conexion.cursor() as cursor:
+        cursor.execute(f"SELECT MAX(`{marca['columna']}`) FROM `{tabla}`")
+        hasta = cursor.fetchone()[0]
+        cursor.execute(f"SELECT MAX(`eliminado`) FROM `{TABLA_LAPIDAS}` WHERE `tabla` = %s", [tabla])
+        eliminados = cursor.fetchone()[0]
+    if hasta is None:
+        hasta = marca.get('desde')
+    elif hasattr(hasta, 'isoformat'):
+        hasta = hasta.isoformat()
+    eliminados = eliminados.isoformat() if eliminados is not None else marca.get('eliminados')
+    return {'columna': marca['columna'], 'tipo': marca['tipo'], 'hasta': hasta, 'eliminados': eliminados}
+
+
+def _volcar_tabla(trabajo):
+    """
+    Respaldo completo: DROP/CREATE, los datos en INSERTs por lotes y los triggers.
+    Incremental: borrados y UPSERT de las filas cambiadas desde la marca, sin triggers.
+    """
+    if 'error' in _volcado:
+        raise RuntimeError(_volcado['error'])
+    conexion = _volcado['conexion']
+    tabla = trabajo['tabla']
+    marca = trabajo.get('marca')
+    archivo = f'tablas/{tabla}.sql.gz'
+    ruta = os.path.join(_volcado['directorio'], f'{tabla}.sql.gz')
+
+    # surrogateescape: si pymysql escapa un BLOB como texto, se conservan sus bytes originales
+    with gzip.open(ruta, 'wt', encoding='utf-8', errors='surrogateescape', compresslevel=6) as salida:
+        salida.write(f"-- Tabla `{tabla}`\n{ENCABEZADO}")
+
+        if trabajo.get('incremental'):
+            salida.write("SET @biblioteca_sin_triggers = 1;\n")
+            condicion, parametros = _condicion_cambios(marca)
+            if condicion:
+                _escribir_eliminados(conexion, salida, tabla, marca.get('eliminados'))
+            else:
+                # Se copia completa: lo que no venga en el respaldo ya no existe
+                salida.write(f"DELETE FROM `{tabla}`;\n")
+            filas = _escribir_filas(conexion, salida, tabla, condicion, parametros, actualizar=True)
+            salida.write("SET @biblioteca_sin_triggers = NULL;\n")
+        else:
+            with conexion.cursor() as cursor:
+                cursor.execute(f"SHOW CREATE TABLE `{tabla}`")
+                crear = cursor.fetchone()[1]
+            salida.write(f"DROP TABLE IF EXISTS `{tabla}`;\n{crear};\n")
+            filas = _escribir_filas(conexion, salida, tabla)
+
+            # Triggers al final, para que la carga de datos no los dispare
+            with conexion.cursor() as cursor:
+                cursor.execute("SHOW TRIGGERS WHERE `Table` = %s", [tabla])
+                triggers = [fila[0] for fila in cursor.fetchall()]
+                if triggers:
+                    salida.write("DELIMITER ;;\n")
+                    for trigger in triggers:
+                        cursor.execute(f"SHOW CREATE TRIGGER `{trigger}`")
+                        salida.write(f"DROP TRIGGER IF EXISTS `{trigger}`;;\n{cursor.fetchone()[2]};;\n")
+                    salida.write("DELIMITER ;\n")
+
+    return {
+        'tabla': tabla,
+        'archivo': archivo,
+        'filas': filas,
+        'bytes': os.path.getsize(ruta),
+        'marca': _leer_marca(conexion, tabla, marca),
+    }
+
+
+def _restaurar_archivo(argumentos):
+    """Envía un archivo del respaldo (gzip dentro del ZIP) a su propio cliente mysql"""
+    ruta_zip, archivo, comando = argumentos
+    restauracion = RestauracionStreaming(comando)
+    with zipfile.ZipFile(ruta_zip) as zf, zf.open(archivo) as comprimido:
+        origen = gzip.GzipFile(fileobj=comprimido) if archivo.endswith('.gz') else comprimido
+        with origen:
+            enviados, sentencias = restauracion.restaurar(restauracion.bloques(origen), archivo)
+    return archivo, enviados, sentencias
+
+
+class RespaldoParalelo:
+    """
+    Respaldo por tablas en paralelo con una sola foto consistente.
+
+    El coordinador bloquea las escrituras (FLUSH TABLES WITH READ LOCK, o
+    LOCK TABLES ... READ si el usuario no tiene RELOAD), cada proceso del
+    pool inicia START TRANSACTION WITH CONSISTENT SNAPSHOT y cuando todos
+    la tienen se liberan los bloqueos. Cada tabla se vuelca a su propio
+    .sql.gz y el ZIP lleva además un manifest.json con las tablas, filas y
+    el archivo de vistas y rutinas, que se carga al final.
+
+    Un respaldo incremental parte de otro registrado (completo o
+    incremental): solo lleva las filas cambiadas desde las marcas de ese
+    respaldo (MARCAS_CAMBIO), las eliminadas según sus lápidas y las tablas
+    sin marca completas; se restaura encima de la cadena base + incrementales.
+
+    Crea un pool de procesos: se ejecuta desde el comando respaldo_paralelo,
+    no desde una petición del admin.
+    """
+
+    ESPERA_SNAPSHOT = 60
+
+    def __init__(self, config, procesos=None):
+        self.config = config
+        self.procesos = procesos or _procesos_por_defecto()
+
+    def _tablas(self, cursor):
+        # Las más grandes primero, para que no queden solas al final
+        cursor.execute(
+            "SELECT TABLE_NAME FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_TYPE = 'BASE TABLE' "
+            "ORDER BY DATA_LENGTH DESC",
+            [self.config['name']],
+        )
+        return [fila[0] for fila in cursor.fetchall() if fila[0] not in TABLAS_EXCLUIDAS]
+
+    def _bloquear(self, cursor, tablas):
+        try:
+            cursor.execute("FLUSH TABLES WITH READ LOCK")
+        except pymysql.err.OperationalError:
+            cursor.execute("LOCK TABLES " + ', '.join(f'`{tabla}` READ' for tabla in tablas))
+
+    @staticmethod
+    def ultimo():
+        """Último respaldo registrado, base para el siguiente incremental"""
+        from .models import RegistroRespaldo
+        return RegistroRespaldo.objects.order_by('-creado').first()
+
+    def _trabajos(self, tablas, anterior):
+        # Si el anterior es más viejo que las lápidas, las tablas se copian completas
+        vigente = anterior is not None and anterior.creado >= timezone.now() - RETENCION_LAPIDAS
+        trabajos = []
+        for tabla in tablas:
+            marca = None
+            if tabla in MARCAS_CAMBIO:
+                columna, tipo = MARCAS_CAMBIO[tabla]
+                previa = (anterior.marcas.get(tabla) or {}) if vigente else {}
+                desde = previa.get('hasta') if previa.get('columna') == columna else None
+                marca = {'columna': columna, 'tipo': tipo, 'desde': desde, 'eliminados': previa.get('eliminados')}
+            trabajos.append({'tabla': tabla, 'marca': marca, 'incremental': anterior is not None})
+        return trabajos
+
+    def respaldar(self, destino, anterior=None):
+        """
+        Escribe el ZIP en destino (ruta o archivo abierto) y regresa el
+        manifiesto. anterior: RegistroRespaldo del que parte un incremental;
+        None para un respaldo completo.
+
+        No lo registra: el siguiente incremental partiría de sus marcas, así
+        que quien lo llama usa registrar() cuando el archivo ya está completo
+        donde se va a guardar.
+        """
+        from .models import RegistroRespaldo
+
+        conexion = _conectar(self.config)
+        try:
+            with conexion.cursor() as cursor:
+                tablas = self._tablas(cursor)
+            procesos = max(1, min(self.procesos, len(tablas)))
+
+            with tempfile.TemporaryDirectory() as directorio, multiprocessing.Manager() as manager:
+                barrera = manager.Barrier(procesos + 1)
+                with conexion.cursor() as cursor:
+                    self._bloquear(cursor, tablas)
+                    try:
+                        pool = multiprocessing.Pool(
+                            procesos,
+                            initializer=_iniciar_volcado,
+                            initargs=(self.config, directorio, barrera, self.ESPERA_SNAPSHOT),
+                        )
+                        try:
+                            barrera.wait(self.ESPERA_SNAPSHOT)
+                        except threading.BrokenBarrierError:
+                            # abort() libera a los procesos que siguen esperando
+                            barrera.abort()
+                            pool.terminate()
+                            raise RuntimeError("Los procesos de respaldo no pudieron iniciar la transacción")
+                    finally:
+                        cursor.execute("UNLOCK TABLES")
+
+                with pool:
+                    volcadas = list(pool.imap_unordered(_volcar_tabla, self._trabajos(tablas, anterior)))
+
+                # Las vistas y rutinas solo viajan en los completos
+                ruta_final = None
+                if anterior is None:
+                    ruta_final = os.path.join(directorio, 'vistas_rutinas.sql')
+                    self._volcar_vistas_rutinas(conexion, ruta_final)
+
+                marcas = {t['tabla']: t.pop('marca') for t in volcadas}
+                manifiesto = {
+                    'version': VERSION_MANIFIESTO,
+                    'modo': 'paralelo',
+                    'id': uuid.uuid4().hex,
+                    'tipo': RegistroRespaldo.TIPO_INCREMENTAL if anterior else RegistroRespaldo.TIPO_COMPLETO,
+                    'anterior': anterior.id_respaldo if anterior else None,
+                    'base': self.config['name'],
+                    'creado': datetime.now().isoformat(),
+                    'tablas': sorted(volcadas, key=lambda t: t['tabla']),
+                    'marcas': {tabla: marca for tabla, marca in marcas.items() if marca},
+                    'final': ARCHIVO_FINAL if ruta_final else None,
+                }
+                # Los .sql.gz ya van comprimidos
+                with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as zf:
+                    zf.writestr(MANIFIESTO, json.dumps(manifiesto, indent=2))
+                    for tabla in manifiesto['tablas']:
+                        zf.write(os.path.join(directorio, os.path.basename(tabla['archivo'])), tabla['archivo'])
+                    if ruta_final:
+                        zf.write(ruta_final, ARCHIVO_FINAL, compress_type=zipfile.ZIP_DEFLATED)
+        finally:
+            conexion.close()
+
+        logger.info(
+            f"Respaldo paralelo {manifiesto['tipo'].lower()}: {len(tablas)} tablas, "
+            f"{sum(t['filas'] for t in volcadas)} filas con {procesos} procesos"
+        )
+        return manifiesto
+
+    @staticmethod
+    def registrar(manifiesto, anterior=None, archivo=''):
+        """Registra un respaldo ya guardado y depura las lápidas vencidas"""
+        from .models import FilaEliminada, RegistroRespaldo
+
+        registro = RegistroRespaldo.objects.create(
+            id_respaldo=manifiesto['id'],
+            tipo=manifiesto['tipo'],
+            anterior=anterior,
+            marcas=manifiesto['marcas'],
+            archivo=archivo,
+        )
+        FilaEliminada.objects.filter(eliminado__lt=timezone.now() - RETENCION_LAPIDAS).delete()
+        return registro
+
+    def _volcar_vistas_rutinas(self, conexion, ruta):
+        with open(ruta, 'w', encoding='utf-8') as salida, conexion.cursor() as cursor:
+            salida.write("SET NAMES utf8mb4;\n")
+            cursor.execute(
+                "SELECT TABLE_NAME FROM information_schema.VIEWS WHERE TABLE_SCHEMA = %s",
+                [self.config['name']],
+            )
+            for (vista,) in cursor.fetchall():
+                cursor.execute(f"SHOW CREATE VIEW `{vista}`")
+                salida.write(f"DROP VIEW IF EXISTS `{vista}`;\n{cursor.fetchone()[1]};\n")
+
+            cursor.execute(
+                "SELECT ROUTINE_NAME, ROUTINE_TYPE FROM information_schema.ROUTINES WHERE ROUTINE_SCHEMA = %s",
+                [self.config['name']],
+            )
+            rutinas = cursor.fetchall()
+            if rutinas:
+                salida.write("DELIMITER ;;\n")
+                for nombre, tipo in rutinas:
+                    cursor.execute(f"SHOW CREATE {tipo} `{nombre}`")
+                    definicion = cursor.fetchone()[2]
+                    if definicion is None:
+                        logger.warning(f"Sin permiso para leer la definición de {tipo} {nombre}")
+                        continue
+                    salida.write(f"DROP {tipo} IF EXISTS `{nombre}`;;\n{definicion};;\n")
+                salida.write("DELIMITER ;\n")
+
+
+class RestauracionParalela:
+    """
+    Restaura un respaldo paralelo: las tablas se cargan a la vez, cada una
+    con su propio cliente mysql (sin revisión de llaves foráneas mientras
+    se cargan), y al final las vistas y rutinas. Los incrementales se
+    aplican sobre la base con los triggers desactivados
+    (@biblioteca_sin_triggers). Como el respaldo, solo se usa desde el
+    comando respaldo_paralelo.
+    """
+
+    def __init__(self, config, procesos=None, progreso=None):
+        self.config = config
+        self.procesos = procesos or _procesos_por_defecto()
+        self.progreso = progreso
+        self.bytes = 0
+        self.sentencias = 0
+        self.archivos = []
+
+    @staticmethod
+    def es_respaldo_paralelo(archivo):
+        """True si el archivo (ruta o archivo abierto) es un ZIP con manifiesto"""
+        try:
+            if not zipfile.is_zipfile(archivo):
+                return False
+            if hasattr(archivo, 'seek'):
+                archivo.seek(0)
+            with zipfile.ZipFile(archivo) as zf:
+                return MANIFIESTO in zf.namelist()
+        finally:
+            if hasattr(archivo, 'seek'):
+                archivo.seek(0)
+
+    @staticmethod
+    def leer_manifiesto(ruta_zip):
+        with zipfile.ZipFile(ruta_zip) as zf:
+            manifiesto = json.loads(zf.read(MANIFIESTO))
+        if manifiesto.get('version') != VERSION_MANIFIESTO:
+            raise ValueError(f"Versión de respaldo no soportada: {manifiesto.get('version')}")
+        return manifiesto
+
+    def restaurar_cadena(self, rutas):
+        """Restaura un respaldo completo y, en orden, los incrementales que le siguen"""
+        manifiestos = [self.leer_manifiesto(ruta) for ruta in rutas]
+        if not manifiestos or manifiestos[0].get('tipo', 'COMPLETO') != 'COMPLETO':
+            raise ValueError("La cadena debe empezar con un respaldo completo")
+        for previo, (ruta, manifiesto) in zip(manifiestos, list(zip(rutas, manifiestos))[1:]):
+            if manifiesto.get('anterior') != previo.get('id'):
+                raise ValueError(f"{os.path.basename(ruta)} no continúa al respaldo {previo.get('id')}")
+
+        for ruta in rutas:
+            self.restaurar(ruta)
+        return manifiestos
+
+    def restaurar(self, ruta_zip):
+        """Restaura un respaldo completo, o un incremental encima de su anterior"""
+        manifiesto = self.leer_manifiesto(ruta_zip)
+
+        comando = comando_mysql(self.config)
+        tablas = sorted(manifiesto['tablas'], key=lambda t: t['bytes'], reverse=True)
+        procesos = max(1, min(self.procesos, len(tablas)))
+
+        with multiprocessing.Pool(procesos) as pool:
+            trabajos = [(ruta_zip, tabla['archivo'], comando) for tabla in tablas]
+            for archivo, enviados, sentencias in pool.imap_unordered(_restaurar_archivo, trabajos):
+                self._registrar(archivo, enviados, sentencias)
+
+        if manifiesto.get('final'):
+            self._registrar(*_restaurar_archivo((ruta_zip, manifiesto['final'], comando)))
+        return manifiesto
+
+    def _registrar(self, archivo, enviados, sentencias):
+        self.bytes += enviados
+        self.sentencias += sentencias
+        self.archivos.append(archivo)
+        if self.progreso:
+            self.progreso(archivo, enviados, sentencias)
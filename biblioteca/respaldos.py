@@ -0,0 +1,257 @@
+import io
+import logging
+import subprocess
+import tempfile
+import zipfile
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def configuracion_mysql():
+    """Datos de conexión de la base de datos 'default'; solo para MySQL"""
+    db = settings.DATABASES.get('default', {})
+    if 'mysql' not in db.get('ENGINE', ''):
+        raise RuntimeError("La base de datos configurada no es MySQL.")
+    return {
+        'host': db.get('HOST') or 'localhost',
+        'port': str(db.get('PORT') or 3306),
+        'user': db.get('USER') or '',
+        'password': db.get('PASSWORD') or '',
+        'name': db.get('NAME') or '',
+    }
+
+
+def comando_mysql(config, programa='mysql', *opciones):
+    """Línea de comandos del cliente (mysql o mysqldump) para la configuración dada"""
+    return [
+        programa,
+        '-h', config['host'],
+        '-P', config['port'],
+        '-u', config['user'],
+        f"--password={config['password']}",
+        *opciones,
+        config['name'],
+    ]
+
+
+class _SalidaZip(io.RawIOBase):
+    """
+    Destino no posicionable para ZipFile: acumula lo que escribe el
+    compresor hasta que el generador lo entrega a la respuesta.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+        self.descartar = False
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        if not self.descartar:
+            self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+class RespaldoStreaming:
+    """
+    Respaldo comprimido que se genera mientras se descarga.
+
+    La salida de mysqldump se lee por bloques, se comprime con ZipFile sobre
+    un destino no posicionable (el ZIP usa descriptor de datos y ZIP64) y
+    cada bloque comprimido se entrega a un StreamingHttpResponse; la memoria
+    usada no depende del tamaño del respaldo.
+
+    iniciar() lanza el proceso y espera el primer bloque, así los errores de
+    conexión o credenciales se detectan antes de empezar la respuesta.
+    """
+
+    TAMANO_BLOQUE = getattr(settings, 'BIBLIOTECA_RESPALDO_BLOQUE', 256 * 1024)
+
+    def __init__(self, comando, nombre_sql):
+        self.comando = comando
+        self.nombre_sql = nombre_sql
+        self.proceso = None
+        self._errores = None
+        self._primero = b''
+
+    def iniciar(self):
+        """Arranca el volcado; lanza RuntimeError si termina sin producir datos"""
+        # stderr a un archivo temporal: si se llenara un pipe, mysqldump se bloquearía
+        self._errores = tempfile.TemporaryFile()
+        try:
+            self.proceso = subprocess.Popen(self.comando, stdout=subprocess.PIPE, stderr=self._errores)
+        except Exception:
+            self._errores.close()
+            raise
+
+        self._primero = self.proceso.stdout.read1(self.TAMANO_BLOQUE)
+        if not self._primero:
+            codigo = self.proceso.wait()
+            mensaje = self._texto_errores()
+            self._cerrar()
+            if codigo != 0:
+                raise RuntimeError(f"mysqldump falló: {mensaje}")
+            raise RuntimeError("mysqldump no generó ningún dato")
+        return self
+
+    def _texto_errores(self):
+        self._errores.seek(0)
+        return self._errores.read().decode('utf-8', errors='ignore').strip()
+
+    def _cerrar(self):
+        if self.proceso:
+            if self.proceso.poll() is None:
+                self.proceso.kill()
+                self.proceso.wait()
+            self.proceso.stdout.close()
+        if self._errores:
+            self._errores.close()
+
+    def __iter__(self):
+        salida = _SalidaZip()
+        zf = zipfile.ZipFile(salida, 'w', zipfile.ZIP_DEFLATED)
+        destino = zf.open(self.nombre_sql, 'w', force_zip64=True)
+        completo = False
+        try:
+            bloque = self._primero
+            self._primero = b''
+            while bloque:
+                destino.write(bloque)
+                datos = salida.vaciar()
+                if datos:
+                    yield datos
+                bloque = self.proceso.stdout.read1(self.TAMANO_BLOQUE)
+
+            destino.close()
+            codigo = self.proceso.wait()
+            if codigo != 0:
+                # Sin directorio central el ZIP queda inválido y no pasa por un respaldo completo
+                raise RuntimeError(f"mysqldump falló durante el respaldo: {self._texto_errores()}")
+
+            zf.close()
+            completo = True
+            yield salida.vaciar()
+        except Exception:
+            logger.exception("Respaldo interrumpido")
+            raise
+        finally:
+            if not completo:
+                # Cliente desconectado o error: se descarta lo pendiente sin escribir el cierre
+                salida.descartar = True
+                try:
+                    destino.close()
+                    zf.close()
+                except Exception:
+                    pass
+            self._cerrar()
+
+
+class RestauracionStreaming:
+    """
+    Restaura un respaldo enviando el SQL al cliente mysql por bloques.
+
+    Cada archivo .sql (suelto o dentro del ZIP) se lee por partes y se
+    escribe en el stdin de mysql sin copias descomprimidas intermedias.
+    Se cuentan los bytes y las sentencias enviadas (terminadas en ';' al
+    final de línea, como las escribe mysqldump; el archivo puede venir
+    con saltos de línea de Windows).
+    """
+
+    TAMANO_BLOQUE = getattr(settings, 'BIBLIOTECA_RESPALDO_BLOQUE', 256 * 1024)
+    # Cada cuántos bytes se reporta el avance
+    INTERVALO_PROGRESO = 64 * 1024 * 1024
+
+    def __init__(self, comando, progreso=None):
+        self.comando = comando
+        self.progreso = progreso
+        self.bytes = 0
+        self.sentencias = 0
+        self.archivos = []
+
+    def restaurar_subida(self, subido):
+        """Restaura un archivo subido (.sql o .zip con archivos .sql)"""
+        if zipfile.is_zipfile(subido):
+            subido.seek(0)
+            with zipfile.ZipFile(subido) as zf:
+                miembros = [m for m in zf.namelist() if m.lower().endswith('.sql')]
+                if not miembros:
+                    raise ValueError("El ZIP no contiene archivos .sql")
+                for miembro in miembros:
+                    with zf.open(miembro) as origen:
+                        self.restaurar(self.bloques(origen), miembro)
+        else:
+            subido.seek(0)
+            self.restaurar(self.bloques(subido), subido.name)
+        return self
+
+    @staticmethod
+    def _contar_sentencias(datos):
+        """Finales de sentencia en datos: ';' al final de línea, con saltos Unix o Windows"""
+        return datos.count(b';\n') + datos.count(b';\r\n')
+
+    def bloques(self, origen):
+        """Lee un archivo abierto en bloques de TAMANO_BLOQUE"""
+        return iter(lambda: origen.read(self.TAMANO_BLOQUE), b'')
+
+    def restaurar(self, bloques, nombre):
+        """Envía los bloques de un archivo SQL a un proceso mysql"""
+        with tempfile.TemporaryFile() as errores:
+            try:
+                proceso = subprocess.Popen(
+                    self.comando, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=errores,
+                )
+            except FileNotFoundError:
+                raise RuntimeError("El cliente 'mysql' no se encontró. Instala MySQL client y añade 'mysql' al PATH.")
+
+            enviados = sentencias = 0
+            siguiente_reporte = self.INTERVALO_PROGRESO
+            cola = b''
+            try:
+                for bloque in bloques:
+                    proceso.stdin.write(bloque)
+                    enviados += len(bloque)
+                    # Con la cola del bloque anterior se cuentan los finales partidos
+                    # entre dos bloques; los que caben en la cola ya se contaron
+                    sentencias += self._contar_sentencias(cola + bloque) - self._contar_sentencias(cola)
+                    cola = (cola + bloque)[-2:]
+                    if self.progreso and enviados >= siguiente_reporte:
+                        self.progreso(nombre, enviados, sentencias)
+                        siguiente_reporte += self.INTERVALO_PROGRESO
+                proceso.stdin.close()
+            except BrokenPipeError:
+                # mysql terminó antes de tiempo; el motivo está en stderr
+                try:
+                    proceso.stdin.close()
+                except BrokenPipeError:
+                    pass
+            except BaseException:
+                proceso.kill()
+                proceso.wait()
+                raise
+
+            self.bytes += enviados
+            self.sentencias += sentencias
+            codigo = proceso.wait()
+            if codigo != 0:
+                errores.seek(0)
+                mensaje = errores.read().decode('utf-8', errors='ignore').strip()
+                raise RuntimeError(f"mysql falló al importar {nombre}: {mensaje}")
+
+        self.archivos.append(nombre)
+        logger.info(f"Restaurado {nombre}: {enviados} bytes, {sentencias} sentencias")
+        if self.progreso:
+            self.progreso(nombre, enviados, sentencias)
+        return enviados, sentencias
@@ -0,0 +1,117 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min
+import logging
+
+from .models import Alumno, PuntoControl
+
+logger = logging.getLogger(__name__)
+
+
+class CambioSemestre:
+    """
+    Cierre de semestre: promueve a los alumnos y topa el semestre máximo.
+
+    Se hace con UPDATE por rangos de id_alumno, cada rango en su propia
+    transacción, para no bloquear la tabla completa. El avance se guarda en
+    un PuntoControl dentro de la misma transacción que el UPDATE, así que si
+    el proceso se interrumpe se puede reanudar sin promover dos veces.
+    """
+
+    TAMANO_LOTE = getattr(settings, 'BIBLIOTECA_SEMESTRE_LOTE', 1000)
+
+    @staticmethod
+    def ejecutar(periodo=None, tope=12, promover=True, tamano_lote=None,
+                 reiniciar=False, progreso=None):
+        """
+        Ejecuta el cierre de semestre.
+
+        periodo: identifica la corrida (p. ej. '2026-1'); obligatorio al promover
+        tope: semestre máximo; los que lo superen se dejan en el tope
+        progreso: función opcional que recibe un dict por cada lote procesado
+        """
+        if promover and not periodo:
+            raise ValueError("Se requiere un periodo para promover alumnos")
+
+        tamano_lote = tamano_lote or CambioSemestre.TAMANO_LOTE
+        resultado = {
+            'success': True,
+            'periodo': periodo,
+            'promovidos': 0,
+            'topados': 0,
+            'lotes': 0,
+            'reanudado': False,
+        }
+
+        punto = None
+        if periodo:
+            punto, creado = PuntoControl.objects.get_or_create(nombre=f'semestre:{periodo}')
+            if reiniciar and not creado:
+                punto.ultimo_id = punto.limite_id = punto.filas = 0
+                punto.completado = False
+                punto.save()
+            elif punto.completado:
+                resultado['mensaje'] = f'El cierre del periodo {periodo} ya se había completado'
+                resultado['completado'] = True
+                return resultado
+
+        rango = Alumno.objects.aggregate(minimo=Min('id_alumno'), maximo=Max('id_alumno'))
+        if punto and punto.limite_id:
+            # Reanudación: se respeta el límite original para no promover
+            # alumnos inscritos después de iniciar el cierre
+            resultado['reanudado'] = True
+            inicio = punto.ultimo_id + 1
+            limite = punto.limite_id
+        else:
+            inicio = rango['minimo'] or 0
+            limite = rango['maximo'] or 0
+            if punto:
+                punto.limite_id = limite
+                punto.save(update_fields=['limite_id', 'actualizado'])
+
+        while inicio <= limite:
+            fin = min(inicio + tamano_lote - 1, limite)
+            with transaction.atomic():
+                if punto:
+                    punto = PuntoControl.objects.select_for_update().get(pk=punto.pk)
+                    if punto.ultimo_id >= fin:
+                        # Otra corrida ya procesó este rango
+                        inicio = punto.ultimo_id + 1
+                        continue
+
+                lote = Alumno.objects.filter(id_alumno__gte=inicio, id_alumno__lte=fin)
+                topados = lote.filter(semestre__gt=tope).update(semestre=tope)
+                promovidos = 0
+                if promover:
+                    promovidos = lote.filter(semestre__lt=tope).update(semestre=F('semestre') + 1)
+
+                if punto:
+                    punto.ultimo_id = fin
+                    punto.filas += promovidos + topados
+                    punto.save(update_fields=['ultimo_id', 'filas', 'actualizado'])
+
+            resultado['promovidos'] += promovidos
+            resultado['topados'] += topados
+            resultado['lotes'] += 1
+            if progreso:
+                progreso({
+                    'lote': resultado['lotes'],
+                    'desde': inicio,
+                    'hasta': fin,
+                    'limite': limite,
+                    'promovidos': promovidos,
+                    'topados': topados,
+                })
+            inicio = fin + 1
+
+        if punto:
+            punto.completado = True
+            punto.save(update_fields=['completado', 'actualizado'])
+
+        resultado['completado'] = True
+        resultado['mensaje'] = (
+            f"Cierre de semestre terminado: {resultado['promovidos']} promovidos, "
+            f"{resultado['topados']} topados en {resultado['lotes']} lotes"
+        )
+        logger.info(resultado['mensaje'])
+        return resultado
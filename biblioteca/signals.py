@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .busqueda import BusquedaCatalogo
+from .disponibilidad import DisponibilidadLibros
+from .models import Alumno, Autor, Carrera, Categoria, Editorial, Libro, Prestamo
+from .procedimientos import ProcedimientosBiblioteca
+
+
+@receiver(post_init, sender=Prestamo)
+def recordar_valores_originales(sender, instance, **kwargs):
+    # __dict__ para no disparar una consulta si el campo viene diferido
+    instance._libro_id_original = instance.__dict__.get('libro_id')
+    instance._fecha_prestamo_original = instance.__dict__.get('fecha_prestamo')
+
+
+@receiver(post_save, sender=Prestamo)
+@receiver(post_delete, sender=Prestamo)
+def invalidar_disponibilidad(sender, instance, using, **kwargs):
+    # Hasta el COMMIT: antes, otra petición volvería a guardar la disponibilidad anterior
+    libros = (instance.libro_id, getattr(instance, '_libro_id_original', None))
+    transaction.on_commit(lambda: DisponibilidadLibros.invalidar(*libros), using=using)
+    instance._libro_id_original = instance.libro_id
+
+
+@receiver(post_save, sender=Prestamo)
+@receiver(post_delete, sender=Prestamo)
+def invalidar_reportes_prestamo(sender, instance, **kwargs):
+    ProcedimientosBiblioteca.invalidar_reportes(
+        instance.fecha_prestamo, getattr(instance, '_fecha_prestamo_original', None),
+    )
+    instance._fecha_prestamo_original = instance.fecha_prestamo
+
+
+@receiver(post_save, sender=Alumno)
+@receiver(post_delete, sender=Alumno)
+@receiver(post_save, sender=Carrera)
+@receiver(post_delete, sender=Carrera)
+def invalidar_todos_los_reportes(sender, instance, **kwargs):
+    # El reporte por carrera también cuenta alumnos, sin importar la fecha
+    ProcedimientosBiblioteca.invalidar_reportes()
+
+
+@receiver(post_save, sender=Libro)
+def indexar_libro(sender, instance, raw=False, **kwargs):
+    if not raw:
+        BusquedaCatalogo.reindexar(Libro.objects.filter(pk=instance.pk))
+
+
+# Relación de Libro con cada modelo cuyo nombre forma parte de la búsqueda
+RELACIONES_BUSQUEDA = {Autor: 'autor', Categoria: 'categoria', Editorial: 'editorial'}
+
+
+@receiver(post_init, sender=Autor)
+@receiver(post_init, sender=Categoria)
+@receiver(post_init, sender=Editorial)
+def recordar_nombre_original(sender, instance, **kwargs):
+    instance._nombre_original = instance.__dict__.get('nombre')
+
+
+@receiver(post_save, sender=Autor)
+@receiver(post_save, sender=Categoria)
+@receiver(post_save, sender=Editorial)
+def reindexar_libros_por_nombre(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw and instance.nombre != instance._nombre_original:
+        BusquedaCatalogo.reindexar(Libro.objects.filter(**{RELACIONES_BUSQUEDA[sender]: instance}))
+    instance._nombre_original = instance.nombre
+
+
+@receiver(pre_delete, sender=Autor)
+@receiver(pre_delete, sender=Categoria)
+@receiver(pre_delete, sender=Editorial)
+def recordar_libros_relacionados(sender, instance, **kwargs):
+    # Después del borrado la llave ya es NULL y no se pueden encontrar
+    instance._libros_relacionados = list(
+        Libro.objects.filter(**{RELACIONES_BUSQUEDA[sender]: instance}).values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Autor)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_delete, sender=Editorial)
+def reindexar_libros_relacionados(sender, instance, **kwargs):
+    libros = getattr(instance, '_libros_relacionados', None)
+    if libros:
+        BusquedaCatalogo.reindexar(Libro.objects.filter(pk__in=libros))
@@ -0,0 +1,205 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .almacen_resultados import AlmacenResultados
+from .models import TareaProcedimiento
+from .procedimientos import ProcedimientosBiblioteca
+
+logger = logging.getLogger(__name__)
+
+
+PROCEDIMIENTOS = {
+    'reporte_carreras': lambda parametros: ProcedimientosBiblioteca.generar_reporte_prestamos_carrera(
+        fecha_inicio=parametros['fecha_inicio'],
+        fecha_fin=parametros['fecha_fin'],
+    ),
+    'libros_populares': lambda parametros: ProcedimientosBiblioteca.obtener_libros_populares(
+        int(parametros.get('limite', 10))
+    ),
+}
+
+
+def ejecutar_procedimiento(procedimiento_id, parametros):
+    """Ejecuta un procedimiento del panel y regresa el dict success/error/resultados"""
+    if procedimiento_id not in PROCEDIMIENTOS:
+        raise ValueError(f"Procedimiento desconocido: {procedimiento_id}")
+    return PROCEDIMIENTOS[procedimiento_id](parametros)
+
+
+class EjecutorTareas:
+    """
+    Ejecuta procedimientos en segundo plano con un pool de hilos del propio
+    proceso (sin broker externo).
+
+    La petición solo registra la TareaProcedimiento y regresa su id; el pool
+    limita cuántos procedimientos pesados corren a la vez y las tareas que
+    exceden ese número esperan como PENDIENTE. El resultado se guarda en el
+    AlmacenResultados y la tarea queda apuntando a él.
+    """
+
+    MAXIMO_SIMULTANEAS = getattr(settings, 'BIBLIOTECA_TAREAS_SIMULTANEAS', 2)
+    MAXIMO_EN_COLA = getattr(settings, 'BIBLIOTECA_TAREAS_EN_COLA', 20)
+    # Una tarea sin terminar después de este tiempo se da por interrumpida
+    # (por ejemplo, si el proceso se reinició con la tarea en el pool)
+    TIEMPO_MAXIMO = timedelta(minutes=getattr(settings, 'BIBLIOTECA_TAREAS_MINUTOS', 60))
+
+    MENSAJE_LLENO = "Hay demasiados procedimientos en ejecución, intenta más tarde"
+
+    _pool = None
+    _en_curso = 0
+    _candado = threading.Lock()
+
+    @classmethod
+    def _ejecutor(cls):
+        if cls._pool is None:
+            cls._pool = ThreadPoolExecutor(
+                max_workers=cls.MAXIMO_SIMULTANEAS,
+                thread_name_prefix='biblioteca-tarea',
+            )
+        return cls._pool
+
+    @classmethod
+    def enviar(cls, procedimiento_id, parametros, usuario=None):
+        """Registra la tarea y la encola; regresa la TareaProcedimiento sin esperar"""
+        if procedimiento_id not in PROCEDIMIENTOS:
+            raise ValueError(f"Procedimiento desconocido: {procedimiento_id}")
+
+        # Revisión anticipada para no registrar la tarea en vano; el tope se
+        # aplica de verdad en _encolar, donde se aparta el lugar
+        if cls._lleno():
+            raise RuntimeError(cls.MENSAJE_LLENO)
+
+        tarea = TareaProcedimiento.objects.create(
+            id_tarea=uuid.uuid4().hex,
+            procedimiento_id=procedimiento_id,
+            parametros=parametros,
+            usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+        )
+        # El hilo debe ver la tarea ya confirmada en la base de datos; el lugar
+        # en el pool se aparta hasta entonces, así un rollback no lo deja ocupado
+        transaction.on_commit(lambda: cls._encolar(tarea.pk))
+        return tarea
+
+    @classmethod
+    def _lleno(cls):
+        with cls._candado:
+            return cls._en_curso >= cls.MAXIMO_SIMULTANEAS + cls.MAXIMO_EN_COLA
+
+    @classmethod
+    def _encolar(cls, id_tarea):
+        # Varias tareas pueden pasar la revisión de enviar() antes de confirmarse;
+        # el lugar se aparta aquí y, si ya no hay, la tarea queda fallida
+        with cls._candado:
+            lleno = cls._en_curso >= cls.MAXIMO_SIMULTANEAS + cls.MAXIMO_EN_COLA
+            if not lleno:
+                cls._en_curso += 1
+        if lleno:
+            cls._actualizar(
+                id_tarea, estado=TareaProcedimiento.ESTADO_FALLIDA, error=cls.MENSAJE_LLENO,
+                terminado=timezone.now(),
+            )
+            return
+        try:
+            cls._ejecutor().submit(cls._ejecutar_en_hilo, id_tarea)
+        except Exception:
+            cls._liberar()
+            raise
+
+    @classmethod
+    def _liberar(cls):
+        with cls._candado:
+            cls._en_curso -= 1
+
+    @classmethod
+    def _ejecutar_en_hilo(cls, id_tarea):
+        close_old_connections()
+        try:
+            cls.ejecutar_tarea(id_tarea)
+        finally:
+            # Cada hilo abre su propia conexión; se cierra al terminar
+            connection.close()
+            cls._liberar()
+
+    @staticmethod
+    def _actualizar(id_tarea, desde=None, **campos):
+        """UPDATE de la tarea; con ``desde``, solo si sigue en ese estado. Regresa si cambió"""
+        tareas = TareaProcedimiento.objects.filter(pk=id_tarea)
+        if desde is not None:
+            tareas = tareas.filter(estado=desde)
+        return tareas.update(**campos) > 0
+
+    @staticmethod
+    def ejecutar_tarea(id_tarea):
+        """Ejecuta una tarea registrada (lo llama el pool; se puede llamar directo)"""
+        tarea = TareaProcedimiento.objects.get(pk=id_tarea)
+        iniciada = EjecutorTareas._actualizar(
+            id_tarea, desde=TareaProcedimiento.ESTADO_PENDIENTE,
+            estado=TareaProcedimiento.ESTADO_EJECUTANDO, iniciado=timezone.now(),
+        )
+        if not iniciada:
+            # Se dio por interrumpida mientras esperaba en la cola (ver obtener)
+            logger.info(f"La tarea {id_tarea} ya no está pendiente; no se ejecuta")
+            return
+
+        # Si se dio por interrumpida mientras corría, su estado FALLIDA se respeta
+        try:
+            resultado = ejecutar_procedimiento(tarea.procedimiento_id, tarea.parametros)
+            registro = AlmacenResultados.guardar(tarea.procedimiento_id, resultado, usuario=tarea.usuario)
+            exito = resultado.get('success', False)
+            EjecutorTareas._actualizar(
+                id_tarea,
+                desde=TareaProcedimiento.ESTADO_EJECUTANDO,
+                estado=TareaProcedimiento.ESTADO_TERMINADA if exito else TareaProcedimiento.ESTADO_FALLIDA,
+                resultado_id=registro,
+                error=None if exito else resultado.get('error'),
+                terminado=timezone.now(),
+            )
+        except Exception as e:
+            logger.exception(f"Error en la tarea {id_tarea} ({tarea.procedimiento_id})")
+            EjecutorTareas._actualizar(
+                id_tarea, desde=TareaProcedimiento.ESTADO_EJECUTANDO,
+                estado=TareaProcedimiento.ESTADO_FALLIDA, error=str(e), terminado=timezone.now(),
+            )
+
+    @staticmethod
+    def obtener(id_tarea, usuario=None):
+        """Tarea con ese id (del usuario, si se da) o None; marca como fallidas las interrumpidas"""
+        tareas = TareaProcedimiento.objects.filter(pk=id_tarea)
+        if usuario is not None:
+            tareas = tareas.filter(usuario=usuario)
+        tarea = tareas.first()
+        if tarea is None or tarea.estado in TareaProcedimiento.ESTADOS_FINALES:
+            return tarea
+
+        # El tiempo corre desde que empezó a ejecutarse; el que pasó en la cola
+        # solo cuenta mientras sigue pendiente
+        desde = tarea.iniciado if tarea.estado == TareaProcedimiento.ESTADO_EJECUTANDO else None
+        if (desde or tarea.creado) < timezone.now() - EjecutorTareas.TIEMPO_MAXIMO:
+            # Condicionado al estado leído: si terminó mientras tanto, se respeta
+            EjecutorTareas._actualizar(
+                tarea.pk, desde=tarea.estado, estado=TareaProcedimiento.ESTADO_FALLIDA,
+                error="La tarea se interrumpió antes de terminar", terminado=timezone.now(),
+            )
+            tarea.refresh_from_db()
+        return tarea
+
+    @staticmethod
+    def estado(tarea):
+        """Datos de la tarea para la respuesta JSON de seguimiento"""
+        return {
+            'id_tarea': tarea.id_tarea,
+            'procedimiento_id': tarea.procedimiento_id,
+            'estado': tarea.estado,
+            'terminada': tarea.estado in TareaProcedimiento.ESTADOS_FINALES,
+            'error': tarea.error,
+            'creado': tarea.creado.isoformat(),
+            'iniciado': tarea.iniciado.isoformat() if tarea.iniciado else None,
+            'terminado': tarea.terminado.isoformat() if tarea.terminado else None,
+        }
@@ -1,3 +1,1115 @@
+from datetime import date, datetime
+from decimal import Decimal
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import zipfile
+from unittest import mock
+
+import tablib
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .almacen_resultados import AlmacenResultados
+from .archivo import ArchivoPrestamos
+from .backends.mysql_pool.base import Database, DatabaseWrapper
+from .backends.mysql_pool.pool import PoolAgotado, PoolConexiones
+from .busqueda import BusquedaCatalogo
+from .cache import CacheLocal
+from .decodificador import DecodificadorResultados, _decimal
+from .disponibilidad import DisponibilidadLibros
+from .exportacion import ExportacionStreaming
+from .forms import PrestamoForm
+from .models import (
+    Alumno, Autor, Carrera, Categoria, FilaEliminada, FilaResultado, Historial, HistorialArchivado, Libro,
+    Prestamo, PrestamoArchivado, PuntoControl, RegistroRespaldo, ResultadoProcedimiento, Sancion, Secuencia,
+    TareaProcedimiento, Usuario,
+)
+from .paginacion import PaginadorEstimado, PaginadorKeyset
+from .procedimientos import ProcedimientosBiblioteca
+from .resources import AlumnoResource, PrestamoResource
+from .respaldo_paralelo import (
+    MANIFIESTO, MARGEN_MARCA, RETENCION_LAPIDAS, VERSION_MANIFIESTO, RespaldoParalelo, RestauracionParalela,
+    _condicion_cambios, _escribir_eliminados,
+)
+from .respaldos import RespaldoStreaming, RestauracionStreaming
+from .semestres import CambioSemestre
+from .tareas import EjecutorTareas
+
+
+class ListadosConsultasTests(TestCase):
+    """Los listados deben hacer el mismo número de consultas sin importar las filas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.carrera = Carrera.objects.create(nombre='Sistemas')
+        cls.usuario = Usuario.objects.create(nombre='Mostrador')
+
+    def crear_prestamos(self, cantidad):
+        for i in range(cantidad):
+            alumno = Alumno.objects.create(nombre=f'Alumno {i}', semestre=1, carrera=self.carrera)
+            libro = Libro.objects.create(titulo=f'Libro {i}', anio_publicacion='2020')
+            Prestamo.objects.create(
+                alumno=alumno, libro=libro, usuario=self.usuario,
+                fecha_prestamo=date(2025, 1, 1),
+            )
+            Historial.objects.create(
+                id_historial=f'T{alumno.pk}', alumno=alumno, libro=libro,
+                usuario=self.usuario, fecha_prestamo=date(2025, 1, 1),
+            )
+            Sancion.objects.create(alumno=alumno, motivo='Retraso', fecha=date(2025, 2, 1))
+
+    def contar_consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+            respuesta.content
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_listados_con_consultas_constantes(self):
+        urls = ['/prestamos', '/historiales', '/sanciones', '/libros', '/alumnos']
+        self.crear_prestamos(2)
+        pocas = {url: self.contar_consultas(url) for url in urls}
+        self.crear_prestamos(5)
+        muchas = {url: self.contar_consultas(url) for url in urls}
+        self.assertEqual(pocas, muchas)
+
+    def test_opciones_del_formulario_con_consultas_constantes(self):
+        self.crear_prestamos(2)
+        with CaptureQueriesContext(connection) as pocas:
+            str(PrestamoForm())
+        self.crear_prestamos(5)
+        with CaptureQueriesContext(connection) as muchas:
+            str(PrestamoForm())
+        self.assertEqual(len(pocas), len(muchas))
+
+    def test_listados_del_admin_con_consultas_constantes(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        urls = ['/admin/biblioteca/prestamo/', '/admin/biblioteca/historial/', '/admin/biblioteca/libro/']
+        self.crear_prestamos(2)
+        pocas = {url: self.contar_consultas(url) for url in urls}
+        self.crear_prestamos(5)
+        muchas = {url: self.contar_consultas(url) for url in urls}
+        self.assertEqual(pocas, muchas)
+
+        # El filtro por libro no pinta un enlace por cada libro
+        respuesta = self.client.get('/admin/biblioteca/prestamo/')
+        self.assertNotContains(respuesta, 'href="?libro__id_libro__exact=')
+        self.assertContains(respuesta, 'admin-autocomplete')
+
+    def test_paginador_estimado_solo_sin_filtros_y_sobre_el_umbral(self):
+        class Estimado(PaginadorEstimado):
+            UMBRAL = 100
+            estimado = 5000
+
+            def estimar_filas(self, queryset):
+                return self.estimado
+
+        self.crear_prestamos(3)
+        self.assertEqual(Estimado(Prestamo.objects.order_by('pk'), 25).count, 5000)
+        self.assertEqual(Estimado(Prestamo.objects.filter(libro__titulo='Libro 1').order_by('pk'), 25).count, 1)
+        Estimado.estimado = 50
+        self.assertEqual(Estimado(Prestamo.objects.order_by('pk'), 25).count, 3)
+
+    def test_estimacion_sale_del_plan_de_mysql(self):
+        cursor = mock.MagicMock()
+        cursor.__enter__.return_value = cursor
+        cursor.description = [('id',), ('select_type',), ('table',), ('type',), ('rows',), ('Extra',)]
+        cursor.fetchone.return_value = (1, 'SIMPLE', 'biblioteca_prestamo', 'index', 123456, 'Using index')
+        conexion = mock.Mock(vendor='mysql', **{'cursor.return_value': cursor})
+        conexion.ops.quote_name = lambda nombre: f'`{nombre}`'
+
+        with mock.patch('biblioteca.paginacion.connections', {'default': conexion}):
+            self.assertEqual(PaginadorEstimado.estimar_filas(Prestamo.objects.all()), 123456)
+        cursor.execute.assert_called_once_with('EXPLAIN SELECT 1 FROM `biblioteca_prestamo`')
+
+
+class CacheLocalTests(TestCase):
+
+    def test_un_solo_calculo_con_peticiones_concurrentes(self):
+        cache = CacheLocal(ttl=60)
+        entrar, soltar = threading.Event(), threading.Event()
+        llamadas = []
+
+        def calcular():
+            llamadas.append(1)
+            entrar.set()
+            soltar.wait(5)
+            return 'reporte'
+
+        resultados = []
+        hilos = [
+            threading.Thread(target=lambda: resultados.append(cache.obtener_o_calcular('clave', calcular)))
+            for _ in range(8)
+        ]
+        hilos[0].start()
+        entrar.wait(5)
+        for hilo in hilos[1:]:
+            hilo.start()
+        soltar.set()
+        for hilo in hilos:
+            hilo.join(5)
+
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(resultados, ['reporte'] * 8)
+        self.assertEqual(cache.obtener('clave'), 'reporte')
+
+    def test_no_guarda_si_se_invalida_mientras_calcula(self):
+        cache = CacheLocal(ttl=60)
+        calculando, invalidado = threading.Event(), threading.Event()
+
+        def calcular():
+            calculando.set()
+            invalidado.wait(5)
+            return 'viejo'
+
+        resultado = []
+        hilo = threading.Thread(target=lambda: resultado.append(cache.obtener_o_calcular('clave', calcular)))
+        hilo.start()
+        calculando.wait(5)
+        cache.invalidar('clave')
+        invalidado.set()
+        hilo.join(5)
+
+        self.assertEqual(resultado, ['viejo'])
+        self.assertIsNone(cache.obtener('clave'))
+        self.assertEqual(cache.obtener_o_calcular('clave', lambda: 'nuevo'), 'nuevo')
+
+    def test_reportes_se_invalidan_al_confirmar(self):
+        ProcedimientosBiblioteca.cache_reportes.limpiar()
+        ProcedimientosBiblioteca.cache_reportes.guardar(('ReporteGeneral', ()), 'viejo')
+        with self.captureOnCommitCallbacks() as pendientes:
+            ProcedimientosBiblioteca.invalidar_reportes()
+        self.assertEqual(ProcedimientosBiblioteca.cache_reportes.obtener(('ReporteGeneral', ())), 'viejo')
+        for callback in pendientes:
+            callback()
+        self.assertIsNone(ProcedimientosBiblioteca.cache_reportes.obtener(('ReporteGeneral', ())))
+
+
+class PaginadorKeysetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = [Categoria.objects.create(nombre=f'Categoría {i}').pk for i in range(7)]
+
+    def pagina(self, **cursor):
+        return PaginadorKeyset(Categoria.objects.all(), tamano=3).pagina(**cursor)
+
+    def test_hacia_adelante_hasta_la_ultima_pagina(self):
+        primera = self.pagina()
+        self.assertEqual([c.pk for c in primera], self.ids[:3])
+        self.assertEqual((primera.tiene_anterior, primera.tiene_siguiente), (False, True))
+
+        segunda = self.pagina(despues=primera.cursor_siguiente)
+        self.assertEqual([c.pk for c in segunda], self.ids[3:6])
+        self.assertEqual(segunda.cursor_anterior, self.ids[3])
+
+        ultima = self.pagina(despues=segunda.cursor_siguiente)
+        self.assertEqual([c.pk for c in ultima], self.ids[6:])
+        self.assertEqual((ultima.tiene_anterior, ultima.tiene_siguiente), (True, False))
+        self.assertIsNone(ultima.cursor_siguiente)
+
+    def test_hacia_atras(self):
+        pagina = self.pagina(antes=self.ids[6])
+        self.assertEqual([c.pk for c in pagina], self.ids[3:6])
+        self.assertEqual((pagina.tiene_anterior, pagina.tiene_siguiente), (True, True))
+
+        primera = self.pagina(antes=pagina.cursor_anterior)
+        self.assertEqual([c.pk for c in primera], self.ids[:3])
+        self.assertEqual((primera.tiene_anterior, primera.tiene_siguiente), (False, True))
+
+        # Un cursor después de la última fila no tiene página siguiente
+        pagina = self.pagina(antes=self.ids[-1] + 100)
+        self.assertEqual([c.pk for c in pagina], self.ids[4:])
+        self.assertFalse(pagina.tiene_siguiente)
+        self.assertIsNone(pagina.cursor_siguiente)
+
+    def test_cursor_invalido_es_la_primera_pagina(self):
+        for cursor in ('abc', '', None):
+            pagina = self.pagina(despues=cursor, antes=cursor)
+            self.assertEqual([c.pk for c in pagina], self.ids[:3])
+            self.assertFalse(pagina.tiene_anterior)
+
+    def test_tamano_se_acota(self):
+        self.assertEqual(PaginadorKeyset(Categoria.objects.all(), tamano='0').tamano, 1)
+        self.assertEqual(PaginadorKeyset(Categoria.objects.all(), tamano='-5').tamano, 1)
+        self.assertEqual(PaginadorKeyset(Categoria.objects.all(), tamano='100000').tamano,
+                         PaginadorKeyset.TAMANO_MAXIMO)
+        self.assertEqual(PaginadorKeyset(Categoria.objects.all(), tamano='x').tamano,
+                         PaginadorKeyset.TAMANO_DEFECTO)
+        self.assertEqual(len(PaginadorKeyset(Categoria.objects.all(), tamano=5).pagina()), 5)
+
+
+class DisponibilidadLibrosTests(TestCase):
+
+    def setUp(self):
+        DisponibilidadLibros.cache.limpiar()
+        carrera = Carrera.objects.create(nombre='Sistemas')
+        self.alumno = Alumno.objects.create(nombre='José', semestre=1, carrera=carrera)
+        self.libro = Libro.objects.create(titulo='Ficciones', anio_publicacion='1944')
+
+    def test_cache_se_invalida_al_prestar_y_devolver(self):
+        self.assertTrue(DisponibilidadLibros.consultar(self.libro.pk)['disponible'])
+        with self.assertNumQueries(0):
+            DisponibilidadLibros.consultar(self.libro.pk)
+
+        with self.captureOnCommitCallbacks() as pendientes:
+            prestamo = Prestamo.objects.create(
+                alumno=self.alumno, libro=self.libro, fecha_prestamo=date(2025, 1, 1),
+            )
+        # Sin COMMIT todavía no se invalida
+        self.assertTrue(DisponibilidadLibros.consultar(self.libro.pk)['disponible'])
+        for callback in pendientes:
+            callback()
+        info = DisponibilidadLibros.consultar(self.libro.pk)
+        self.assertTrue(info['prestado'])
+        self.assertEqual(info['prestado_a'], 'José')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            prestamo.fecha_devolucion = date(2025, 1, 8)
+            prestamo.save()
+        self.assertTrue(DisponibilidadLibros.consultar(self.libro.pk)['disponible'])
+
+    def test_libro_inexistente(self):
+        self.assertIsNone(DisponibilidadLibros.consultar(999999))
+
+    def test_consulta_en_lote_con_una_consulta(self):
+        otro = Libro.objects.create(titulo='El Aleph', anio_publicacion='1949')
+        Prestamo.objects.create(alumno=self.alumno, libro=otro, fecha_prestamo=date(2025, 1, 1))
+        DisponibilidadLibros.cache.limpiar()
+
+        with self.assertNumQueries(1):
+            resultado = DisponibilidadLibros.consultar_varios([self.libro.pk, otro.pk, 999999])
+        self.assertEqual(set(resultado), {self.libro.pk, otro.pk})
+        self.assertTrue(resultado[self.libro.pk]['disponible'])
+        self.assertTrue(resultado[otro.pk]['prestado'])
+
+    def test_no_guarda_si_se_invalida_mientras_calcula(self):
+        consulta = DisponibilidadLibros._consulta
+
+        def prestamo_confirmado_a_la_mitad():
+            # El préstamo se confirma (y se invalida) después de empezar la lectura
+            filas = consulta()
+            DisponibilidadLibros.invalidar(self.libro.pk)
+            return filas
+
+        with mock.patch.object(DisponibilidadLibros, '_consulta', side_effect=prestamo_confirmado_a_la_mitad):
+            self.assertTrue(DisponibilidadLibros.consultar(self.libro.pk)['disponible'])
+        self.assertIsNone(DisponibilidadLibros.cache.obtener(self.libro.pk))
+
+        # La consulta sin cache del admin tampoco la escribe
+        DisponibilidadLibros.consultar(self.libro.pk, usar_cache=False)
+        self.assertIsNone(DisponibilidadLibros.cache.obtener(self.libro.pk))
+        DisponibilidadLibros.consultar(self.libro.pk)
+        self.assertIsNotNone(DisponibilidadLibros.cache.obtener(self.libro.pk))
+
+
+class AlmacenResultadosTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user('bibliotecario', password='x')
+        self.resultado = {
+            'success': True,
+            'resultados': [[{'n': i} for i in range(120)], [{'total': 120}]],
+            'error': None,
+        }
+
+    def test_guarda_y_pagina_por_token(self):
+        token = AlmacenResultados.guardar('reporte_carreras', self.resultado, usuario=self.admin)
+        registro = AlmacenResultados.obtener(token, usuario=self.admin)
+
+        self.assertEqual(registro.tamanos, [120, 1])
+        self.assertEqual(AlmacenResultados.total_paginas(registro, tamano=50), 3)
+        primera = AlmacenResultados.pagina(registro, 1, tamano=50)
+        self.assertEqual([f['n'] for f in primera[0]], list(range(50)))
+        self.assertEqual(primera[1], [{'total': 120}])
+        tercera = AlmacenResultados.pagina(registro, 3, tamano=50)
+        self.assertEqual([f['n'] for f in tercera[0]], list(range(100, 120)))
+        self.assertEqual(tercera[1], [])
+
+        otro = User.objects.create_user('otro', password='x')
+        self.assertIsNone(AlmacenResultados.obtener(token, usuario=otro))
+
+    def test_vencidos_se_purgan(self):
+        token = AlmacenResultados.guardar('libros_populares', self.resultado)
+        ResultadoProcedimiento.objects.filter(pk=token).update(expira=timezone.now())
+
+        self.assertIsNone(AlmacenResultados.obtener(token))
+        AlmacenResultados.purgar()
+        self.assertFalse(FilaResultado.objects.filter(resultado_id=token).exists())
+
+
+class DecodificadorResultadosTests(TestCase):
+    # Como cursor.description de MySQL: (nombre, type_code, ..., escala)
+    DESCRIPCION = [('id', 3, None, None, 11, 0, False), ('monto', 246, None, None, 20, 2, True)]
+
+    def decodificador(self):
+        tipos = {3: None, 246: _decimal}
+        with mock.patch('biblioteca.decodificador._tipos_mysql', return_value=tipos):
+            return DecodificadorResultados(self.DESCRIPCION)
+
+    def test_sin_filas_con_convertidores_por_tipo(self):
+        decodificador = self.decodificador()
+        self.assertEqual(decodificador.convertir([], 'tupla'), [])
+        self.assertEqual(decodificador.convertir([], 'dict'), [])
+        self.assertEqual(decodificador.convertir([], 'columnas'), {'id': [], 'monto': []})
+
+    def test_decimales_grandes_y_nulos(self):
+        filas = [(1, None), (2, Decimal('100000000000000000.5')), (3, Decimal('123456789012345678.00'))]
+        esperado = [(1, None), (2, 1e17), (3, 123456789012345678)]
+        self.assertEqual(self.decodificador().convertir(filas, 'tupla'), esperado)
+        self.assertIsInstance(self.decodificador().convertir(filas, 'tupla')[1][1], float)
+        self.assertEqual(
+            self.decodificador().convertir(filas, 'columnas'),
+            {'id': [1, 2, 3], 'monto': [None, 1e17, 123456789012345678]},
+        )
+
+    def test_primera_fila_nula_sin_tipos_del_driver(self):
+        # Sin type_code (otro motor): el convertidor sale del primer valor no nulo
+        decodificador = DecodificadorResultados([('fecha',), ('monto',)])
+        filas = [(None, None), (date(2026, 1, 2), Decimal('2.50'))]
+        self.assertEqual(decodificador.convertir(filas, 'dict'), [
+            {'fecha': None, 'monto': None},
+            {'fecha': '2026-01-02', 'monto': 2.5},
+        ])
+        # Una columna siempre nula se decide en el siguiente lote
+        decodificador = DecodificadorResultados([('monto',)])
+        self.assertEqual(decodificador.convertir([(None,)], 'tupla'), [(None,)])
+        self.assertEqual(decodificador.convertir([(Decimal('4.00'),)], 'tupla'), [(4,)])
+
+
+class TareasProcedimientoTests(TestCase):
+
+    def test_tarea_guarda_su_resultado(self):
+        usuario = User.objects.create_user('bibliotecario', password='x')
+        en_curso = EjecutorTareas._en_curso
+        with self.captureOnCommitCallbacks(execute=False) as encoladas:
+            tarea = EjecutorTareas.enviar('libros_populares', {'limite': 5}, usuario=usuario)
+        self.assertEqual(len(encoladas), 1)
+        self.assertEqual(EjecutorTareas.estado(tarea)['estado'], TareaProcedimiento.ESTADO_PENDIENTE)
+        # Sin COMMIT no se aparta lugar en el pool
+        self.assertEqual(EjecutorTareas._en_curso, en_curso)
+
+        # Se ejecuta en este hilo en lugar del pool
+        EjecutorTareas.ejecutar_tarea(tarea.pk)
+
+        tarea = EjecutorTareas.obtener(tarea.pk, usuario=usuario)
+        self.assertEqual(tarea.estado, TareaProcedimiento.ESTADO_TERMINADA, tarea.error)
+        self.assertTrue(EjecutorTareas.estado(tarea)['terminada'])
+        self.assertIsNotNone(AlmacenResultados.obtener(tarea.resultado_id, usuario=usuario))
+
+    def test_procedimiento_desconocido(self):
+        with self.assertRaises(ValueError):
+            EjecutorTareas.enviar('no_existe', {})
+
+    def test_rollback_no_deja_ocupado_el_pool(self):
+        en_curso = EjecutorTareas._en_curso
+        with self.captureOnCommitCallbacks(execute=True) as encoladas:
+            with self.assertRaises(ZeroDivisionError), transaction.atomic():
+                EjecutorTareas.enviar('libros_populares', {})
+                1 / 0
+        self.assertEqual(encoladas, [])
+        self.assertEqual(EjecutorTareas._en_curso, en_curso)
+        self.assertFalse(TareaProcedimiento.objects.exists())
+
+        # Si el pool no acepta la tarea, el lugar también se libera
+        ejecutor = mock.Mock(**{'submit.side_effect': RuntimeError('pool cerrado')})
+        with mock.patch.object(EjecutorTareas, '_ejecutor', return_value=ejecutor):
+            with self.assertRaises(RuntimeError), self.captureOnCommitCallbacks(execute=True):
+                EjecutorTareas.enviar('libros_populares', {})
+        self.assertEqual(EjecutorTareas._en_curso, en_curso)
+
+    def test_tope_se_aplica_al_confirmar(self):
+        ejecutor = mock.Mock()
+        with mock.patch.object(EjecutorTareas, '_ejecutor', return_value=ejecutor), \
+                mock.patch.object(EjecutorTareas, 'MAXIMO_SIMULTANEAS', 1), \
+                mock.patch.object(EjecutorTareas, 'MAXIMO_EN_COLA', 1), \
+                mock.patch.object(EjecutorTareas, '_en_curso', 0):
+            # Las tres pasan la revisión de enviar() en la misma transacción
+            with self.captureOnCommitCallbacks(execute=True):
+                tareas = [EjecutorTareas.enviar('libros_populares', {}) for _ in range(3)]
+            self.assertEqual(EjecutorTareas._en_curso, 2)
+            self.assertEqual(ejecutor.submit.call_count, 2)
+            with self.assertRaises(RuntimeError):
+                EjecutorTareas.enviar('libros_populares', {})
+
+        estados = [TareaProcedimiento.objects.get(pk=t.pk).estado for t in tareas]
+        self.assertEqual(estados, [TareaProcedimiento.ESTADO_PENDIENTE] * 2 + [TareaProcedimiento.ESTADO_FALLIDA])
+
+    def test_tiempo_maximo_cuenta_desde_que_inicia(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            tarea = EjecutorTareas.enviar('libros_populares', {})
+        hace_dos_horas = timezone.now() - 2 * EjecutorTareas.TIEMPO_MAXIMO
+        TareaProcedimiento.objects.filter(pk=tarea.pk).update(creado=hace_dos_horas)
+
+        def procedimiento_lento(procedimiento_id, parametros):
+            # Esperó en la cola más del tiempo máximo, pero acaba de iniciar
+            self.assertEqual(EjecutorTareas.obtener(tarea.pk).estado, TareaProcedimiento.ESTADO_EJECUTANDO)
+            # Si mientras corre se da por interrumpida, no se sobrescribe al terminar
+            TareaProcedimiento.objects.filter(pk=tarea.pk).update(iniciado=hace_dos_horas)
+            self.assertEqual(EjecutorTareas.obtener(tarea.pk).estado, TareaProcedimiento.ESTADO_FALLIDA)
+            return {'success': True, 'resultados': []}
+
+        with mock.patch('biblioteca.tareas.ejecutar_procedimiento', procedimiento_lento):
+            EjecutorTareas.ejecutar_tarea(tarea.pk)
+        tarea.refresh_from_db()
+        self.assertEqual(tarea.estado, TareaProcedimiento.ESTADO_FALLIDA)
+        self.assertEqual(tarea.error, "La tarea se interrumpió antes de terminar")
+
+        # Una pendiente que ya se dio por interrumpida no se ejecuta
+        with self.captureOnCommitCallbacks(execute=False):
+            pendiente = EjecutorTareas.enviar('libros_populares', {})
+        TareaProcedimiento.objects.filter(pk=pendiente.pk).update(creado=hace_dos_horas)
+        self.assertEqual(EjecutorTareas.obtener(pendiente.pk).estado, TareaProcedimiento.ESTADO_FALLIDA)
+        with mock.patch('biblioteca.tareas.ejecutar_procedimiento') as ejecutar:
+            EjecutorTareas.ejecutar_tarea(pendiente.pk)
+        ejecutar.assert_not_called()
+
+
+class RespaldoIncrementalTests(TestCase):
+
+    def test_incremental_parte_de_las_marcas_del_anterior(self):
+        anterior = RegistroRespaldo.objects.create(
+            id_respaldo='base', tipo=RegistroRespaldo.TIPO_COMPLETO,
+            marcas={'biblioteca_prestamo': {'columna': 'actualizado', 'tipo': 'fecha',
+                                            'hasta': '2026-10-01T12:00:00'}},
+        )
+        trabajos = {t['tabla']: t for t in RespaldoParalelo({})._trabajos(
+            ['biblioteca_prestamo', 'biblioteca_historial', 'biblioteca_libro'], anterior,
+        )}
+
+        self.assertTrue(all(t['incremental'] for t in trabajos.values()))
+        self.assertEqual(trabajos['biblioteca_prestamo']['marca']['desde'], '2026-10-01T12:00:00')
+        # Sin marca previa la tabla se copia completa
+        self.assertEqual(_condicion_cambios(trabajos['biblioteca_historial']['marca']), ('', ()))
+        self.assertIsNone(trabajos['biblioteca_libro']['marca'])
+
+        condicion, parametros = _condicion_cambios(trabajos['biblioteca_prestamo']['marca'])
+        self.assertEqual(condicion, "WHERE `actualizado` >= %s")
+        self.assertEqual(parametros[0], datetime(2026, 10, 1, 12) - MARGEN_MARCA)
+
+        # Más viejo que las lápidas: ya no se saben sus borrados y se copia completo
+        RegistroRespaldo.objects.filter(pk='base').update(creado=timezone.now() - RETENCION_LAPIDAS * 2)
+        anterior.refresh_from_db()
+        trabajos = RespaldoParalelo({})._trabajos(['biblioteca_prestamo'], anterior)
+        self.assertIsNone(trabajos[0]['marca']['desde'])
+
+    def test_registrar_el_respaldo_ya_guardado(self):
+        ahora = timezone.now()
+        FilaEliminada.objects.create(tabla='biblioteca_prestamo', llave='1', eliminado=ahora - RETENCION_LAPIDAS * 2)
+        FilaEliminada.objects.create(tabla='biblioteca_prestamo', llave='2', eliminado=ahora)
+        base = RespaldoParalelo.registrar({'id': 'base', 'tipo': RegistroRespaldo.TIPO_COMPLETO, 'marcas': {}})
+        manifiesto = {
+            'id': 'inc', 'tipo': RegistroRespaldo.TIPO_INCREMENTAL,
+            'marcas': {'biblioteca_prestamo': {'columna': 'actualizado', 'tipo': 'fecha', 'hasta': None}},
+        }
+        RespaldoParalelo.registrar(manifiesto, anterior=base, archivo='inc.zip')
+
+        ultimo = RespaldoParalelo.ultimo()
+        self.assertEqual((ultimo.pk, ultimo.anterior_id, ultimo.archivo), ('inc', 'base', 'inc.zip'))
+        self.assertEqual(ultimo.marcas, manifiesto['marcas'])
+        # Las lápidas vencidas se depuran
+        self.assertEqual(list(FilaEliminada.objects.values_list('llave', flat=True)), ['2'])
+
+    def test_borrados_solo_de_las_lapidas_posteriores_a_la_marca(self):
+        class Cursor:
+            def __init__(self, consultas):
+                self.consultas = consultas
+                self.filas = []
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def execute(self, sql, parametros=()):
+                self.consultas.append((sql, list(parametros)))
+                self.filas = [('PRIMARY', 0, 'PRIMARY', 1, 'id_prestamo')] if 'SHOW KEYS' in sql else [('7',), ('9',)]
+
+            def fetchall(self):
+                return self.filas
+
+            def __iter__(self):
+                return iter(self.filas)
+
+        class Conexion:
+            def __init__(self):
+                self.consultas = []
+
+            def cursor(self, *args):
+                return Cursor(self.consultas)
+
+            def escape(self, valor):
+                return f"'{valor}'"
+
+        conexion, salida = Conexion(), io.StringIO()
+        _escribir_eliminados(conexion, salida, 'biblioteca_prestamo', '2026-10-01T12:00:00')
+
+        self.assertEqual(salida.getvalue(), "DELETE FROM `biblioteca_prestamo` WHERE `id_prestamo` IN ('7','9');\n")
+        sql, parametros = conexion.consultas[-1]
+        self.assertIn("FROM `biblioteca_filaeliminada` WHERE `tabla` = %s AND `eliminado` >= %s", sql)
+        self.assertEqual(parametros, ['biblioteca_prestamo', datetime(2026, 10, 1, 12) - MARGEN_MARCA])
+
+
+class RestauracionParalelaTests(TestCase):
+    CONFIG = {'host': 'localhost', 'port': '3306', 'user': 'biblioteca', 'password': 'x', 'name': 'biblioteca'}
+
+    def respaldo(self, directorio, nombre, **manifiesto):
+        ruta = os.path.join(directorio, nombre)
+        with zipfile.ZipFile(ruta, 'w') as zf:
+            zf.writestr(MANIFIESTO, json.dumps({'version': VERSION_MANIFIESTO, 'final': None, **manifiesto}))
+        return ruta
+
+    def test_cadena_en_orden_y_tablas_grandes_primero(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        completo = self.respaldo(
+            directorio, 'completo.zip', id='a', tipo='COMPLETO', anterior=None,
+            tablas=[{'tabla': 'chica', 'archivo': 'tablas/chica.sql.gz', 'bytes': 10},
+                    {'tabla': 'grande', 'archivo': 'tablas/grande.sql.gz', 'bytes': 500}],
+            final='esquema/vistas_rutinas.sql',
+        )
+        incremental = self.respaldo(
+            directorio, 'incremental.zip', id='b', tipo='INCREMENTAL', anterior='a',
+            tablas=[{'tabla': 'chica', 'archivo': 'tablas/chica.sql.gz', 'bytes': 1}],
+        )
+        otro = self.respaldo(directorio, 'otro.zip', id='c', tipo='INCREMENTAL', anterior='x', tablas=[])
+        viejo = self.respaldo(directorio, 'viejo.zip', id='d', tipo='COMPLETO', tablas=[], version=0)
+
+        enviados = []
+
+        def restaurar_archivo(argumentos):
+            ruta, archivo, _ = argumentos
+            enviados.append((os.path.basename(ruta), archivo))
+            return archivo, 1, 1
+
+        class Pool:
+            def __init__(self, procesos):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def imap_unordered(self, funcion, trabajos):
+                return map(funcion, trabajos)
+
+        restauracion = RestauracionParalela(self.CONFIG, procesos=2)
+        with mock.patch('biblioteca.respaldo_paralelo._restaurar_archivo', restaurar_archivo), \
+                mock.patch('biblioteca.respaldo_paralelo.multiprocessing.Pool', Pool):
+            for cadena in ([incremental], [completo, otro], [viejo]):
+                with self.assertRaises(ValueError):
+                    restauracion.restaurar_cadena(cadena)
+            self.assertEqual(enviados, [])
+
+            manifiestos = restauracion.restaurar_cadena([completo, incremental])
+
+        self.assertEqual([m['id'] for m in manifiestos], ['a', 'b'])
+        self.assertEqual(enviados, [
+            ('completo.zip', 'tablas/grande.sql.gz'),
+            ('completo.zip', 'tablas/chica.sql.gz'),
+            ('completo.zip', 'esquema/vistas_rutinas.sql'),
+            ('incremental.zip', 'tablas/chica.sql.gz'),
+        ])
+        self.assertEqual(restauracion.sentencias, 4)
+
+    def test_la_vista_del_admin_no_restaura_respaldos_paralelos(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ruta = self.respaldo(directorio, 'paralelo.zip', id='a', tipo='COMPLETO', anterior=None, tablas=[])
+        with open(ruta, 'rb') as archivo:
+            subido = SimpleUploadedFile('paralelo.zip', archivo.read(), content_type='application/zip')
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'clave'))
+        with mock.patch('biblioteca.respaldo_paralelo.multiprocessing.Pool') as pool, \
+                mock.patch('biblioteca.respaldos.RestauracionStreaming.restaurar_subida') as restaurar:
+            respuesta = self.client.post('/admin/restore-db/', {'backup_file': subido})
+
+        self.assertEqual(respuesta.status_code, 302)
+        pool.assert_not_called()
+        restaurar.assert_not_called()
+        mensajes = [str(m) for m in get_messages(respuesta.wsgi_request)]
+        self.assertEqual(len(mensajes), 1)
+        self.assertIn('manage.py respaldo_paralelo restaurar', mensajes[0])
+
+
+class RestauracionStreamingTests(TestCase):
+    # Un "mysql" que solo consume lo que recibe
+    COMANDO = [sys.executable, '-c', 'import sys; sys.stdin.buffer.read()']
+    VOLCADO = b"INSERT INTO a VALUES (1);\r\nINSERT INTO a VALUES ('x;y');\r\nDROP TABLE b;\n"
+
+    def test_cuenta_sentencias_con_saltos_windows_partidos_entre_bloques(self):
+        for tamano in (1, 2, 3, len(self.VOLCADO)):
+            restauracion = RestauracionStreaming(self.COMANDO)
+            bloques = [self.VOLCADO[i:i + tamano] for i in range(0, len(self.VOLCADO), tamano)]
+            self.assertEqual(restauracion.restaurar(bloques, 'volcado.sql'), (len(self.VOLCADO), 3))
+
+    def test_restaura_sql_dentro_de_zip(self):
+        subido = io.BytesIO()
+        with zipfile.ZipFile(subido, 'w') as zf:
+            zf.writestr('respaldo.sql', self.VOLCADO)
+            zf.writestr('LEEME.txt', b'no es SQL;\n')
+        restauracion = RestauracionStreaming(self.COMANDO).restaurar_subida(subido)
+        self.assertEqual(restauracion.archivos, ['respaldo.sql'])
+        self.assertEqual((restauracion.bytes, restauracion.sentencias), (len(self.VOLCADO), 3))
+
+
+class ImportacionMasivaTests(TestCase):
+
+    def test_importa_por_lotes_y_resuelve_carreras_en_memoria(self):
+        carrera = Carrera.objects.create(nombre='Sistemas')
+        Alumno.objects.create(id_alumno=1, nombre='Antes', semestre=1, carrera=carrera)
+        datos = tablib.Dataset(headers=['id_alumno', 'nombre', 'semestre', 'carrera'])
+        datos.append([1, 'Ana', 2, carrera.pk])
+        for id_alumno in range(2, 30):
+            datos.append([id_alumno, f'Alumno {id_alumno}', 1, float(carrera.pk)])
+        datos.append([30, 'Sin carrera', 1, 999])
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = AlumnoResource().import_data(datos, use_transactions=True)
+
+        self.assertEqual(resultado.totals['new'], 28)
+        self.assertEqual(resultado.totals['update'], 1)
+        self.assertEqual(resultado.totals['invalid'], 1)
+        self.assertEqual(Alumno.objects.get(pk=1).nombre, 'Ana')
+        self.assertFalse(Alumno.objects.filter(pk=30).exists())
+        # Sin una consulta de carrera ni de alumno por fila
+        self.assertLess(len(consultas), 15)
+        self.assertEqual([operacion for operacion, _, _ in resultado.lotes], ['alta', 'cambio'])
+
+    def test_prestamos_importados_invalidan_disponibilidad_al_confirmar(self):
+        carrera = Carrera.objects.create(nombre='Sistemas')
+        alumno = Alumno.objects.create(nombre='Ana', semestre=1, carrera=carrera)
+        libro = Libro.objects.create(titulo='Ficciones', anio_publicacion='1944')
+        DisponibilidadLibros.cache.limpiar()
+        self.assertTrue(DisponibilidadLibros.consultar(libro.pk)['disponible'])
+
+        datos = tablib.Dataset(headers=['id_prestamo', 'alumno', 'libro', 'fecha_prestamo', 'status'])
+        datos.append([500, alumno.pk, libro.pk, '2026-01-05', Prestamo.STATUS_ACTIVO])
+        with self.captureOnCommitCallbacks() as pendientes:
+            resultado = PrestamoResource().import_data(datos, use_transactions=True)
+            # Antes del COMMIT la cache sigue con el estado anterior
+            self.assertIsNotNone(DisponibilidadLibros.cache.obtener(libro.pk))
+        self.assertEqual(resultado.totals['new'], 1)
+        for callback in pendientes:
+            callback()
+        self.assertTrue(DisponibilidadLibros.consultar(libro.pk)['prestado'])
+
+
+class ExportacionStreamingTests(TestCase):
+
+    def test_csv_por_bloques_con_columnas_relacionadas(self):
+        carrera = Carrera.objects.create(nombre='Sistemas')
+        alumno = Alumno.objects.create(nombre='Ana', semestre=1, carrera=carrera)
+        libro = Libro.objects.create(titulo='Rayuela', anio_publicacion='1963')
+        for _ in range(5):
+            Prestamo.objects.create(alumno=alumno, libro=libro, fecha_prestamo=date(2025, 1, 1))
+
+        exportacion = ExportacionStreaming(Prestamo.objects.all())
+        exportacion.TAMANO_BLOQUE = 2
+        with CaptureQueriesContext(connection) as consultas:
+            lineas = b''.join(exportacion.respuesta_csv().streaming_content).decode('utf-8-sig').splitlines()
+
+        self.assertEqual(len(consultas), 3)
+        self.assertTrue(lineas[0].startswith('id_prestamo,alumno,alumno_nombre,libro,libro_titulo,usuario,'))
+        self.assertEqual(len(lineas), 6)
+        self.assertIn(f',{alumno.pk},Ana,{libro.pk},Rayuela,,,2025-01-01,', lineas[1])
+
+
+class BusquedaCatalogoTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.garcia = Autor.objects.create(nombre='Gabriel García Márquez')
+        cls.cortazar = Autor.objects.create(nombre='Julio Cortázar')
+        cls.cien = Libro.objects.create(titulo='Cien años de soledad', autor=cls.garcia, anio_publicacion='1967')
+        cls.rayuela = Libro.objects.create(titulo='Rayuela', autor=cls.cortazar, anio_publicacion='1963')
+        cls.garcia_titulo = Libro.objects.create(
+            titulo='Vida de García', autor=cls.cortazar, anio_publicacion='1980',
+        )
+
+    def buscar(self, consulta):
+        return list(BusquedaCatalogo.buscar(consulta).values_list('titulo', flat=True))
+
+    def test_prefijos_sin_acentos_y_todas_las_palabras(self):
+        self.assertEqual(self.buscar('SOLED cien'), ['Cien años de soledad'])
+        self.assertEqual(self.buscar('cortazar rayu'), ['Rayuela'])
+        self.assertEqual(self.buscar('cortazar soledad'), [])
+
+    def test_el_titulo_pesa_mas_que_el_autor(self):
+        self.assertEqual(self.buscar('garcía'), ['Vida de García', 'Cien años de soledad'])
+
+    def test_fulltext_filtra_por_todo_el_texto_y_pesa_titulo_y_autor(self):
+        self.cien.refresh_from_db()
+        self.assertEqual(
+            (self.cien.titulo_busqueda, self.cien.autor_busqueda),
+            ('cien anos de soledad', 'gabriel garcia marquez'),
+        )
+
+        # Solo se arma la consulta de MySQL (aquí no se puede ejecutar)
+        consulta = BusquedaCatalogo._buscar_fulltext(['garcia', 'sol'], Libro.objects.all())
+        sql, parametros = consulta.query.sql_with_params()
+        columna = connection.ops.quote_name
+        filtro = sql.split(' WHERE ')[1].split(' ORDER BY ')[0]
+        self.assertEqual(filtro.count('MATCH('), 1)
+        self.assertIn(f"{columna('texto_busqueda')}) AGAINST (%s IN BOOLEAN MODE)) > %s", filtro)
+        self.assertIn(f"2 * MATCH({columna('biblioteca_libro')}.{columna('titulo_busqueda')})", sql)
+        self.assertIn(f"1 * MATCH({columna('biblioteca_libro')}.{columna('autor_busqueda')})", sql)
+        self.assertEqual(parametros[:3], ('+garcia* +sol*', 'garcia* sol*', 'garcia* sol*'))
+
+    def test_reindexa_al_renombrar_el_autor(self):
+        self.cortazar.nombre = 'Julio Florencio'
+        self.cortazar.save()
+        self.assertEqual(self.buscar('florencio rayuela'), ['Rayuela'])
+        self.assertEqual(self.buscar('cortazar'), [])
+
+
+class ClavesNombreTests(TestCase):
+
+    def test_busca_sin_acentos_ni_orden_y_la_importacion_actualiza_la_clave(self):
+        carrera = Carrera.objects.create(nombre='Sistemas')
+        jose = Alumno.objects.create(nombre='José Muñoz', semestre=1, carrera=carrera)
+        Alumno.objects.create(nombre='Josefina Ruiz', semestre=1, carrera=carrera)
+        self.assertEqual(jose.nombre_busqueda, 'jose munoz')
+
+        def buscar(consulta):
+            return list(Alumno.objects.buscar_nombre(consulta).order_by('pk').values_list('nombre', flat=True))
+
+        self.assertEqual(buscar('MUÑ'), ['José Muñoz'])
+        self.assertEqual(buscar('munoz jose'), ['José Muñoz'])
+        self.assertEqual(buscar('jos'), ['José Muñoz', 'Josefina Ruiz'])
+
+        # Solo predicados de prefijo sobre los términos: nada de LIKE '%x%'
+        with CaptureQueriesContext(connection) as consultas:
+            buscar('munoz jose')
+        sql = consultas[0]['sql']
+        self.assertEqual(sql.count('biblioteca_terminoalumno'), 2)
+        self.assertNotIn("'%", sql)
+        self.assertNotIn('nombre_busqueda', sql.split('WHERE', 1)[1])
+
+        datos = tablib.Dataset(headers=['id_alumno', 'nombre', 'semestre', 'carrera'])
+        datos.append([jose.pk, 'José Núñez', 1, carrera.pk])
+        AlumnoResource().import_data(datos, use_transactions=True)
+        self.assertEqual(buscar('nunez'), ['José Núñez'])
+        self.assertEqual(buscar('munoz'), [])
+
+        jose.refresh_from_db()
+        jose.nombre = 'Pepe Li'
+        jose.save(update_fields=['nombre'])
+        self.assertEqual(buscar('li pe'), ['Pepe Li'])
+
+
+class ArchivoPrestamosTests(TestCase):
+
+    def test_mueve_solo_lo_devuelto_antes_del_limite_y_conserva_contadores(self):
+        carrera = Carrera.objects.create(nombre='Sistemas')
+        alumno = Alumno.objects.create(nombre='Ana', semestre=1, carrera=carrera)
+        libro = Libro.objects.create(titulo='Rayuela', anio_publicacion='1963')
+        viejos = [
+            Prestamo.objects.create(alumno=alumno, libro=libro, fecha_prestamo=date(2020, 1, i),
+                                    fecha_devolucion=date(2020, 1, i + 5), status=Prestamo.STATUS_DEVUELTO)
+            for i in range(1, 6)
+        ]
+        reciente = Prestamo.objects.create(alumno=alumno, libro=libro, fecha_prestamo=date.today(),
+                                           fecha_devolucion=date.today())
+        abierto = Prestamo.objects.create(alumno=alumno, libro=libro, fecha_prestamo=date(2020, 2, 1))
+        Historial.objects.create(id_historial='H001', alumno=alumno, libro=libro,
+                                 fecha_prestamo=date(2020, 1, 1), fecha_devolucion=date(2020, 1, 6))
+
+        resultado = ArchivoPrestamos.archivar(antiguedad_dias=365, tamano_lote=2)
+
+        self.assertEqual(resultado['tablas'], {'biblioteca_prestamo': 5, 'biblioteca_historial': 1})
+        self.assertEqual(resultado['lotes'], 4)
+        self.assertEqual(set(Prestamo.objects.values_list('pk', flat=True)), {reciente.pk, abierto.pk})
+        self.assertEqual(set(PrestamoArchivado.objects.values_list('pk', flat=True)), {p.pk for p in viejos})
+        self.assertTrue(HistorialArchivado.objects.filter(pk='H001').exists())
+        self.assertFalse(Historial.objects.exists())
+
+        Libro.recalcular_total_prestamos()
+        self.assertEqual(Libro.objects.get(pk=libro.pk).total_prestamos, 7)
+        # El reporte usa la versión con archivo solo si el rango lo alcanza
+        self.assertEqual(
+            ProcedimientosBiblioteca.procedimiento_reporte_carrera(date(2020, 1, 1), date(2020, 12, 31)),
+            'ReportePrestamosPorCarreraConArchivo',
+        )
+        self.assertEqual(
+            ProcedimientosBiblioteca.procedimiento_reporte_carrera(date(2021, 1, 1), date.today()),
+            'ReportePrestamosPorCarrera',
+        )
+
+
+class PoolConexionesTests(TestCase):
+
+    class Conexion:
+        def __init__(self):
+            self.rota = False
+            self.cerrada = False
+
+        def ping(self, reconectar=True):
+            if self.rota:
+                raise ConnectionError('se perdió la conexión')
+
+        def close(self):
+            self.cerrada = True
+
+    def test_reutiliza_verifica_limita_y_expira(self):
+        pool = PoolConexiones(maximo=2, espera=0.05, inactividad=60, verificar=lambda c: c.ping(False))
+        primera = pool.obtener(self.Conexion)
+        pool.devolver(primera)
+        self.assertIs(pool.obtener(self.Conexion), primera)
+
+        segunda = pool.obtener(self.Conexion)
+        with self.assertRaises(PoolAgotado):
+            pool.obtener(self.Conexion)
+
+        # La que falla el ping se cierra y se abre otra en su lugar
+        segunda.rota = True
+        pool.devolver(segunda)
+        tercera = pool.obtener(self.Conexion)
+        self.assertIsNot(tercera, segunda)
+        self.assertTrue(segunda.cerrada)
+
+        pool.inactividad = 0
+        pool.devolver(tercera)
+        pool.devolver(primera)
+        cuarta = pool.obtener(self.Conexion)
+        self.assertTrue(primera.cerrada and tercera.cerrada)
+        self.assertEqual(
+            {clave: valor for clave, valor in pool.metricas().items() if clave != 'segundos_espera'},
+            {'creadas': 4, 'reutilizadas': 1, 'descartadas': 1, 'expiradas': 2, 'esperas': 1, 'agotado': 1,
+             'abiertas': 1, 'libres': 0, 'en_uso': 1, 'maximo': 2},
+        )
+        self.assertIsNot(cuarta, primera)
+
+    def test_limpia_la_sesion_al_devolver_y_descarta_si_falla(self):
+        sentencias = []
+
+        class Cursor:
+            def __init__(self, conexion):
+                self.conexion = conexion
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def execute(self, sql):
+                if self.conexion.rota:
+                    raise Database.OperationalError(2013, 'se perdió la conexión')
+                sentencias.append(sql)
+
+        class Conexion(self.Conexion):
+            def cursor(self):
+                return Cursor(self)
+
+        envoltura = DatabaseWrapper({**connection.settings_dict, 'OPTIONS': {'pool': True}})
+        envoltura.autocommit = True
+        pool = PoolConexiones()
+        sana, rota = pool.obtener(Conexion), pool.obtener(Conexion)
+        rota.rota = True
+        for conexion in (sana, rota):
+            envoltura.connection, envoltura._pool_conexion = conexion, pool
+            envoltura._close()
+
+        self.assertEqual(sentencias, ["SET @biblioteca_sin_triggers = NULL"])
+        self.assertEqual((sana.cerrada, rota.cerrada), (False, True))
+        self.assertEqual((pool.metricas()['libres'], pool.metricas()['abiertas']), (1, 1))
+
+
+class CambioSemestreTests(TestCase):
+
+    def test_reanuda_despues_de_un_lote_sin_promover_dos_veces(self):
+        carrera = Carrera.objects.create(nombre='Sistemas')
+        alumnos = [Alumno.objects.create(nombre=f'Alumno {i}', semestre=s, carrera=carrera)
+                   for i, s in enumerate([1, 2, 3, 12, 14])]
+
+        def interrumpir(avance):
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            CambioSemestre.ejecutar(periodo='2026-1', tamano_lote=2, progreso=interrumpir)
+        punto = PuntoControl.objects.get(nombre='semestre:2026-1')
+        self.assertEqual((punto.ultimo_id, punto.completado), (alumnos[1].pk, False))
+
+        # Inscrito después de iniciar el cierre: queda fuera del límite original
+        nuevo = Alumno.objects.create(nombre='Nuevo', semestre=1, carrera=carrera)
+        resultado = CambioSemestre.ejecutar(periodo='2026-1', tamano_lote=2)
+        self.assertTrue(resultado['reanudado'])
+        self.assertEqual((resultado['promovidos'], resultado['topados'], resultado['lotes']), (1, 1, 2))
+
+        repetido = CambioSemestre.ejecutar(periodo='2026-1', tamano_lote=2)
+        self.assertTrue(repetido['completado'])
+        self.assertEqual(repetido['promovidos'], 0)
+
+        semestres = dict(Alumno.objects.values_list('pk', 'semestre'))
+        self.assertEqual([semestres[a.pk] for a in alumnos], [2, 3, 4, 12, 12])
+        self.assertEqual(semestres[nuevo.pk], 1)
+        punto.refresh_from_db()
+        self.assertEqual((punto.ultimo_id, punto.filas, punto.completado), (alumnos[-1].pk, 4, True))
+
+    def test_changes_registra_y_propaga_el_error(self):
+        with mock.patch.object(CambioSemestre, 'ejecutar', side_effect=RuntimeError('lote fallido')), \
+                self.assertLogs('biblioteca.models', level='ERROR'):
+            with self.assertRaises(RuntimeError):
+                Alumno.changes()
+
+
+class SecuenciaTests(TestCase):
+
+    def test_primera_llamada_crea_la_fila_y_reserva_bloques(self):
+        self.assertFalse(Secuencia.objects.filter(nombre='prueba').exists())
+        self.assertEqual(Secuencia.siguiente('prueba'), 1)
+        self.assertEqual(Secuencia.objects.get(nombre='prueba').valor, 1)
+
+        # Reserva 2..6 y regresa el último
+        self.assertEqual(Secuencia.siguiente('prueba', 5), 6)
+        self.assertEqual(Secuencia.siguiente('prueba'), 7)
+        self.assertEqual(Secuencia.siguiente('otra', 3), 3)
+
+    def test_formato_de_id_de_historial(self):
+        self.assertEqual(Historial.formatear_id(7), 'H007')
+        self.assertEqual(Historial.formatear_id(999), 'H999')
+        self.assertEqual(Historial.formatear_id(1000), 'H1000')
+
+
+class TotalPrestamosTests(TestCase):
+
+    def test_recalcula_con_archivados_y_ordena_populares_por_el_contador(self):
+        carrera = Carrera.objects.create(nombre='Sistemas')
+        alumno = Alumno.objects.create(nombre='Ana', semestre=1, carrera=carrera)
+        autor = Autor.objects.create(nombre='Julio Cortázar')
+        rayuela = Libro.objects.create(titulo='Rayuela', anio_publicacion='1963', autor=autor)
+        final = Libro.objects.create(titulo='Final del juego', anio_publicacion='1956', autor=autor)
+        sin_prestamos = Libro.objects.create(titulo='Bestiario', anio_publicacion='1951')
+        for _ in range(2):
+            Prestamo.objects.create(alumno=alumno, libro=rayuela, fecha_prestamo=date(2026, 1, 5))
+        Prestamo.objects.create(alumno=alumno, libro=final, fecha_prestamo=date(2026, 1, 5))
+        PrestamoArchivado.objects.bulk_create([
+            PrestamoArchivado(id_prestamo=1000 + i, alumno=alumno, libro=final, fecha_prestamo=date(2020, 1, 1),
+                              fecha_devolucion=date(2020, 1, 5), status=Prestamo.STATUS_DEVUELTO,
+                              actualizado=timezone.now())
+            for i in range(3)
+        ])
+        Libro.objects.filter(pk=sin_prestamos.pk).update(total_prestamos=9)
+
+        Libro.recalcular_total_prestamos()
+        totales = dict(Libro.objects.values_list('pk', 'total_prestamos'))
+        for libro in (rayuela, final, sin_prestamos):
+            esperado = (Prestamo.objects.filter(libro=libro).count()
+                        + PrestamoArchivado.objects.filter(libro=libro).count())
+            self.assertEqual(totales[libro.pk], esperado)
+        self.assertEqual([totales[rayuela.pk], totales[final.pk], totales[sin_prestamos.pk]], [2, 4, 0])
+
+        resultado = ProcedimientosBiblioteca.obtener_libros_populares(limite=2)
+        self.assertTrue(resultado['success'])
+        filas = resultado['resultados'][0]
+        self.assertEqual([(f['titulo'], f['total_prestamos']) for f in filas], [('Final del juego', 4), ('Rayuela', 2)])
+        self.assertEqual(filas[0]['autor'], 'Julio Cortázar')
+
+
+class ReportePrestamosViewTests(TestCase):
+    URL = '/reportes/prestamos-carrera'
+
+    @staticmethod
+    def lotes(nombre, parametros, tamano_lote=500):
+        yield 1, ['carrera', 'total'], []
+        yield 1, ['carrera', 'total'], [('Sistemas', 3), ('Civil, Ambiental', 1)]
+        yield 2, ['total'], []
+        yield 2, ['total'], [(4,)]
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('bibliotecario', password='x'))
+        ProcedimientosBiblioteca.cache_reportes.limpiar()
+        self.addCleanup(ProcedimientosBiblioteca.cache_reportes.limpiar)
+
+    def reporte(self, formato):
+        with mock.patch.object(ProcedimientosBiblioteca, 'iterar_procedimiento', side_effect=self.lotes) as iterar:
+            respuesta = self.client.get(self.URL, {'format': formato, 'fecha_inicio': '2026-01-01',
+                                                   'fecha_fin': '2026-06-30'})
+            contenido = b''.join(respuesta.streaming_content).decode()
+        iterar.assert_called_once_with('ReportePrestamosPorCarrera', [date(2026, 1, 1), date(2026, 6, 30)],
+                                       tamano_lote=500)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn(f'reporte-prestamos-carrera.{formato}', respuesta['Content-Disposition'])
+        return respuesta, contenido
+
+    def test_csv_con_un_bloque_de_encabezados_por_conjunto(self):
+        respuesta, contenido = self.reporte('csv')
+        self.assertTrue(respuesta['Content-Type'].startswith('text/csv'))
+        self.assertEqual(contenido, 'carrera,total\r\nSistemas,3\r\n"Civil, Ambiental",1\r\n\r\ntotal\r\n4\r\n')
+
+    def test_jsonl_una_linea_por_fila(self):
+        respuesta, contenido = self.reporte('jsonl')
+        self.assertTrue(respuesta['Content-Type'].startswith('application/x-ndjson'))
+        self.assertEqual([json.loads(linea) for linea in contenido.splitlines()], [
+            {'carrera': 'Sistemas', 'total': 3, 'conjunto': 1},
+            {'carrera': 'Civil, Ambiental', 'total': 1, 'conjunto': 1},
+            {'total': 4, 'conjunto': 2},
+        ])
+
+    def test_json_y_errores(self):
+        resultado = {'success': True, 'resultados': [[{'carrera': 'Sistemas', 'total': 3}]]}
+        with mock.patch.object(ProcedimientosBiblioteca, 'ejecutar_procedimiento', return_value=resultado):
+            respuesta = self.client.get(self.URL)
+        self.assertEqual(respuesta.json(), resultado)
+
+        self.assertEqual(self.client.get(self.URL, {'format': 'xml'}).status_code, 400)
+
+        # Si el procedimiento falla en el primer lote todavía se responde JSON
+        with mock.patch.object(ProcedimientosBiblioteca, 'iterar_procedimiento', side_effect=RuntimeError('sin CALL')):
+            respuesta = self.client.get(self.URL, {'format': 'csv'})
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertEqual(respuesta.json(), {'success': False, 'error': 'sin CALL'})
+
+    def test_requiere_sesion(self):
+        self.client.logout()
+        with mock.patch.object(ProcedimientosBiblioteca, 'iterar_procedimiento') as iterar:
+            respuesta = self.client.get(self.URL, {'format': 'csv'})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertIn('login', respuesta['Location'])
+        iterar.assert_not_called()
+
+
+class RespaldoStreamingTests(TestCase):
+
+    @staticmethod
+    def comando(codigo, salida=''):
+        # Un "mysqldump" que escribe el volcado a stdout
+        return [sys.executable, '-c', f'import sys; sys.stdout.buffer.write({salida!r}.encode()); sys.exit({codigo})']
+
+    def test_zip_sin_posicionar_se_abre_y_contiene_el_volcado(self):
+        volcado = ''.join(f"INSERT INTO a VALUES ({i}, 'fila {i}');\n" for i in range(2000))
+        respaldo = RespaldoStreaming(self.comando(0, volcado), 'respaldo.sql')
+        respaldo.TAMANO_BLOQUE = 4096
+        partes = list(respaldo.iniciar())
+        self.assertGreater(len(partes), 1)
+
+        with zipfile.ZipFile(io.BytesIO(b''.join(partes))) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.namelist(), ['respaldo.sql'])
+            self.assertEqual(zf.read('respaldo.sql').decode(), volcado)
+
+    def test_errores_de_mysqldump(self):
+        with self.assertRaisesRegex(RuntimeError, 'no generó'):
+            RespaldoStreaming(self.comando(0), 'respaldo.sql').iniciar()
+        with self.assertRaisesRegex(RuntimeError, 'falló:'):
+            RespaldoStreaming(self.comando(2), 'respaldo.sql').iniciar()
 
-# Create your tests here.
+        # Falla a la mitad: el ZIP queda sin directorio central
+        respaldo = RespaldoStreaming(self.comando(2, 'INSERT INTO a VALUES (1);\n'), 'respaldo.sql').iniciar()
+        with self.assertLogs('biblioteca.respaldos', 'ERROR'), \
+                self.assertRaisesRegex(RuntimeError, 'durante el respaldo'):
+            list(respaldo)
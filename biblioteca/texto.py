@@ -0,0 +1,35 @@
+import re
+import unicodedata
+
+# Mismo mínimo que innodb_ft_min_token_size: las palabras más cortas no se indexan
+TERMINO_MINIMO = 3
+TERMINO_MAXIMO = 40
+
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y solo letras y números separados por un espacio"""
+    if not texto:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return _NO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def terminos(texto):
+    """Palabras distintas del texto normalizado, en orden, que se pueden indexar"""
+    return list(dict.fromkeys(
+        palabra[:TERMINO_MAXIMO] for palabra in normalizar(texto).split()
+        if len(palabra) >= TERMINO_MINIMO
+    ))
+
+
+def clave_nombre(texto):
+    """Nombre normalizado con sus palabras en orden: 'Muñoz, José' y 'José Muñoz' dan 'jose munoz'"""
+    return ' '.join(sorted(normalizar(texto).split()))
+
+
+def palabras_nombre(texto):
+    """Palabras distintas de un nombre normalizado; a diferencia de terminos() incluye las cortas ('Li', 'de')"""
+    return list(dict.fromkeys(palabra[:TERMINO_MAXIMO] for palabra in normalizar(texto).split()))
@@ -6,6 +6,7 @@ from django.conf.urls.static import static
 urlpatterns = [
     path('',views.home, name='home'),
     path('libros', views.libros, name='libros'),
+    path('libros/buscar', views.buscar_libros, name='buscar_libros'),
     path('libros/crear', views.crear_libro, name='crear_libro'),
     path('libros/editar', views.editar_libro, name='editar_libro'),
     path('eliminar_libro/<str:id>', views.eliminar_libro, name='eliminar_libro'),
@@ -55,6 +56,7 @@ urlpatterns = [
     path('sanciones/editar', views.editar_sancion, name='editar_sancion'),
     path('eliminar_sancion/<str:id>', views.eliminar_sancion, name='eliminar_sancion'),
     path('sanciones/editar/<str:id>', views.editar_sancion, name='editar_sancion'), 
+    path('reportes/prestamos-carrera', views.reporte_prestamos_view, name='reporte_prestamos'),
     
 ]
 
@@ -2,14 +2,23 @@ from django.shortcuts import render, redirect
 from django.http import HttpResponse
 from .models import Libro
 from .forms import LibroForm
+from .paginacion import paginar
+from .busqueda import BusquedaCatalogo
 # Create your views here.
 
 def home(request):
     return render(request, 'paginas/home.html')
 
 def libros(request):
-    libros = Libro.objects.all()
-    return render(request, 'libros/index.html', {'libros': libros})
+    libros = paginar(request, Libro.objects.para_listado())
+    return render(request, 'libros/index.html', {'libros': libros, 'pagina': libros})
+
+def buscar_libros(request):
+    consulta = request.GET.get('q', '').strip()
+    libros = []
+    if consulta:
+        libros = BusquedaCatalogo.buscar(consulta, Libro.objects.para_listado())[:BusquedaCatalogo.MAXIMO_RESULTADOS]
+    return render(request, 'libros/buscar.html', {'libros': libros, 'consulta': consulta})
 
 def crear_libro(request):
     formulario = LibroForm(request.POST or None, request.FILES or None)
@@ -39,8 +48,8 @@ from .models import Alumno
 from .forms import AlumnoForm
 
 def alumnos(request):
-    alumnos = Alumno.objects.all()
-    return render(request, 'alumnos/index.html', {'alumnos': alumnos})
+    alumnos = paginar(request, Alumno.objects.para_listado())
+    return render(request, 'alumnos/index.html', {'alumnos': alumnos, 'pagina': alumnos})
 
 def crear_alumno(request):
     formulario = AlumnoForm(request.POST or None, request.FILES or None)
@@ -66,8 +75,8 @@ from .models import Autor
 from .forms import AutorForm
 
 def autores(request):
-    autores = Autor.objects.all()
-    return render(request, 'autores/index.html', {'autores': autores})
+    autores = paginar(request, Autor.objects.para_listado())
+    return render(request, 'autores/index.html', {'autores': autores, 'pagina': autores})
 
 def crear_autor(request):
     formulario = AutorForm(request.POST or None, request.FILES or None)
@@ -93,8 +102,8 @@ from .models import Carrera
 from .forms import CarreraForm
 
 def carreras(request):
-    carreras = Carrera.objects.all()
-    return render(request, 'carreras/index.html', {'carreras': carreras})
+    carreras = paginar(request, Carrera.objects.para_listado())
+    return render(request, 'carreras/index.html', {'carreras': carreras, 'pagina': carreras})
 
 def crear_carrera(request):
     formulario = CarreraForm(request.POST or None, request.FILES or None)
@@ -120,8 +129,8 @@ from .models import Categoria
 from .forms import CategoriaForm    
 
 def categorias(request):
-    categorias = Categoria.objects.all()
-    return render(request, 'categorias/index.html', {'categorias': categorias})
+    categorias = paginar(request, Categoria.objects.para_listado())
+    return render(request, 'categorias/index.html', {'categorias': categorias, 'pagina': categorias})
 
 def crear_categoria(request):
     formulario = CategoriaForm(request.POST or None, request.FILES or None)
@@ -147,8 +156,8 @@ from .models import Editorial
 from .forms import EditorialForm
 
 def editoriales(request):
-    editoriales = Editorial.objects.all()
-    return render(request, 'editoriales/index.html', {'editoriales': editoriales})
+    editoriales = paginar(request, Editorial.objects.para_listado())
+    return render(request, 'editoriales/index.html', {'editoriales': editoriales, 'pagina': editoriales})
 
 def crear_editorial(request):
     formulario = EditorialForm(request.POST or None, request.FILES or None)
@@ -174,8 +183,8 @@ from .models import Historial
 from .forms import HistorialForm
 
 def historiales(request):
-    historiales = Historial.objects.all()
-    return render(request, 'historiales/index.html', {'historiales': historiales})  
+    historiales = paginar(request, Historial.objects.para_listado())
+    return render(request, 'historiales/index.html', {'historiales': historiales, 'pagina': historiales})  
 
 def crear_historial(request):
     formulario = HistorialForm(request.POST or None, request.FILES or None)
@@ -201,8 +210,8 @@ from .models import Usuario
 from .forms import UsuarioForm
 
 def usuarios(request):
-    usuarios = Usuario.objects.all()
-    return render(request, 'usuarios/index.html', {'usuarios': usuarios})
+    usuarios = paginar(request, Usuario.objects.para_listado())
+    return render(request, 'usuarios/index.html', {'usuarios': usuarios, 'pagina': usuarios})
 
 def crear_usuario(request):
     formulario = UsuarioForm(request.POST or None, request.FILES or None)
@@ -228,8 +237,8 @@ from .models import Prestamo
 from .forms import PrestamoForm     
 
 def prestamos(request):
-    prestamos = Prestamo.objects.all()
-    return render(request, 'prestamos/index.html', {'prestamos': prestamos})    
+    prestamos = paginar(request, Prestamo.objects.para_listado())
+    return render(request, 'prestamos/index.html', {'prestamos': prestamos, 'pagina': prestamos})    
 
 def crear_prestamo(request):
     formulario = PrestamoForm(request.POST or None, request.FILES or None)
@@ -255,8 +264,8 @@ from .models import Sancion
 from .forms import SancionForm
 
 def sanciones(request):
-    sanciones = Sancion.objects.all()
-    return render(request, 'sanciones/index.html', {'sanciones': sanciones})
+    sanciones = paginar(request, Sancion.objects.para_listado())
+    return render(request, 'sanciones/index.html', {'sanciones': sanciones, 'pagina': sanciones})
 
 def crear_sancion(request):
     formulario = SancionForm(request.POST or None, request.FILES or None)
@@ -326,17 +335,75 @@ def asignar_grupo(usuario):
 
     return grupo
     
-from django.http import JsonResponse
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
+from .exportacion import EcoCsv
 from .procedimientos import ProcedimientosBiblioteca
+import csv
+import itertools
 import json
 
+
+def _filas_jsonl(lotes):
+    for conjunto, columnas, filas in lotes:
+        for fila in filas:
+            datos = dict(zip(columnas, fila))
+            datos['conjunto'] = conjunto
+            yield json.dumps(datos, ensure_ascii=False, default=str) + '\n'
+
+
+def _filas_csv(lotes):
+    escritor = csv.writer(EcoCsv())
+    for conjunto, columnas, filas in lotes:
+        if not filas:
+            # Inicio de un conjunto de resultados: línea en blanco y encabezados
+            if conjunto > 1:
+                yield '\r\n'
+            yield escritor.writerow(columnas)
+        for fila in filas:
+            yield escritor.writerow(fila)
+
+
+FORMATOS_STREAMING = {
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl', _filas_jsonl),
+    'csv': ('text/csv; charset=utf-8', 'csv', _filas_csv),
+}
+
+
+def _reporte_streaming(formato, fecha_inicio, fecha_fin):
+    """Respuesta en streaming: las filas salen del cursor por lotes sin acumularse"""
+    content_type, extension, escribir = FORMATOS_STREAMING[formato]
+    lotes = ProcedimientosBiblioteca.iterar_reporte_prestamos_carrera(
+        fecha_inicio=fecha_inicio,
+        fecha_fin=fecha_fin
+    )
+    # El primer lote se obtiene aquí para que los errores del procedimiento
+    # todavía se puedan responder con un 500 en JSON
+    primero = next(lotes, None)
+    contenido = escribir(itertools.chain([primero] if primero else [], lotes))
+
+    response = StreamingHttpResponse(contenido, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="reporte-prestamos-carrera.{extension}"'
+    return response
+
+
+@login_required
 @require_http_methods(["GET"])
 def reporte_prestamos_view(request):
-    """Vista que usa el procedimiento almacenado"""
+    """Vista que usa el procedimiento almacenado (?format=json|jsonl|csv)"""
     try:
         fecha_inicio = request.GET.get('fecha_inicio')
         fecha_fin = request.GET.get('fecha_fin')
+        formato = request.GET.get('format', 'json')
+
+        if formato in FORMATOS_STREAMING:
+            return _reporte_streaming(formato, fecha_inicio, fecha_fin)
+        if formato != 'json':
+            return JsonResponse({
+                'success': False,
+                'error': f'Formato no soportado: {formato}. Usa json, jsonl o csv.'
+            }, status=400)
         
         resultado = ProcedimientosBiblioteca.generar_reporte_prestamos_carrera(
             fecha_inicio=fecha_inicio,
@@ -77,13 +77,19 @@ WSGI_APPLICATION = 'sistema.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
+        # MySQL con pool de conexiones (biblioteca/backends/mysql_pool)
+        'ENGINE': 'biblioteca.backends.mysql_pool',
         'NAME': 'biblioteca',
         'USER': 'root',
         'PASSWORD': 'sistemas',
         'HOST': 'localhost',
         'PORT': '3306',
-    
+        # Cada petición devuelve su conexión al pool al terminar
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {
+            # maximo por proceso; segundos de espera, inactividad y vida máxima
+            'pool': {'maximo': 10, 'espera': 5, 'inactividad': 300, 'vida_maxima': 3600},
+        },
     }
 }
 